@@ -0,0 +1,82 @@
+"""
+Captcha preprocessing micro-benchmark
+Compares the legacy PIL chain (contrast, sharpness, per-pixel lambda threshold,
+LANCZOS 2x upscale, PNG + base64 re-encode) with the vectorized NumPy pipeline
+in captcha_solver.preprocess on the sample captchas.
+
+Only the local solver path is faster (roughly 2-3x, varies by run): it skips the PNG
+encode entirely. The OCR.Space upload path still decodes and re-encodes a PNG
+and measures about the same as the legacy chain, sometimes slower (e.g. ~900 µs
+vs ~711 µs on sample_captcha.png); either is small next to the OCR round trip.
+
+Usage: python bench_captcha_preprocess.py [iterations]
+"""
+import base64
+import io
+import sys
+import time
+
+import numpy as np
+from PIL import Image, ImageEnhance
+
+from captcha_solver import OCR_PREPROCESS, SOLVER_PREPROCESS, mask_to_png, preprocess, to_gray
+
+IMAGES = ["sample_captcha.png", "test_captcha.png"]
+
+
+def legacy_chain(image_bytes: bytes) -> str:
+    """The preprocessing solve_captcha() used to run before every OCR call"""
+    img = Image.open(io.BytesIO(image_bytes)).convert('L')
+    img = ImageEnhance.Contrast(img).enhance(2.0)
+    img = ImageEnhance.Sharpness(img).enhance(2.0)
+    img = img.point(lambda x: 0 if x < 128 else 255, '1')
+    img = img.resize((img.width * 2, img.height * 2), Image.Resampling.LANCZOS)
+    buffer = io.BytesIO()
+    img.save(buffer, format='PNG')
+    return base64.b64encode(buffer.getvalue()).decode('utf-8')
+
+
+def ocr_upload(image_bytes: bytes) -> str:
+    """What solve_captcha_remote() sends to OCR.Space now"""
+    return base64.b64encode(mask_to_png(preprocess(image_bytes, OCR_PREPROCESS))).decode('utf-8')
+
+
+def legacy_mask(image_bytes: bytes) -> np.ndarray:
+    """Legacy chain up to the threshold, as a boolean ink mask for comparison"""
+    img = Image.open(io.BytesIO(image_bytes)).convert('L')
+    img = ImageEnhance.Contrast(img).enhance(2.0)
+    img = ImageEnhance.Sharpness(img).enhance(2.0)
+    return np.asarray(img.point(lambda x: 0 if x < 128 else 255, 'L')) == 0
+
+
+def bench(label: str, fn, iterations: int) -> float:
+    fn()  # warm up
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    per_call = (time.perf_counter() - start) / iterations * 1e6
+    print(f"  {label:<42} {per_call:>9.1f} µs")
+    return per_call
+
+
+def main(iterations: int) -> None:
+    print(f"Captcha preprocessing benchmark ({iterations} iterations)")
+    print("=" * 60)
+    for path in IMAGES:
+        with open(path, "rb") as f:
+            image_bytes = f.read()
+        gray = to_gray(image_bytes)
+
+        print(f"\n{path}")
+        legacy = bench("legacy PIL chain → PNG → base64", lambda: legacy_chain(image_bytes), iterations)
+        upload = bench("numpy pipeline → PNG → base64 (OCR upload)", lambda: ocr_upload(image_bytes), iterations)
+        fast = bench("numpy pipeline → mask (local solver)", lambda: preprocess(image_bytes, SOLVER_PREPROCESS), iterations)
+        bench("numpy pipeline on decoded array", lambda: preprocess(gray, SOLVER_PREPROCESS), iterations)
+
+        agreement = (legacy_mask(image_bytes) == preprocess(image_bytes, SOLVER_PREPROCESS)).mean() * 100
+        print(f"  legacy / new: solver path {legacy / fast:.1f}x, OCR upload path {legacy / upload:.2f}x (below 1 = slower)")
+        print(f"  pixel agreement with legacy mask: {agreement:.2f}%")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
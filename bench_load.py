@@ -0,0 +1,217 @@
+"""
+API load-test harness
+Logs in a set of virtual students, then drives the report routes at a fixed
+concurrency and reports throughput and p50/p95/p99 latency per route.
+
+With --spawn it starts mock_portal.py and the API itself (pointed at the mock
+through SRMAP_BASE_URL), so nothing touches the real portal.
+
+Usage:
+    python bench_load.py --spawn --concurrency 50 --duration 30
+    python bench_load.py --spawn --portal-latency 0.4 --portal-jitter 0.5 --portal-error-rate 0.02
+    python bench_load.py --url http://127.0.0.1:8000 --requests 5000 --refresh-ratio 0.2
+"""
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+# Weighted like the dashboard: attendance and timetable dominate
+ROUTES = {
+    "/api/student/attendance": 4,
+    "/api/student/timetable": 3,
+    "/api/student/profile": 1,
+    "/api/student/cgpa": 1,
+    "/api/student/internal-marks": 1,
+}
+
+
+def percentile(ordered: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, int(round(q * len(ordered))) - 1))]
+
+
+class Results:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Counter] = defaultdict(Counter)
+
+    def record(self, route: str, latency: float, status: str) -> None:
+        self.latencies[route].append(latency)
+        self.statuses[route][status] += 1
+
+    def report(self, elapsed: float) -> None:
+        total = sum(len(v) for v in self.latencies.values())
+        print(f"\n{total} requests in {elapsed:.1f}s → {total / elapsed:.1f} req/s")
+        print("=" * 96)
+        print(f"  {'route':<32} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}  statuses")
+        everything: List[float] = []
+        for route in sorted(self.latencies):
+            ordered = sorted(self.latencies[route])
+            everything.extend(ordered)
+            self._row(route, ordered, self.statuses[route])
+        everything.sort()
+        self._row("all", everything, sum(self.statuses.values(), Counter()))
+
+    @staticmethod
+    def _row(label: str, ordered: List[float], statuses: Counter) -> None:
+        p50, p95, p99 = (percentile(ordered, q) * 1000 for q in (0.50, 0.95, 0.99))
+        codes = " ".join(f"{code}:{count}" for code, count in sorted(statuses.items()))
+        print(f"  {label:<32} {len(ordered):>7} {p50:>9.1f} {p95:>9.1f} {p99:>9.1f} {ordered[-1] * 1000 if ordered else 0:>9.1f}  {codes}")
+
+
+async def login_users(client: httpx.AsyncClient, users: int) -> List[str]:
+    """Log in virtual students with a fixed captcha (the mock portal accepts any)"""
+    async def login(index: int) -> Optional[str]:
+        response = await client.post("/api/login", json={
+            "username": f"AP2111001{index:04d}", "password": "password", "captcha": "ABCDE"
+        })
+        body = response.json() if response.status_code == 200 else {}
+        return body.get("session_id") if body.get("success") else None
+
+    session_ids = [sid for sid in await asyncio.gather(*(login(i) for i in range(users))) if sid]
+    print(f"✓ Logged in {len(session_ids)}/{users} virtual students")
+    return session_ids
+
+
+async def worker(
+    client: httpx.AsyncClient,
+    session_ids: List[str],
+    results: Results,
+    stop_at: float,
+    budget: List[int],
+    refresh_ratio: float
+) -> None:
+    routes, weights = list(ROUTES), list(ROUTES.values())
+    while time.monotonic() < stop_at and budget[0] != 0:
+        budget[0] -= 1
+        route = random.choices(routes, weights)[0]
+        payload = {"session_id": random.choice(session_ids), "refresh": random.random() < refresh_ratio}
+        started = time.perf_counter()
+        try:
+            response = await client.post(route, json=payload)
+            status = str(response.status_code)
+        except httpx.TimeoutException:
+            status = "timeout"
+        except httpx.TransportError:
+            status = "error"
+        results.record(route, time.perf_counter() - started, status)
+
+
+async def run(args: argparse.Namespace) -> None:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout) as client:
+        session_ids = await login_users(client, args.users)
+        if not session_ids:
+            print("✗ No virtual student could log in; is the API pointed at the mock portal?")
+            return
+
+        print(f"Driving {args.url} with {args.concurrency} concurrent clients "
+              f"({'%d requests' % args.requests if args.requests else '%ds' % args.duration}, "
+              f"refresh ratio {args.refresh_ratio:g})")
+        results = Results()
+        budget = [args.requests or -1]  # shared countdown; -1 runs until the deadline
+        started = time.monotonic()
+        stop_at = started + (args.duration if not args.requests else float("inf"))
+        await asyncio.gather(*(
+            worker(client, session_ids, results, stop_at, budget, args.refresh_ratio)
+            for _ in range(args.concurrency)
+        ))
+        results.report(time.monotonic() - started)
+
+        stats = (await client.get("/api/upstream/stats")).json()
+        print(f"\nUpstream: {stats['coalescing']} | limiter {stats['limiter']} | breaker {stats['breaker']['state']}")
+        print(f"Cache: {(await client.get('/api/cache/stats')).json()}")
+
+
+def wait_until_up(url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout:.0f}s")
+
+
+@contextmanager
+def spawned_stack(args: argparse.Namespace) -> Iterator[None]:
+    """Start mock_portal.py and the API as subprocesses for the duration of the run"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    portal_url = f"http://127.0.0.1:{args.portal_port}"
+    portal = subprocess.Popen([
+        sys.executable, "mock_portal.py", "--port", str(args.portal_port),
+        "--latency", str(args.portal_latency), "--jitter", str(args.portal_jitter),
+        "--error-rate", str(args.portal_error_rate),
+    ], cwd=here)
+    # Fresh snapshot and session databases per run, kept out of the working directory:
+    # a snapshot database left over from an earlier run would serve stale reports
+    scratch = tempfile.mkdtemp(prefix="bench_load_")
+    env = dict(
+        os.environ,
+        SRMAP_BASE_URL=f"{portal_url}/srmapstudentcorner",
+        CAPTCHA_POOL_MAX="0",  # logins pass a captcha; nothing to pre-solve
+        SNAPSHOT_DB_PATH=os.path.join(scratch, "snapshots.db"),
+        SESSION_DB_PATH=os.path.join(scratch, "sessions.db"),  # the SQLite session store used with --workers
+    )
+    api = subprocess.Popen([
+        sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(args.api_port),
+        "--workers", str(args.workers), "--log-level", "warning", "--no-access-log",
+    ], cwd=here, env=env)
+    try:
+        wait_until_up(f"{portal_url}/__mock__/stats")
+        wait_until_up(f"{args.url}/health")
+        yield
+    finally:
+        for process in (api, portal):
+            process.terminate()
+        for process in (api, portal):
+            process.wait(timeout=10)
+        shutil.rmtree(scratch, ignore_errors=True)  # both databases with their -wal and -shm files
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load-test the API's report routes")
+    parser.add_argument("--url", help="API base URL (default: the spawned API, or http://127.0.0.1:8000)")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds to run (ignored with --requests)")
+    parser.add_argument("--requests", type=int, default=0, help="stop after this many requests")
+    parser.add_argument("--users", type=int, default=50, help="virtual students to log in")
+    parser.add_argument("--refresh-ratio", type=float, default=0.0, help="share of requests that bypass the cache")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--spawn", action="store_true", help="start mock_portal.py and the API locally")
+    parser.add_argument("--api-port", type=int, default=8100)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--portal-port", type=int, default=9000)
+    parser.add_argument("--portal-latency", type=float, default=0.2)
+    parser.add_argument("--portal-jitter", type=float, default=0.3)
+    parser.add_argument("--portal-error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    if args.spawn:
+        args.url = args.url or f"http://127.0.0.1:{args.api_port}"
+        if args.workers > 1:
+            print("⚠️ Each worker keeps its own sessions; use SESSION_BACKEND=sqlite for --workers > 1")
+        with spawned_stack(args):
+            asyncio.run(run(args))
+    else:
+        args.url = args.url or "http://127.0.0.1:8000"
+        asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
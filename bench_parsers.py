@@ -0,0 +1,170 @@
+"""
+Report parser benchmark with golden outputs
+Parses every page in fixtures/reports/ and checks it against the committed
+golden output in fixtures/golden/ (with both the lxml and html.parser
+backends). It then reports parse time and peak allocation per page, and
+fails if either regressed past a threshold compared with a saved baseline.
+
+A page is parsed with the parser of the report id its file name starts with
+(6_multi_semester.html -> parse_cgpa). Reports without a dedicated parser use
+parse_rows.
+
+Usage:
+    python bench_parsers.py --save-baseline     # before a change (baselines are per machine)
+    python bench_parsers.py                     # after it: exits 1 on a mismatch or regression
+    python bench_parsers.py --update-golden     # only when an output change is intended
+"""
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+import argparse
+import json
+import sys
+import timeit
+import tracemalloc
+
+import parsers
+from parsers import REPORT_PARSERS, parse_rows
+
+ROOT = Path(__file__).parent
+CORPUS = ROOT / "fixtures" / "reports"
+GOLDEN = ROOT / "fixtures" / "golden"
+BASELINE = ROOT / "fixtures" / "parser_baseline.json"  # machine-specific, not committed
+
+BACKENDS = ["lxml", "html.parser"] if parsers.lxml_enabled else ["html.parser"]
+
+
+@contextmanager
+def backend(name: str) -> Iterator[None]:
+    """Force a parser backend; html.parser is what parsers falls back to without lxml"""
+    saved = parsers.lxml_enabled
+    if name == "html.parser":
+        parsers.lxml_enabled = False
+    try:
+        yield
+    finally:
+        parsers.lxml_enabled = saved
+
+
+def corpus() -> List[Tuple[str, str, Callable[[str], Any]]]:
+    """(page name, html, parser) for every fixture page"""
+    pages = []
+    for path in sorted(CORPUS.glob("*.html"), key=lambda p: (int(p.stem.split("_")[0]), p.stem)):
+        ids = path.stem.split("_")[0]
+        # newline="" keeps \r\n as the portal sends it, like httpx's response.text
+        with open(path, encoding="utf-8", newline="") as f:
+            pages.append((path.stem, f.read(), REPORT_PARSERS.get(ids, parse_rows)))
+    return pages
+
+
+def golden_path(name: str) -> Path:
+    return GOLDEN / f"{name}.json"
+
+
+def check_golden(pages, update: bool) -> int:
+    """Compare every page's output with its golden file; returns the number of mismatches"""
+    GOLDEN.mkdir(parents=True, exist_ok=True)
+    mismatches = 0
+    for name, html, parse in pages:
+        path = golden_path(name)
+        if update:
+            with backend(BACKENDS[-1]):  # html.parser is the reference output
+                output = parse(html)
+            path.write_text(json.dumps(output, indent=1, ensure_ascii=False) + "\n", encoding="utf-8")
+            continue
+        if not path.exists():
+            print(f"  ✗ {name}: no golden output (run with --update-golden)")
+            mismatches += 1
+            continue
+        expected = json.loads(path.read_text(encoding="utf-8"))
+        for name_of_backend in BACKENDS:
+            with backend(name_of_backend):
+                output = json.loads(json.dumps(parse(html)))
+            if output != expected:
+                print(f"  ✗ {name}: {name_of_backend} output differs from {path.relative_to(ROOT)}")
+                mismatches += 1
+    if update:
+        print(f"✓ Wrote {len(pages)} golden outputs to {GOLDEN.relative_to(ROOT)}/")
+    elif not mismatches:
+        print(f"✓ {len(pages)} pages match their golden outputs ({', '.join(BACKENDS)})")
+    return mismatches
+
+
+def measure(html: str, parse: Callable[[str], Any], repeat: int) -> Dict[str, float]:
+    timer = timeit.Timer(lambda: parse(html))
+    number, _ = timer.autorange()  # enough calls per round to take at least 0.2 s
+    per_call = min(timer.repeat(repeat=repeat, number=number)) / number
+
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        parse(html)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"us": per_call * 1e6, "peak_kib": peak / 1024}
+
+
+def bench(pages, repeat: int) -> Dict[str, Dict[str, float]]:
+    results = {}
+    print(f"\n  {'page':<22} {'KiB in':>8} {'µs/parse':>10} {'MB/s':>7} {'peak KiB':>9}")
+    for name, html, parse in pages:
+        result = results[name] = measure(html, parse, repeat)
+        size = len(html.encode("utf-8"))
+        print(f"  {name:<22} {size / 1024:>8.1f} {result['us']:>10.1f} {size / result['us']:>7.1f} {result['peak_kib']:>9.1f}")
+    return results
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], time_threshold: float, alloc_threshold: float) -> int:
+    """Print changes against the baseline; returns the number of regressions"""
+    regressions = 0
+    print(f"\n  vs baseline (fail above +{time_threshold:.0%} time or +{alloc_threshold:.0%} peak memory)")
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            print(f"  {name:<22} (new page, no baseline)")
+            continue
+        time_change = result["us"] / before["us"] - 1
+        alloc_change = result["peak_kib"] / before["peak_kib"] - 1 if before["peak_kib"] else 0.0
+        regressed = time_change > time_threshold or alloc_change > alloc_threshold
+        regressions += regressed
+        mark = "✗" if regressed else "✓"
+        print(f"  {mark} {name:<20} time {time_change:>+7.1%}   peak {alloc_change:>+7.1%}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the report parsers against the fixture corpus")
+    parser.add_argument("--repeat", type=int, default=5, help="timing rounds per page (best is kept)")
+    parser.add_argument("--time-threshold", type=float, default=0.20, help="allowed slowdown vs baseline")
+    parser.add_argument("--alloc-threshold", type=float, default=0.10, help="allowed peak memory growth vs baseline")
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="record this run as the baseline")
+    parser.add_argument("--update-golden", action="store_true", help="rewrite golden outputs from the current parsers")
+    parser.add_argument("--check-only", action="store_true", help="only compare with golden outputs")
+    args = parser.parse_args()
+
+    pages = corpus()
+    print(f"Parser corpus: {len(pages)} pages in {CORPUS.relative_to(ROOT)}/")
+    failures = check_golden(pages, args.update_golden)
+    if args.check_only or args.update_golden:
+        sys.exit(1 if failures else 0)
+
+    with backend(BACKENDS[0]):
+        results = bench(pages, args.repeat)
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(results, indent=1) + "\n")
+        print(f"\n✓ Saved baseline to {args.baseline}")
+    elif args.baseline.exists():
+        failures += compare(results, json.loads(args.baseline.read_text()), args.time_threshold, args.alloc_threshold)
+    else:
+        print(f"\n⚠️ No baseline at {args.baseline}; run with --save-baseline first to enable regression checks")
+
+    if failures:
+        print(f"\n✗ {failures} failure(s)")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
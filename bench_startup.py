@@ -0,0 +1,155 @@
+"""
+Cold start benchmark
+Measures what a fresh process pays before and during its first requests:
+`import main` time (and which heavy modules it pulls in), process start to
+/health, and the latency of the first and a repeated call of each step. Runs
+once as a plain cold start and once with WARMUP=1, where the warm-up is awaited
+through GET /api/warmup before the first student request.
+
+The API runs against mock_portal.py (no latency), so the numbers are the
+API's own costs. Sessions, snapshots and the captcha pool are per process and
+off, so every round really starts cold.
+
+Usage:
+    python bench_startup.py
+    python bench_startup.py --rounds 5 --mode cold
+"""
+from statistics import median
+from typing import Dict, List, Tuple
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+
+import httpx
+
+from bench_load import wait_until_up
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Modules that should only be imported by the warm-up or the first captcha, page or vault use.
+# orjson and brotli stay eager: they cost well under 1 ms and the first response needs them.
+LAZY_MODULES = ("captcha_solver", "numpy", "PIL", "bs4", "lxml", "cryptography")
+
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def measure_import() -> Tuple[float, List[Tuple[str, float]], List[str]]:
+    """(import main ms, slowest top-level imports, lazy modules that got loaded) in a fresh interpreter"""
+    code = f"import main, sys; print(','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=HERE, env=dict(os.environ, SNAPSHOT_DB_PATH=""), capture_output=True, text=True, check=True
+    )
+    total = 0.0
+    children = []
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if not match:
+            continue
+        cumulative_ms = int(match.group(2)) / 1000
+        depth = len(match.group(3)) // 2
+        if match.group(4) == "main":
+            total = cumulative_ms
+        elif depth == 1:
+            children.append((match.group(4), cumulative_ms))
+    loaded = [name for name in result.stdout.strip().split(",") if name]
+    return total, sorted(children, key=lambda item: -item[1])[:8], loaded
+
+
+def first_requests(url: str, warmup: bool) -> Dict[str, float]:
+    """Time each step of a new student's first visit, then the same steps again"""
+    timings: Dict[str, float] = {}
+    with httpx.Client(base_url=url, timeout=60.0) as client:
+        def timed(label: str, method: str, path: str, **kwargs) -> httpx.Response:
+            started = time.perf_counter()
+            response = client.request(method, path, **kwargs)
+            timings[label] = (time.perf_counter() - started) * 1000
+            response.raise_for_status()
+            return response
+
+        if warmup:
+            timed("warm-up", "GET", "/api/warmup")
+        timed("GET /", "GET", "/")
+        login = {"username": "AP21110010001", "password": "password", "captcha": "ABCDE"}
+        session_id = timed("login", "POST", "/api/login", json=login).json()["session_id"]
+        for route in ("attendance", "timetable"):
+            payload = {"session_id": session_id}
+            timed(f"{route} (first)", "POST", f"/api/student/{route}", json=payload)
+            timed(f"{route} (again)", "POST", f"/api/student/{route}", json={**payload, "refresh": True})
+        if os.path.exists(os.path.join(HERE, os.getenv("CAPTCHA_MODEL_PATH", "captcha_model.npz"))):
+            # No captcha in the form: the API downloads one and solves it with the local model
+            timed("login, solving captcha (first)", "POST", "/api/login", json={**login, "captcha": None})
+            timed("login, solving captcha (again)", "POST", "/api/login", json={**login, "captcha": None})
+    return timings
+
+
+def cold_start(args: argparse.Namespace, warmup: bool) -> Dict[str, float]:
+    """Start a fresh API process and time startup plus its first requests"""
+    url = f"http://127.0.0.1:{args.api_port}"
+    env = dict(
+        os.environ,
+        SRMAP_BASE_URL=f"http://127.0.0.1:{args.portal_port}/srmapstudentcorner",
+        CAPTCHA_POOL_MAX="0",
+        PREFETCH_ENABLED="0",
+        SNAPSHOT_DB_PATH="",  # a snapshot from the previous round would skip the first fetch
+        WARMUP="1" if warmup else "0",
+    )
+    started = time.perf_counter()
+    api = subprocess.Popen([
+        sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(args.api_port),
+        "--log-level", "warning", "--no-access-log",
+    ], cwd=HERE, env=env, stdout=subprocess.DEVNULL)
+    try:
+        wait_until_up(f"{url}/health")
+        timings = {"start → /health": (time.perf_counter() - started) * 1000}
+        timings.update(first_requests(url, warmup))
+        return timings
+    finally:
+        api.terminate()
+        api.wait(timeout=10)
+
+
+def report(title: str, rounds: List[Dict[str, float]]) -> None:
+    print(f"\n{title} (median of {len(rounds)})")
+    for step in rounds[0]:
+        values = [r[step] for r in rounds if step in r]
+        print(f"  {step:<34} {median(values):>9.1f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure import time, startup and first-request latency")
+    parser.add_argument("--rounds", type=int, default=3, help="fresh processes per mode (median is shown)")
+    parser.add_argument("--mode", choices=["cold", "warmup", "both"], default="both")
+    parser.add_argument("--api-port", type=int, default=8101)
+    parser.add_argument("--portal-port", type=int, default=9001)
+    args = parser.parse_args()
+
+    imports = [measure_import() for _ in range(args.rounds)]
+    print(f"import main: {median(total for total, _, _ in imports):.1f} ms (median of {args.rounds})")
+    for name, ms in imports[-1][1]:
+        print(f"  {name:<34} {ms:>9.1f} ms")
+    loaded = imports[-1][2]
+    if loaded:
+        print(f"⚠️ Loaded at import time although only needed later: {', '.join(loaded)}")
+    else:
+        print(f"✓ Deferred until first use: {', '.join(LAZY_MODULES)}")
+
+    portal = subprocess.Popen([
+        sys.executable, "mock_portal.py", "--port", str(args.portal_port), "--latency", "0", "--jitter", "0",
+    ], cwd=HERE, stdout=subprocess.DEVNULL)
+    try:
+        wait_until_up(f"http://127.0.0.1:{args.portal_port}/__mock__/stats")
+        modes = {"cold": [False], "warmup": [True], "both": [False, True]}[args.mode]
+        for warmup in modes:
+            rounds = [cold_start(args, warmup) for _ in range(args.rounds)]
+            report("With WARMUP=1" if warmup else "Cold start", rounds)
+    finally:
+        portal.terminate()
+        portal.wait(timeout=10)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+SRMAP Student Portal - Captcha Session Pool
+Keeps upstream login sessions warm (login page fetched, captcha downloaded and
+solved) so /api/login only has to post the credentials
+"""
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set
+import asyncio
+import math
+import time
+
+
+@dataclass
+class WarmSession:
+    """A portal session whose captcha is already solved"""
+    cookies: List[Any]
+    captcha: str
+    created_at: float = field(default_factory=time.monotonic)
+
+
+class CaptchaPool:
+    """
+    Pool of WarmSessions refilled in the background.
+    The target size follows the recent login rate: enough entries to cover the
+    logins expected while a refill is in flight, between min_size and max_size.
+    Entries are dropped once they are max_age seconds old, well before the
+    portal's captcha/session timeout.
+    """
+
+    def __init__(
+        self,
+        producer: Callable[[], Awaitable[Optional[WarmSession]]],
+        min_size: int = 2,
+        max_size: int = 20,
+        max_age: float = 5 * 60,
+        rate_window: float = 60,
+        fill_concurrency: int = 4,
+        refill_interval: float = 5
+    ):
+        self.producer = producer
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_age = max_age
+        self.rate_window = rate_window
+        self.fill_concurrency = fill_concurrency
+        self.refill_interval = refill_interval
+        self._entries: Deque[WarmSession] = deque()
+        self._logins: Deque[float] = deque()
+        self._filling = 0
+        self._fill_tasks: Set[asyncio.Task] = set()
+        self._fill_latency = 1.0  # EWMA of seconds to produce one entry
+        self._consecutive_failures = 0
+        self._wake: Optional[asyncio.Event] = None  # created in start(), inside the running loop
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.failures = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def take(self) -> Optional[WarmSession]:
+        """Pop the oldest still-valid session, or None if the pool is empty"""
+        now = time.monotonic()
+        self._logins.append(now)
+        self._discard_expired(now)
+        if self._wake is not None:
+            self._wake.set()
+        if self._entries:
+            self.hits += 1
+            return self._entries.popleft()
+        self.misses += 1
+        return None
+
+    def login_rate(self, now: Optional[float] = None) -> float:
+        """Logins per second over the last rate_window seconds"""
+        now = time.monotonic() if now is None else now
+        while self._logins and now - self._logins[0] > self.rate_window:
+            self._logins.popleft()
+        return len(self._logins) / self.rate_window
+
+    def target_size(self) -> int:
+        # Cover the logins expected during one refill round trip, with 2x headroom
+        demand = self.login_rate() * (self._fill_latency + self.refill_interval) * 2
+        return max(self.min_size, min(self.max_size, self.min_size + math.ceil(demand)))
+
+    def start(self) -> "asyncio.Task[None]":
+        """Start the refill loop; call from the running event loop"""
+        self._wake = asyncio.Event()
+        return asyncio.create_task(self.run())
+
+    async def run(self) -> None:
+        """Background loop: expire stale entries and top the pool up to its target size"""
+        if self._wake is None:
+            self._wake = asyncio.Event()
+        try:
+            while True:
+                self._discard_expired(time.monotonic())
+                missing = self.target_size() - len(self._entries) - self._filling
+                for _ in range(max(0, min(missing, self.fill_concurrency - self._filling))):
+                    self._filling += 1
+                    task = asyncio.create_task(self._fill_one())
+                    self._fill_tasks.add(task)
+                    task.add_done_callback(self._fill_tasks.discard)
+                self._wake.clear()
+                # Back off while the portal keeps failing
+                delay = self.refill_interval * 2 ** min(self._consecutive_failures, 5)
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            for task in list(self._fill_tasks):
+                task.cancel()
+
+    async def _fill_one(self) -> None:
+        started = time.monotonic()
+        try:
+            entry = await self.producer()
+            if entry is None:
+                self.failures += 1
+                self._consecutive_failures += 1
+            else:
+                self._entries.append(entry)
+                self._consecutive_failures = 0
+                self._fill_latency = 0.8 * self._fill_latency + 0.2 * (time.monotonic() - started)
+        except Exception as e:
+            self.failures += 1
+            self._consecutive_failures += 1
+            print(f"⚠️ Captcha pool refill failed: {e}")
+        finally:
+            self._filling -= 1
+
+    def _discard_expired(self, now: float) -> None:
+        while self._entries and now - self._entries[0].created_at > self.max_age:
+            self._entries.popleft()
+            self.expired += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": len(self._entries),
+            "target_size": self.target_size(),
+            "filling": self._filling,
+            "login_rate_per_min": round(self.login_rate() * 60, 2),
+            "fill_latency_s": round(self._fill_latency, 3),
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "failures": self.failures,
+        }
@@ -0,0 +1,234 @@
+"""
+SRMAP Captcha Solver - offline, in-process
+Segments the 5-character captcha into glyphs and classifies each one with a
+k-nearest-neighbour model trained from labelled samples (see collect_captcha_samples.py)
+
+Usage:
+    python captcha_solver.py train captcha_samples/ [captcha_model.npz]
+    python captcha_solver.py eval captcha_samples/ [captcha_model.npz]
+    python captcha_solver.py solve image.png [captcha_model.npz]
+"""
+from dataclasses import dataclass
+from typing import Iterable, List, Optional, Tuple, Union
+import io
+import os
+import re
+import sys
+
+import numpy as np
+from PIL import Image
+
+CAPTCHA_LENGTH = 5
+GLYPH_SIZE = (12, 16)  # (width, height) every glyph is normalised to
+DEFAULT_MODEL_PATH = "captcha_model.npz"
+
+# Labelled samples are saved as captcha_<timestamp>_<LABEL>.png
+SAMPLE_PATTERN = re.compile(r"captcha_.*_([A-Z0-9]{5})\.png$")
+
+
+@dataclass(frozen=True)
+class PreprocessConfig:
+    """
+    Stages of the captcha preprocessing pipeline.
+    contrast: PIL-style contrast factor around the mean gray level (1.0 = off)
+    threshold: gray level (after contrast) below which a pixel is ink
+    denoise: drop ink pixels with fewer than this many ink neighbours (0 = off)
+    upscale: integer nearest-neighbour scale factor (1 = off)
+    """
+    contrast: float = 2.0
+    threshold: int = 128
+    denoise: int = 1
+    upscale: int = 1
+
+
+# The k-NN model works on the native resolution; OCR engines read larger glyphs better
+SOLVER_PREPROCESS = PreprocessConfig()
+OCR_PREPROCESS = PreprocessConfig(upscale=2)
+
+
+def to_gray(image: Union[bytes, np.ndarray]) -> np.ndarray:
+    """Decode image bytes (or pass through an array) as a uint8 grayscale array"""
+    if isinstance(image, np.ndarray):
+        return image if image.ndim == 2 else np.asarray(Image.fromarray(image).convert("L"))
+    return np.asarray(Image.open(io.BytesIO(image)).convert("L"))
+
+
+def preprocess(image: Union[bytes, np.ndarray], config: PreprocessConfig = SOLVER_PREPROCESS) -> np.ndarray:
+    """
+    Turn a captcha into a boolean ink mask in a single vectorized pass.
+    Contrast is a linear map around the mean, so it folds into the threshold:
+    mean + c * (x - mean) < t  <=>  x < mean + (t - mean) / c
+    """
+    gray = to_gray(image)
+    threshold = float(config.threshold)
+    if config.contrast > 0 and config.contrast != 1.0:
+        mean = int(gray.mean() + 0.5)
+        threshold = mean + (threshold - mean) / config.contrast
+    mask = gray < threshold
+
+    if config.denoise:
+        padded = np.pad(mask, 1).view(np.uint8)
+        h, w = mask.shape
+        neighbours = sum(
+            padded[1 + dy:1 + dy + h, 1 + dx:1 + dx + w]
+            for dy in (-1, 0, 1) for dx in (-1, 0, 1) if dy or dx
+        )
+        mask &= neighbours >= config.denoise
+
+    if config.upscale > 1:
+        mask = mask.repeat(config.upscale, axis=0).repeat(config.upscale, axis=1)
+    return mask
+
+
+def mask_to_png(mask: np.ndarray) -> bytes:
+    """Encode an ink mask as black-on-white PNG (only needed for external OCR)"""
+    buffer = io.BytesIO()
+    # A bool array becomes a 1-bit image, which encodes faster than 8-bit gray (still a few hundred µs)
+    Image.fromarray(~mask).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def segment(mask: np.ndarray, count: int = CAPTCHA_LENGTH) -> List[np.ndarray]:
+    """
+    Split an ink mask into `count` glyphs using the column projection.
+    Touching glyphs are split at the weakest column of the widest run;
+    specks are merged into their nearest neighbour.
+    """
+    columns = mask.any(axis=0)
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], columns.view(np.int8), [0]))))
+    runs = [[int(start), int(end)] for start, end in zip(edges[::2], edges[1::2])]
+    if not runs:
+        return []
+
+    while len(runs) > count:
+        gaps = [runs[i + 1][0] - runs[i][1] for i in range(len(runs) - 1)]
+        i = int(np.argmin(gaps))
+        runs[i:i + 2] = [[runs[i][0], runs[i + 1][1]]]
+
+    while len(runs) < count:
+        i = max(range(len(runs)), key=lambda j: runs[j][1] - runs[j][0])
+        start, end = runs[i]
+        if end - start < 2:
+            break
+        # Cut in the middle third, at the column with the least ink
+        profile = mask[:, start:end].sum(axis=0)
+        width = end - start
+        lo, hi = max(1, width // 3), min(width - 1, width - width // 3)
+        cut = start + (lo + int(np.argmin(profile[lo:hi])) if hi > lo else width // 2)
+        runs[i:i + 1] = [[start, cut], [cut, end]]
+
+    glyphs = []
+    for start, end in runs:
+        glyph = mask[:, start:end]
+        rows = np.flatnonzero(glyph.any(axis=1))
+        glyphs.append(glyph[rows[0]:rows[-1] + 1] if rows.size else glyph)
+    return glyphs
+
+
+def glyph_features(glyph: np.ndarray) -> np.ndarray:
+    """Resize a glyph mask to GLYPH_SIZE and flatten it into a feature vector"""
+    image = Image.fromarray(glyph.astype(np.uint8) * 255).resize(GLYPH_SIZE, Image.Resampling.BILINEAR)
+    return np.asarray(image, dtype=np.float32).ravel() / 255.0
+
+
+class CaptchaSolver:
+    """k-NN glyph classifier; distances above max_distance are treated as unknown"""
+
+    def __init__(self, features: np.ndarray, labels: np.ndarray, k: int = 1, max_distance: float = 0.12):
+        self.features = features.astype(np.float32)
+        self.labels = labels
+        self.k = k
+        self.max_distance = max_distance
+        self._norms = (self.features ** 2).sum(axis=1)
+
+    @classmethod
+    def train(cls, samples: Iterable[Tuple[np.ndarray, str]], **options) -> "CaptchaSolver":
+        """Build a model from (ink mask, label) pairs; samples that don't segment cleanly are skipped"""
+        features, labels = [], []
+        for mask, label in samples:
+            glyphs = segment(mask, len(label))
+            if len(glyphs) != len(label):
+                continue
+            for glyph, char in zip(glyphs, label):
+                features.append(glyph_features(glyph))
+                labels.append(char)
+        if not features:
+            raise ValueError("No usable captcha samples")
+        return cls(np.stack(features), np.array(labels), **options)
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_MODEL_PATH) -> "CaptchaSolver":
+        data = np.load(path)
+        return cls(data["features"], data["labels"], k=int(data["k"]), max_distance=float(data["max_distance"]))
+
+    def save(self, path: str = DEFAULT_MODEL_PATH) -> None:
+        np.savez_compressed(
+            path, features=self.features, labels=self.labels, k=self.k, max_distance=self.max_distance
+        )
+
+    def classify(self, glyphs: List[np.ndarray]) -> Optional[str]:
+        """Classify glyphs; None if any glyph is too far from every known sample"""
+        queries = np.stack([glyph_features(g) for g in glyphs])
+        # Squared euclidean distances via |q|^2 - 2 q.f + |f|^2, per pixel
+        distances = (queries ** 2).sum(axis=1)[:, None] - 2 * queries @ self.features.T + self._norms[None, :]
+        distances /= queries.shape[1]
+        nearest = np.argsort(distances, axis=1)[:, :self.k]
+
+        text = []
+        for row, indices in enumerate(nearest):
+            if distances[row, indices[0]] > self.max_distance:
+                return None
+            votes = self.labels[indices]
+            chars, counts = np.unique(votes, return_counts=True)
+            text.append(str(chars[np.argmax(counts)]))
+        return "".join(text)
+
+    def solve_mask(self, mask: np.ndarray) -> str:
+        """Return the captcha text for an ink mask, or "" if it can't be read confidently"""
+        glyphs = segment(mask)
+        if len(glyphs) != CAPTCHA_LENGTH:
+            return ""
+        return self.classify(glyphs) or ""
+
+    def solve(self, image: Union[bytes, np.ndarray]) -> str:
+        """Solve raw image bytes or an already decoded grayscale array"""
+        return self.solve_mask(preprocess(image, SOLVER_PREPROCESS))
+
+
+def load_samples(directory: str) -> List[Tuple[np.ndarray, str]]:
+    """Read labelled captcha_<timestamp>_<LABEL>.png files"""
+    samples = []
+    for name in sorted(os.listdir(directory)):
+        match = SAMPLE_PATTERN.search(name)
+        if match:
+            with open(os.path.join(directory, name), "rb") as f:
+                samples.append((preprocess(f.read(), SOLVER_PREPROCESS), match.group(1)))
+    return samples
+
+
+def main(argv: List[str]) -> int:
+    if len(argv) < 3 or argv[1] not in ("train", "eval", "solve"):
+        print(__doc__)
+        return 1
+    command, target = argv[1], argv[2]
+    model_path = argv[3] if len(argv) > 3 else DEFAULT_MODEL_PATH
+
+    if command == "train":
+        samples = load_samples(target)
+        solver = CaptchaSolver.train(samples)
+        solver.save(model_path)
+        print(f"✓ Trained on {len(samples)} samples ({len(solver.labels)} glyphs) → {model_path}")
+    elif command == "eval":
+        solver = CaptchaSolver.load(model_path)
+        samples = load_samples(target)
+        correct = sum(solver.solve_mask(mask) == label for mask, label in samples)
+        print(f"✓ {correct}/{len(samples)} captchas solved correctly")
+    else:
+        solver = CaptchaSolver.load(model_path)
+        with open(target, "rb") as f:
+            print(solver.solve(f.read()) or "✗ Could not solve captcha")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -58,5 +58,5 @@ print(f"\n✓ Collected {count} captcha samples")
 print(f"📁 Saved in: captcha_samples/")
 print(f"\n💡 Next steps:")
 print(f"   1. Collect at least 100 labeled samples")
-print(f"   2. Train a tiny CNN model (see train_model.py)")
-print(f"   3. Convert to ONNX and integrate with backend")
+print(f"   2. Train the offline solver: python captcha_solver.py train captcha_samples/")
+print(f"   3. Restart the backend - it loads captcha_model.npz at startup")
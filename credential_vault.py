@@ -0,0 +1,94 @@
+"""
+SRMAP Student Portal - Credential Vault
+Opt-in, in-memory storage of portal credentials for transparent re-login
+"""
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import importlib.util
+import json
+import threading
+
+# cryptography is optional, and only imported when the vault is first used (~10 ms)
+CRYPTOGRAPHY_INSTALLED = importlib.util.find_spec("cryptography") is not None
+
+
+class CredentialVault:
+    """
+    Credentials of sessions that asked to be remembered, kept Fernet-encrypted
+    under a key generated at startup (or the given one). Credentials are never
+    written to disk, so a restart forgets them. encrypt()/decrypt() seal other
+    secrets under the same key, e.g. portal cookies kept in the snapshot
+    database; with a generated key only this process can read them back.
+    Without the cryptography package the vault stays disabled.
+    """
+
+    def __init__(self, key: Optional[bytes] = None):
+        self._key = key
+        self._fernet: Any = None
+        self._lock = threading.Lock()  # encrypt() is also called from worker threads
+        self._tokens: Dict[str, bytes] = {}
+
+    def __len__(self) -> int:
+        return len(self._tokens)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._tokens
+
+    @property
+    def enabled(self) -> bool:
+        return CRYPTOGRAPHY_INSTALLED
+
+    def _cipher(self) -> Any:
+        """The Fernet instance, created (and cryptography imported) on first use"""
+        if self._fernet is None and CRYPTOGRAPHY_INSTALLED:
+            with self._lock:
+                if self._fernet is None:
+                    from cryptography.fernet import Fernet
+                    self._fernet = Fernet(self._key or Fernet.generate_key())
+        return self._fernet
+
+    def store(self, session_id: str, username: str, password: str) -> bool:
+        """Remember a session's credentials; False if the vault is disabled"""
+        token = self.encrypt(json.dumps([username, password]).encode("utf-8"))
+        if token is None:
+            return False
+        self._tokens[session_id] = token
+        return True
+
+    def get(self, session_id: str) -> Optional[Tuple[str, str]]:
+        token = self._tokens.get(session_id)
+        if token is None:
+            return None
+        credentials = self.decrypt(token)
+        if credentials is None:
+            self.forget(session_id)
+            return None
+        username, password = json.loads(credentials)
+        return username, password
+
+    def encrypt(self, data: bytes) -> Optional[bytes]:
+        """Seal data under the vault key; None if the vault is disabled"""
+        fernet = self._cipher()
+        return fernet.encrypt(data) if fernet is not None else None
+
+    def decrypt(self, token: bytes) -> Optional[bytes]:
+        """Data sealed by encrypt(); None if disabled, tampered with or sealed under another key"""
+        fernet = self._cipher()
+        if fernet is None:
+            return None
+        from cryptography.fernet import InvalidToken
+        try:
+            return fernet.decrypt(token)
+        except InvalidToken:
+            return None
+
+    def sessions(self) -> List[str]:
+        """Ids of the sessions with remembered credentials"""
+        return list(self._tokens)
+
+    def forget(self, session_id: str) -> None:
+        self._tokens.pop(session_id, None)
+
+    def prune(self, is_live: Callable[[str], bool]) -> None:
+        """Drop credentials of sessions that no longer exist"""
+        for session_id in [sid for sid in self._tokens if not is_live(sid)]:
+            del self._tokens[session_id]
@@ -0,0 +1,186 @@
+"""
+SRMAP Student Portal - Deadlines and Hedging
+Per-request time budgets shared by every upstream call a route makes, and
+hedged requests for idempotent fetches
+"""
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, Optional
+import asyncio
+import json
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Absolute time.monotonic() by which the current request must finish
+_deadline: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """The request's time budget ran out before an upstream call could finish"""
+
+
+def remaining() -> Optional[float]:
+    """Seconds left in the current request's budget, or None if it has none"""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def clamp_timeouts(timeouts: Dict[str, Optional[float]]) -> Dict[str, Optional[float]]:
+    """Shrink httpx per-phase timeouts so none outlives the remaining budget"""
+    left = remaining()
+    if left is None:
+        return timeouts
+    if left <= 0:
+        raise DeadlineExceeded()
+    return {phase: left if value is None else min(value, left) for phase, value in timeouts.items()}
+
+
+class DeadlineMiddleware:
+    """
+    Give each request a time budget (by path, falling back to `default`).
+    Upstream calls read it through remaining(); if the whole request overruns
+    it, or a call raises DeadlineExceeded before the response has started,
+    the client gets a 504. A budget of None exempts a path (streams).
+    """
+
+    def __init__(self, app: ASGIApp, budgets: Dict[str, Optional[float]], default: float):
+        self.app = app
+        self.budgets = budgets
+        self.default = default
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        budget = self.budgets.get(scope["path"], self.default)
+        if budget is None:
+            await self.app(scope, receive, send)
+            return
+
+        started = False
+
+        async def send_tracking(message: Message) -> None:
+            nonlocal started
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        token = _deadline.set(time.monotonic() + budget)
+        try:
+            await asyncio.wait_for(self.app(scope, receive, send_tracking), timeout=budget)
+        except (asyncio.TimeoutError, DeadlineExceeded):
+            if started:
+                raise
+            body = json.dumps({"detail": f"Request exceeded its {budget:g}s deadline"}).encode("utf-8")
+            await send({
+                "type": "http.response.start",
+                "status": 504,
+                "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+            })
+            await send({"type": "http.response.body", "body": body})
+        finally:
+            _deadline.reset(token)
+
+
+# ==================== HEDGING ====================
+
+class LatencyTracker:
+    """Recent latency samples of one kind of call, for percentile-based hedging delays"""
+
+    def __init__(self, size: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples: Deque[float] = deque(maxlen=size)
+        self._cached: Dict[float, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def add(self, latency: float) -> None:
+        self._samples.append(latency)
+        self._cached.clear()
+
+    def percentile(self, q: float) -> Optional[float]:
+        """q-th percentile (0-1) of recent samples; None until min_samples are in"""
+        if len(self._samples) < self.min_samples:
+            return None
+        if q not in self._cached:
+            ordered = sorted(self._samples)
+            self._cached[q] = ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+        return self._cached[q]
+
+
+class Hedger:
+    """
+    Run an idempotent call; if it hasn't answered by the p95 latency of its
+    kind (at least min_delay), start one duplicate and return whichever
+    finishes first. Hedging is skipped while there aren't enough samples, when
+    allow() says no, or when a second attempt could not finish within the
+    request's remaining budget anyway.
+    """
+
+    def __init__(self, quantile: float = 0.95, min_delay: float = 0.5, enabled: bool = True):
+        self.quantile = quantile
+        self.min_delay = min_delay
+        self.enabled = enabled
+        self._latency: Dict[Hashable, LatencyTracker] = {}
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    async def call(
+        self,
+        fn: Callable[[], Awaitable[Any]],
+        key: Hashable = None,
+        allow: Callable[[], bool] = lambda: True
+    ) -> Any:
+        self.calls += 1
+        latency = self._latency.get(key)
+        if latency is None:
+            latency = self._latency[key] = LatencyTracker()
+        started = time.monotonic()
+        delay = latency.percentile(self.quantile) if self.enabled else None
+        left = remaining()
+        if delay is None or (left is not None and left <= max(delay, self.min_delay) * 2):
+            result = await fn()
+            latency.add(time.monotonic() - started)
+            return result
+
+        first = asyncio.ensure_future(fn())
+        pending = {first}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=max(delay, self.min_delay))
+            if not done and allow():
+                self.hedged += 1
+                pending.add(asyncio.ensure_future(fn()))
+            while True:
+                if not done:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                # Take a success if either attempt has one; an error only counts once nothing else is left
+                winner = next((task for task in done if task.exception() is None), None)
+                if winner is None and not pending:
+                    winner = next(iter(done))
+                if winner is not None:
+                    if winner is not first:
+                        self.hedge_wins += 1
+                    # Time to the first answer is what the next p95 should reflect
+                    latency.add(time.monotonic() - started)
+                    return winner.result()
+                done = set()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        p95 = {}
+        for key, latency in self._latency.items():
+            value = latency.percentile(self.quantile)
+            if value is not None:
+                p95[str(key)] = round(value, 3)
+        return {
+            "enabled": self.enabled,
+            "calls": self.calls,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "p95_s": p95,
+        }
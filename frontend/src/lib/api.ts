@@ -58,7 +58,7 @@ export const authAPI = {
 
 export const studentAPI = {
   getProfile: async (sessionId: string) => {
-    const response = await api.post('/api/student/profile', { session_id: sessionId });
+    const response = await api.post('/api/student/profile', { session_id: sessionId, include_html: true });
     return response.data;
   },
 
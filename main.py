@@ -2,26 +2,263 @@
 SRMAP Student Portal - FastAPI Backend
 Complete wrapper around SRMAP Student Portal
 """
-from fastapi import FastAPI, HTTPException, File, UploadFile
-from fastapi.responses import StreamingResponse, FileResponse
+from fastapi import FastAPI, HTTPException, File, UploadFile, Header, Depends, Query, Request
+from fastapi.responses import StreamingResponse, FileResponse, Response, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
-import requests
-from bs4 import BeautifulSoup
-from typing import Optional, Dict, List, Any
+from typing import Optional, Dict, List, Any, Callable, AsyncIterator, Awaitable, Set, Tuple
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, replace
+from contextvars import Context
+from datetime import datetime, timedelta
+from operator import itemgetter
+from urllib.parse import urlsplit
+from types import ModuleType
 import io
-import uuid
-from PIL import Image, ImageEnhance, ImageFilter
 import httpx
 import base64
 import re
+import asyncio
+import os
+import time
+import secrets
+import threading
+import importlib
+import sys
+
+from report_cache import ReportCache
+from parsers import parse_profile, parse_attendance, parse_cgpa, parse_timetable, parse_rows
+from captcha_pool import CaptchaPool, WarmSession
+from session_store import SessionStore, MemorySessionStore, SQLiteSessionStore, SessionRecord, CookieTuple
+from responses import FastJSONResponse, CompressionMiddleware, content_hash, etag_matches, sse_event
+from single_flight import SingleFlight
+from report_watcher import WatchHub, WatchSpec, SessionGone, RateLimiter
+from credential_vault import CredentialVault
+from upstream_guard import UpstreamGuard, AIMDLimiter, CircuitBreaker, UpstreamUnavailable
+from deadlines import DeadlineMiddleware, DeadlineExceeded, Hedger, clamp_timeouts, remaining
+from metrics import Registry, MetricsMiddleware
+from tracing import Tracer, TracingMiddleware, SamplingProfiler, ProfilerBusy, span
+from snapshot_store import SnapshotStore, Snapshot
+from prefetch import PrefetchScheduler, parse_window, IST
+from schedule import ScheduleIndex, ScheduleCache
+
+# SRMAP_BASE_URL points the API at another portal, e.g. mock_portal.py for offline load tests
+BASE_URL = os.getenv("SRMAP_BASE_URL", "https://student.srmap.edu.in/srmapstudentcorner").rstrip("/")
+PORTAL_ORIGIN = "{0.scheme}://{0.netloc}".format(urlsplit(BASE_URL))
+PORTAL_PATH_PREFIX = urlsplit(BASE_URL).path + "/"
+
+# Upstream HTTP settings - every portal call goes through a non-blocking httpx client
+UPSTREAM_TIMEOUT = httpx.Timeout(20.0, connect=10.0)
+UPSTREAM_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20)
+
+# ==================== METRICS ====================
+
+# In-process counters and histograms served at /metrics; live values are read at scrape time
+metrics = Registry()
+HTTP_REQUESTS = metrics.counter("srms_http_requests_total", "API requests by route and status", ("method", "route", "status"))
+HTTP_LATENCY = metrics.histogram("srms_http_request_duration_seconds", "API request latency by route", ("method", "route"))
+UPSTREAM_LATENCY = metrics.histogram(
+    "srms_upstream_request_duration_seconds", "Portal request latency by portal path and status", ("path", "status")
+)
+PARSE_LATENCY = metrics.histogram(
+    "srms_report_parse_duration_seconds", "Report parse time by report id", ("report",),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+)
+CAPTCHA_SOLVES = metrics.histogram(
+    "srms_captcha_solve_duration_seconds", "Captcha solve time by solver and outcome", ("solver", "outcome")
+)
+
+# ==================== TRACING ====================
+
+# Per-request phase spans, off by default; toggled at runtime via POST /api/admin/tracing
+tracer = Tracer(
+    capacity=int(os.getenv("TRACE_BUFFER", "500")),
+    enabled=os.getenv("TRACING_ENABLED", "0") == "1",
+    sample_rate=float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))
+)
+profiler = SamplingProfiler()
+
+# Guards /api/admin/*. Without a token they are hidden (404) unless ADMIN_OPEN=1 opens them for local development.
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+ADMIN_OPEN = os.getenv("ADMIN_OPEN", "0") == "1"
+
+# Every portal request passes the circuit breaker and the adaptive concurrency limit.
+# The limit starts at 20 and moves between 2 and the connection pool size with observed latency.
+upstream_guard = UpstreamGuard(
+    AIMDLimiter(initial=20, min_limit=2, max_limit=UPSTREAM_LIMITS.max_connections, max_wait=10.0),
+    CircuitBreaker(failure_ratio=0.5, min_calls=10, window=30, open_duration=15, max_open_duration=120),
+    neutral_errors=(DeadlineExceeded,)
+)
+
+
+class SharedTransport(httpx.AsyncBaseTransport):
+    """
+    Connection pool shared by all per-session portal clients.
+    Closing a session client leaves the pool open; it is only torn down on shutdown.
+    """
+
+    def __init__(self):
+        self._transport = httpx.AsyncHTTPTransport(limits=UPSTREAM_LIMITS)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        # No phase of the call may outlive the current route's deadline, and a
+        # stalled read gives up exactly when the deadline does (a 504, not a stray ReadTimeout)
+        timeouts = clamp_timeouts(request.extensions.get("timeout", {}))
+        left = remaining()
+        if left is not None:
+            timeouts["read"] = left
+        request.extensions["timeout"] = timeouts
+        return await upstream_guard.call(
+            lambda: self._send(request),
+            is_failure=lambda response: response.status_code >= 500
+        )
+
+    async def _send(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        if path.startswith(PORTAL_PATH_PREFIX):
+            path = path[len(PORTAL_PATH_PREFIX):]
+        started = time.perf_counter()
+        status = "error"
+        try:
+            with span("upstream", path):
+                response = await self._transport.handle_async_request(request)
+                # Read the body here so the limiter slot also covers its transfer
+                await response.aread()
+            status = str(response.status_code)
+            return response
+        except httpx.TimeoutException as e:
+            status = "timeout"
+            left = remaining()
+            if left is not None and left <= 0.05:
+                raise DeadlineExceeded() from e
+            raise
+        finally:
+            UPSTREAM_LATENCY.observe(time.perf_counter() - started, path, status)
+
+    async def aclose(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        await self._transport.aclose()
+
+
+upstream_transport = SharedTransport()
+
+
+def new_portal_client(cookies: Optional[List[CookieTuple]] = None) -> httpx.AsyncClient:
+    """Create a cookie-holding portal client on top of the shared connection pool"""
+    client = httpx.AsyncClient(
+        transport=upstream_transport,
+        timeout=UPSTREAM_TIMEOUT,
+        follow_redirects=True
+    )
+    for name, value, domain, path in cookies or []:
+        client.cookies.set(name, value, domain=domain, path=path)
+    return client
+
+
+def export_cookies(client: httpx.AsyncClient) -> List[CookieTuple]:
+    """Flatten a client's cookie jar into a compact, serializable list"""
+    return [(c.name, c.value, c.domain, c.path) for c in client.cookies.jar]
+
+
+# Session store - compact cookie records with idle TTL, absolute lifetime and size cap.
+# SESSION_BACKEND=sqlite shares sessions between uvicorn workers through SESSION_DB_PATH.
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "sessions.db")
+SESSION_SWEEP_INTERVAL = 60  # seconds
+
+
+def create_session_store() -> SessionStore:
+    limits = dict(
+        idle_ttl=30 * 60,
+        pending_ttl=5 * 60,
+        max_lifetime=12 * 60 * 60,
+        max_entries=10000
+    )
+    if SESSION_BACKEND == "sqlite":
+        return SQLiteSessionStore(path=SESSION_DB_PATH, **limits)
+    if SESSION_BACKEND == "memory":
+        return MemorySessionStore(**limits)
+    raise ValueError(f"Unknown SESSION_BACKEND: {SESSION_BACKEND}")
+
+
+session_store = create_session_store()
+
+
+async def in_store(call: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Run a session store call, from the thread pool when the backend does disk I/O"""
+    if session_store.blocking:
+        return await run_in_threadpool(call, *args, **kwargs)
+    return call(*args, **kwargs)
+
+
+async def session_sweeper():
+    """Periodically drop expired sessions and their cached reports"""
+    while True:
+        await asyncio.sleep(SESSION_SWEEP_INTERVAL)
+        for session_id in await in_store(session_store.sweep):
+            await drop_session(session_id, reason="session expired")
+        # Other workers may have swept sessions whose credentials this process holds
+        remembered = credential_vault.sessions()
+        live = await in_store(lambda: {sid for sid in remembered if sid in session_store})
+        credential_vault.prune(live.__contains__)
+        if snapshot_store is not None:
+            await run_in_threadpool(snapshot_store.prune)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global captcha_pool
+    if WARMUP:
+        start_warm_up()
+    sweeper = asyncio.create_task(session_sweeper())
+    prefetch_task = asyncio.create_task(prefetcher.run()) if PREFETCH_ENABLED else None
+    pool_task = None
+    # Pre-solving is only free with the local solver; OCR.Space calls would burn quota on unused entries
+    if os.path.exists(CAPTCHA_MODEL_PATH) and CAPTCHA_POOL_MAX > 0:
+        captcha_pool = CaptchaPool(
+            warm_login_session,
+            min_size=CAPTCHA_POOL_MIN,
+            max_size=CAPTCHA_POOL_MAX,
+            max_age=CAPTCHA_POOL_MAX_AGE
+        )
+        pool_task = captcha_pool.start()
+    yield
+    sweeper.cancel()
+    watch_hub.close()
+    if prefetch_task is not None:
+        prefetch_task.cancel()
+    if pool_task is not None:
+        pool_task.cancel()
+    await upstream_transport.shutdown()
+    session_store.close()
+    if snapshot_store is not None:
+        snapshot_store.close()
+
 
 app = FastAPI(
     title="SRMAP Student Portal API",
     description="Complete FastAPI wrapper for SRMAP Student Portal - All endpoints available",
-    version="2.0.0"
+    version="2.0.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
+# Time budget per route (seconds); every portal call inside the route shares it.
+# Login may include an OCR.Space round trip; the SSE stream has no deadline.
+ROUTE_DEADLINES: Dict[str, Optional[float]] = {
+    "/api/login": 60.0,
+    "/api/admin/profile": None,
+    "/api/captcha": 20.0,
+    "/api/student/batch": 30.0,
+    "/api/student/watch": None,
+}
+DEFAULT_DEADLINE = 25.0
+
+app.add_middleware(DeadlineMiddleware, budgets=ROUTE_DEADLINES, default=DEFAULT_DEADLINE)
+
 # CORS middleware - allow all origins (adjust for production)
 app.add_middleware(
     CORSMiddleware,
@@ -29,49 +266,122 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["X-Session-ID"],  # Expose custom header to frontend
+    expose_headers=["X-Session-ID", "ETag", "Age", "Warning"],  # Expose custom headers to frontend
 )
 
-BASE_URL = "https://student.srmap.edu.in/srmapstudentcorner"
+# gzip/brotli for JSON and HTML bodies above 1 KB, negotiated via Accept-Encoding
+app.add_middleware(CompressionMiddleware, minimum_size=1024)
+
+# Spans for sampled requests (a no-op unless tracing is switched on)
+app.add_middleware(TracingMiddleware, tracer=tracer)
+
+# Outermost, so timings include every other middleware
+app.add_middleware(MetricsMiddleware, requests=HTTP_REQUESTS, latency=HTTP_LATENCY)
+
+
+@app.exception_handler(UpstreamUnavailable)
+async def upstream_unavailable_handler(request, exc: UpstreamUnavailable):
+    """Portal circuit open or overloaded: fail fast instead of queueing more work"""
+    return FastJSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(int(exc.retry_after + 0.5))}
+    )
+
 
-# In-memory session store (use Redis in production)
-sessions: Dict[str, requests.Session] = {}
+@app.exception_handler(httpx.TimeoutException)
+async def upstream_timeout_handler(request, exc: httpx.TimeoutException):
+    """Portal didn't answer in time"""
+    return FastJSONResponse(status_code=504, content={"detail": "Portal timed out"})
+
+
+@app.exception_handler(httpx.TransportError)
+async def upstream_transport_error_handler(request, exc: httpx.TransportError):
+    """Portal unreachable or dropped the connection"""
+    return FastJSONResponse(status_code=502, content={"detail": "Portal is unreachable"})
 
 # ==================== CAPTCHA SOLVER ====================
 
+# Offline k-NN captcha model trained with `python captcha_solver.py train captcha_samples/`
+CAPTCHA_MODEL_PATH = os.getenv("CAPTCHA_MODEL_PATH", "captcha_model.npz")
+local_captcha_solver = None  # captcha_solver.CaptchaSolver once loaded
+captcha_solver_loaded = False
+captcha_solver_lock = threading.Lock()
+
+
+def load_captcha_solver():
+    """
+    Import captcha_solver and load the offline model on first use, if one has
+    been trained. Blocking (imports numpy and PIL, reads the model), so callers
+    on the event loop go through captcha_tools(). The lock makes concurrent
+    first callers wait for one load instead of importing the module twice;
+    the loaded flag is only set once the solver is in place.
+    """
+    global local_captcha_solver, captcha_solver_loaded
+    with captcha_solver_lock:
+        if captcha_solver_loaded:
+            return local_captcha_solver
+        tools = importlib.import_module("captcha_solver")
+        if os.path.exists(CAPTCHA_MODEL_PATH):
+            local_captcha_solver = tools.CaptchaSolver.load(CAPTCHA_MODEL_PATH)
+            print(f"✓ Loaded captcha model ({len(local_captcha_solver.labels)} glyphs)")
+        else:
+            print(f"⚠️ No captcha model at {CAPTCHA_MODEL_PATH}, falling back to OCR.Space")
+        captcha_solver_loaded = True
+        return local_captcha_solver
+
+
+async def captcha_tools() -> ModuleType:
+    """
+    The captcha_solver module (numpy + PIL, ~100 ms to import), loaded with the
+    model in a worker thread on the first captcha so cold starts don't pay for it
+    """
+    with captcha_solver_lock:
+        loaded = captcha_solver_loaded
+    if not loaded:
+        await run_in_threadpool(load_captcha_solver)
+    return sys.modules["captcha_solver"]
+
+
 async def solve_captcha(image_bytes: bytes) -> str:
+    """
+    Solve SRMAP captcha in-process with the offline model (milliseconds, no quota).
+    Falls back to OCR.Space when no model is loaded or it isn't confident.
+    Returns the captcha text (5 characters)
+    """
+    tools = await captcha_tools()
+    if local_captcha_solver is not None:
+        started = time.perf_counter()
+        try:
+            with span("captcha_preprocess", "local"):
+                mask = tools.preprocess(image_bytes, tools.SOLVER_PREPROCESS)
+            with span("ocr", "local"):
+                captcha_text = local_captcha_solver.solve_mask(mask)
+        except Exception as e:
+            print(f"⚠️ Local captcha solver failed: {e}")
+            captcha_text = ""
+        CAPTCHA_SOLVES.observe(time.perf_counter() - started, "local", "solved" if captcha_text else "failed")
+        if captcha_text:
+            print(f"✓ Captcha solved locally: {captcha_text}")
+            return captcha_text
+    
+    started = time.perf_counter()
+    captcha_text = await solve_captcha_remote(image_bytes, tools)
+    CAPTCHA_SOLVES.observe(time.perf_counter() - started, "ocr_space", "solved" if captcha_text else "failed")
+    return captcha_text
+
+
+async def solve_captcha_remote(image_bytes: bytes, tools: ModuleType) -> str:
     """
     Automatically solve SRMAP captcha using OCR.Space FREE API - OPTIMIZED
     Works in production (Vercel/Render) - no installation needed!
     Returns the captcha text (5 characters)
     """
     try:
-        # Pre-process image for better OCR accuracy
+        # Pre-process image for better OCR accuracy (contrast, threshold, denoise, 2x upscale)
         try:
-            from PIL import ImageEnhance, ImageFilter
-            img = Image.open(io.BytesIO(image_bytes))
-            
-            # Convert to grayscale
-            img = img.convert('L')
-            
-            # Enhance contrast
-            enhancer = ImageEnhance.Contrast(img)
-            img = enhancer.enhance(2.0)
-            
-            # Enhance sharpness
-            enhancer = ImageEnhance.Sharpness(img)
-            img = enhancer.enhance(2.0)
-            
-            # Apply threshold to make it binary (black and white)
-            img = img.point(lambda x: 0 if x < 128 else 255, '1')
-            
-            # Resize for better OCR (larger = better accuracy)
-            img = img.resize((img.width * 2, img.height * 2), Image.Resampling.LANCZOS)
-            
-            # Convert back to bytes
-            img_buffer = io.BytesIO()
-            img.save(img_buffer, format='PNG')
-            image_bytes = img_buffer.getvalue()
+            with span("captcha_preprocess", "ocr_space"):
+                image_bytes = tools.mask_to_png(tools.preprocess(image_bytes, tools.OCR_PREPROCESS))
         except Exception as img_err:
             print(f"⚠️ Image preprocessing failed, using original: {img_err}")
         
@@ -79,7 +389,7 @@ async def solve_captcha(image_bytes: bytes) -> str:
         base64_image = base64.b64encode(image_bytes).decode('utf-8')
         
         # Use OCR.Space FREE API with increased timeout
-        async with httpx.AsyncClient(timeout=30.0) as client:  # Increased timeout for OCR API
+        async with httpx.AsyncClient(timeout=30.0) as client, span("ocr", "ocr_space"):  # Increased timeout for OCR API
             # OCR.Space free API endpoint
             response = await client.post(
                 'https://api.ocr.space/parse/image',
@@ -130,25 +440,168 @@ async def solve_captcha(image_bytes: bytes) -> str:
         print(f"Error solving captcha: {e}")
         return ""
 
+# ==================== CAPTCHA SESSION POOL ====================
+
+# Warm sessions (login page + solved captcha) so /api/login only needs the final POST
+CAPTCHA_POOL_MIN = int(os.getenv("CAPTCHA_POOL_MIN", "2"))
+CAPTCHA_POOL_MAX = int(os.getenv("CAPTCHA_POOL_MAX", "20"))
+CAPTCHA_POOL_MAX_AGE = float(os.getenv("CAPTCHA_POOL_MAX_AGE", "300"))  # seconds, below the portal session timeout
+captcha_pool: Optional[CaptchaPool] = None
+
+
+async def warm_login_session() -> Optional[WarmSession]:
+    """Open a portal session, download its captcha and solve it ahead of time"""
+    async with new_portal_client() as session:
+        await session.get(f"{BASE_URL}/StudentLoginPage")
+        response = await session.get(f"{BASE_URL}/captchas")
+        if response.status_code != 200:
+            return None
+        captcha_text = await solve_captcha(response.content)
+        if not captcha_text:
+            return None
+        return WarmSession(cookies=export_cookies(session), captcha=captcha_text)
+
+
+# ==================== PORTAL RESOURCES ====================
+
+MINUTE = 60
+HOUR = 60 * MINUTE
+
+REPORT_RESOURCE = "students/report/studentreportresources.jsp"
+
+
+@dataclass(frozen=True)
+class PortalResource:
+    """
+    One portal page and the API route that serves it. Every route built from
+    these goes through get_report, so caching, coalescing, ETags, hedging,
+    load shedding and deadlines apply the same way everywhere.
+    """
+    HIGH = "high"  # what students open every day: hedged past its p95
+    NORMAL = "normal"
+    LOW = "low"  # seasonal pages: shed while interactive portal calls are queued
+
+    ids: str
+    title: str
+    route: Optional[str] = None  # None: reachable only by id (batch, watcher) or not at all
+    endpoint: str = REPORT_RESOURCE
+    parser: Optional[Callable[[str], Dict[str, Any]]] = None
+    ttl: float = 0  # seconds; 0 disables caching
+    priority: str = NORMAL
+    timeout: Optional[float] = None  # route deadline; None uses DEFAULT_DEADLINE
+    name: Optional[str] = None  # batch name, for studentreportresources.jsp reports
+
+
 # Endpoint mapping based on the JavaScript from apis.txt
-REPORT_ENDPOINTS = {
-    1: "Profile",
-    2: "Student Wise Subjects",
-    3: "Attendance Details",
-    4: "Reserved",
-    5: "Internal Mark Details",
-    6: "Exam Mark Details / CGPA",
-    7: "Fee Paid Details",
-    10: "Time Table",
-    15: "Current Semester Results",
-    18: "Reserved",
-    21: "Room Details (Hostel)",
-    22: "Earlier Internal Marks",
-    25: "Exam Schedule",
-    35: "Reserved",
-    47: "SAP Details",
-    53: "OD/ML Details"
-}
+REPORT_ENDPOINTS: Dict[str, PortalResource] = {resource.ids: resource for resource in (
+    # studentreportresources.jsp reports
+    PortalResource("1", "Profile", "/api/student/profile", parser=parse_profile, ttl=12 * HOUR,
+                   priority=PortalResource.HIGH, timeout=15.0, name="profile"),
+    PortalResource("2", "Student Wise Subjects", "/api/student/subjects", ttl=6 * HOUR, name="subjects"),
+    PortalResource("3", "Attendance Details", "/api/student/attendance", parser=parse_attendance, ttl=30 * MINUTE,
+                   priority=PortalResource.HIGH, timeout=15.0, name="attendance"),
+    PortalResource("4", "Reserved"),
+    PortalResource("5", "Internal Mark Details", "/api/student/internal-marks", ttl=1 * HOUR,
+                   priority=PortalResource.HIGH, timeout=15.0, name="internal-marks"),
+    PortalResource("6", "Exam Mark Details / CGPA", "/api/student/cgpa", parser=parse_cgpa, ttl=12 * HOUR,
+                   priority=PortalResource.HIGH, timeout=15.0, name="cgpa"),
+    PortalResource("7", "Fee Paid Details", "/api/finance/fee-paid", ttl=6 * HOUR, name="fee-paid"),
+    PortalResource("10", "Time Table", "/api/student/timetable", parser=parse_timetable, ttl=6 * HOUR,
+                   priority=PortalResource.HIGH, timeout=15.0, name="timetable"),
+    PortalResource("15", "Current Semester Results", "/api/student/current-semester-results", ttl=1 * HOUR,
+                   priority=PortalResource.HIGH, timeout=15.0, name="current-semester-results"),
+    PortalResource("18", "Reserved"),
+    PortalResource("21", "Room Details (Hostel)", "/api/hostel/room-details", ttl=12 * HOUR, name="room-details"),
+    PortalResource("22", "Earlier Internal Marks", "/api/student/earlier-internal-marks", ttl=12 * HOUR,
+                   name="earlier-internal-marks"),
+    PortalResource("25", "Exam Schedule", ttl=1 * HOUR),
+    PortalResource("35", "Reserved"),
+    PortalResource("47", "SAP Details", "/api/sap/details", ttl=1 * HOUR, name="sap-details"),
+    PortalResource("53", "OD/ML Details", "/api/student/od-ml-details", ttl=30 * MINUTE, name="od-ml-details"),
+    
+    # Pages with a JSP of their own (forms and instructions; never cached)
+    PortalResource("33", "Student Attendance Marking", "/api/student/student-attendance-marking",
+                   "students/transaction/studentattendance.jsp"),
+    PortalResource("8", "Fee Due Details", "/api/finance/fee-due", "students/transaction/feeduegroups.jsp"),
+    PortalResource("26", "Online Payment Verification", "/api/finance/payment-verification",
+                   "students/onlinepayments/onlinepaymentreconcilation.jsp"),
+    PortalResource("27", "Payment Acknowledgment", "/api/finance/payment-acknowledgment",
+                   "students/report/receiptgeneration.jsp"),
+    PortalResource("54", "Bank Account Details", "/api/finance/bank-details",
+                   "students/transaction/studentbankdetails.jsp"),
+    PortalResource("13", "Exam Registration", "/api/exam/registration",
+                   "students/transaction/semesterexamapplicationinstruction.jsp"),
+    PortalResource("159", "Exam Registration Details", "/api/exam/registration-details",
+                   "students/report/examaplicationreport.jsp"),
+    PortalResource("31", "Hostel Booking (Full Year)", "/api/hostel/booking",
+                   "students/registrations/hostelregistrationinstruction.jsp", priority=PortalResource.LOW, timeout=10.0),
+    PortalResource("19", "Hostel Room Request", "/api/hostel/room-request",
+                   "students/transaction/hostelroomrequest.jsp", priority=PortalResource.LOW, timeout=10.0),
+    PortalResource("32", "Hostel Room Transfer", "/api/hostel/room-transfer",
+                   "students/transaction/hostelroomtransfer.jsp", priority=PortalResource.LOW, timeout=10.0),
+    PortalResource("51", "Transport Registration", "/api/transport/registration",
+                   "students/registrations/transportregistrationinstructions.jsp", priority=PortalResource.LOW, timeout=10.0),
+    PortalResource("52", "Transport Registration Acknowledgment", "/api/transport/acknowledgment",
+                   "students/report/transportconfirmationprint.jsp", priority=PortalResource.LOW, timeout=10.0),
+    PortalResource("39", "Course Registration", "/api/course/registration",
+                   "students/registrations/studentscourseregistrationinstruction2022.jsp"),
+    PortalResource("42", "Course Registration Cancellation", "/api/course/registration-cancellation",
+                   "students/registrations/studentcourseregistrationcancellation.jsp"),
+    PortalResource("152", "Minor Program Registration", "/api/course/minor-registration",
+                   "students/registrations/minorregistrationinstruction.jsp"),
+    PortalResource("43", "SAP Process", "/api/sap/process",
+                   "students/registrations/sapregistrationinstruction.jsp", priority=PortalResource.LOW, timeout=10.0),
+    PortalResource("46", "SAP Withdraw", "/api/sap/withdraw",
+                   "students/registrations/sapwithdraw.jsp", priority=PortalResource.LOW, timeout=10.0),
+    PortalResource("48", "SAP Attachments", "/api/sap/attachments",
+                   "students/registrations/sapattachfiles.jsp", priority=PortalResource.LOW, timeout=10.0),
+    PortalResource("49", "SAP Feedback", "/api/sap/feedback",
+                   "students/registrations/sapfeedback.jsp", priority=PortalResource.LOW, timeout=10.0),
+    PortalResource("9", "End Semester Feedback", "/api/feedback/end-semester",
+                   "students/transaction/subjectwisefeedback.jsp", priority=PortalResource.LOW, timeout=10.0),
+    PortalResource("107", "Announcements", "/api/announcements", "students/report/announcements.jsp"),
+    PortalResource("17", "Change Password", "/api/change-password",
+                   "students/transaction/changepassoword.jsp", priority=PortalResource.LOW, timeout=10.0),
+)}
+
+# Route deadlines come from the registry too
+ROUTE_DEADLINES.update({
+    resource.route: resource.timeout
+    for resource in REPORT_ENDPOINTS.values() if resource.route and resource.timeout
+})
+
+@dataclass(frozen=True)
+class Report:
+    """Parsed fields plus raw html (under "html"), with content digests for ETags"""
+    data: Dict[str, Any]
+    digest: str  # parsed fields only, so page chrome changes don't bust client caches
+    html_digest: str
+    stale: bool = False  # served past its TTL because the portal is unavailable
+    fetched_at: float = 0.0  # epoch seconds of the portal fetch, for the Age header
+
+
+# How long past its TTL a report may still be served while the portal is down
+REPORT_STALE_TTL = 24 * HOUR
+
+# Credentials of sessions that logged in with remember=true; its key also seals the portal
+# cookies in the snapshot database. Give every worker the same CREDENTIAL_VAULT_KEY (a Fernet
+# key) so the prefetching worker can read cookies the others wrote, including after a restart.
+credential_vault = CredentialVault(os.getenv("CREDENTIAL_VAULT_KEY", "").encode() or None)
+
+# Last good copy of each student's reports on disk (SNAPSHOT_DB_PATH="" disables).
+# Served straight away after a restart or cache eviction while a fresh copy loads in the background.
+SNAPSHOT_DB_PATH = os.getenv("SNAPSHOT_DB_PATH", "snapshots.db")
+SNAPSHOT_MAX_AGE = float(os.getenv("SNAPSHOT_MAX_AGE", str(7 * 24 * HOUR)))
+snapshot_store = (
+    SnapshotStore(SNAPSHOT_DB_PATH, max_age=SNAPSHOT_MAX_AGE, vault=credential_vault) if SNAPSHOT_DB_PATH else None
+)
+
+
+# Reports keyed by (session_id, report id)
+report_cache = ReportCache(max_entries=2048, max_bytes=64 * 1024 * 1024)
+
+# In-flight portal calls keyed by (session_id, endpoint, form data)
+upstream_flights = SingleFlight()
 
 
 # ==================== MODELS ====================
@@ -158,6 +611,7 @@ class LoginRequest(BaseModel):
     password: str
     captcha: Optional[str] = None  # Now optional - will be auto-solved if not provided
     session_id: Optional[str] = None
+    remember: bool = False  # Keep credentials (encrypted, in memory) to re-login when the portal session expires
 
 
 class LoginResponse(BaseModel):
@@ -168,6 +622,13 @@ class LoginResponse(BaseModel):
 
 class StudentDataRequest(BaseModel):
     session_id: str
+    refresh: bool = False  # Bypass the report cache and re-fetch from the portal
+    include_html: Optional[bool] = None  # Raw portal page; defaults to off for parsed reports
+    fields: Optional[List[str]] = None  # Projection: ["cgpa", "subjects.grade", ...]
+
+
+class BatchRequest(StudentDataRequest):
+    reports: List[str]  # Report ids ("3") or route names ("attendance")
 
 
 # ==================== ROOT ENDPOINT ====================
@@ -194,7 +655,15 @@ def read_root():
                 "POST /api/student/current-semester-results - Current results",
                 "POST /api/student/earlier-internal-marks - Earlier internal marks",
                 "POST /api/student/od-ml-details - OD/ML details",
-                "POST /api/student/student-attendance-marking - Mark attendance"
+                "POST /api/student/student-attendance-marking - Mark attendance",
+                "POST /api/student/batch - Fetch several reports concurrently",
+                "GET /api/student/schedule?session_id=... - Weekly timetable with period times, subject and room",
+                "GET /api/student/next-class?session_id=... - Class in progress and the next one to start",
+                "GET /api/student/timetable.ics?session_id=... - Timetable as an iCal download (lives as long as the session)",
+                "POST /api/student/timetable/feed - Read-only calendar feed link that outlives the session",
+                "DELETE /api/student/timetable/feed - Revoke the student's calendar feed links",
+                "GET /api/calendar/{token}.ics - Calendar feed for Google Calendar, Outlook or Apple Calendar",
+                "GET /api/student/watch?session_id=... - Live attendance / marks changes (SSE)"
             ],
             "finance": [
                 "POST /api/finance/fee-paid - Fee paid details",
@@ -235,6 +704,22 @@ def read_root():
             "other": [
                 "POST /api/announcements - View announcements",
                 "POST /api/change-password - Change password page"
+            ],
+            "system": [
+                "GET /api/cache/stats - Report cache statistics",
+                "GET /api/upstream/stats - Coalescing, hedging, concurrency limit and circuit breaker state",
+                "GET /health - Liveness check (never calls the portal)",
+                "GET /api/warmup - Load the captcha and parser stacks and open a portal connection ahead of traffic",
+                "GET /metrics - Prometheus metrics",
+                "GET /api/watch/stats - Report watcher statistics",
+                "GET /api/prefetch/stats - Morning prefetch window and last run",
+                "GET /api/captcha/pool - Pre-warmed login session pool statistics"
+            ],
+            "admin": [
+                "GET /api/admin/traces - Recent request traces with per-phase spans",
+                "POST /api/admin/tracing - Switch tracing on/off, set sampling rate",
+                "POST /api/admin/profile?seconds=10 - Sample the event loop, returns collapsed stacks",
+                "GET /api/admin/profile - Profiler status"
             ]
         },
         "docs": {
@@ -247,23 +732,20 @@ def read_root():
 # ==================== AUTHENTICATION ENDPOINTS ====================
 
 @app.get("/api/captcha")
-def get_captcha():
+async def get_captcha():
     """
     Get a new captcha image and create a session
     Returns: PNG image and session_id in headers
     """
-    session = requests.Session()
-    
-    # Get login page to establish session
-    session.get(f"{BASE_URL}/StudentLoginPage")
-    
-    # Get captcha
-    response = session.get(f"{BASE_URL}/captchas")
-    
-    # Generate session ID
-    import uuid
-    session_id = str(uuid.uuid4())
-    sessions[session_id] = session
+    async with new_portal_client() as session:
+        # Get login page to establish session
+        await session.get(f"{BASE_URL}/StudentLoginPage")
+        
+        # Get captcha
+        response = await session.get(f"{BASE_URL}/captchas")
+        
+        # Store the session cookies under a new session ID
+        session_id = await in_store(session_store.create, export_cookies(session))
     
     # Return image with session_id in headers
     return StreamingResponse(
@@ -278,70 +760,120 @@ async def login(credentials: LoginRequest):
     """
     Login to SRMAP portal with automatic captcha solving and retry
     """
-    # Create new session if not provided
-    if not credentials.session_id or credentials.session_id not in sessions:
-        session = requests.Session()
-        # Get login page to establish session
-        session.get(f"{BASE_URL}/StudentLoginPage")
-        
-        # Generate session ID
-        session_id = str(uuid.uuid4())
-        sessions[session_id] = session
-    else:
-        session_id = credentials.session_id
-        session = sessions[session_id]
+    record = await in_store(session_store.get, credentials.session_id) if credentials.session_id else None
     
-    # Auto-solve captcha if not provided (with retry mechanism)
-    captcha_text = credentials.captcha
-    if not captcha_text:
-        max_attempts = 1  # Reduced to 1 attempt to avoid long waits
-        for attempt in range(max_attempts):
-            # Get captcha image
-            captcha_response = session.get(f"{BASE_URL}/captchas")
-            if captcha_response.status_code == 200:
-                captcha_text = await solve_captcha(captcha_response.content)
-                if captcha_text:
-                    print(f"✓ Auto-solved captcha: {captcha_text}")
-                    break
-                else:
-                    print(f"⚠️ Captcha solve failed (OCR timeout or error)")
-            else:
-                print(f"✗ Failed to retrieve captcha")
-        
-        if not captcha_text:
-            return LoginResponse(
-                success=False,
-                message="Auto-captcha solving failed (OCR API timeout). Please try again or contact support if this persists."
-            )
+    # Fast path: a pre-warmed session with its captcha already solved
+    if record is None and not credentials.captcha and captcha_pool is not None:
+        warm = captcha_pool.take()
+        if warm is not None:
+            async with new_portal_client(warm.cookies) as session:
+                failure = await post_login(session, credentials.username, credentials.password, warm.captcha)
+                if failure != LOGIN_BAD_CAPTCHA:
+                    session_id = await in_store(session_store.create, export_cookies(session))
+                    return await record_login(session, session_id, credentials, failure)
+            # A misread pre-solved captcha: fall back once to a fresh session and captcha
+            print("⚠️ Pooled captcha rejected, retrying with a fresh one")
     
-    # Login
+    async with new_portal_client(record.cookies if record else None) as session:
+        # Create new session if not provided
+        if record is None:
+            # Get login page to establish session
+            await session.get(f"{BASE_URL}/StudentLoginPage")
+            session_id = await in_store(session_store.create, export_cookies(session))
+        else:
+            session_id = credentials.session_id
+        
+        return await complete_login(session, session_id, credentials, credentials.captcha)
+
+
+async def solve_login_captcha(session: httpx.AsyncClient) -> str:
+    """Download and solve the captcha bound to a portal session"""
+    captcha_response = await session.get(f"{BASE_URL}/captchas")
+    if captcha_response.status_code != 200:
+        print(f"✗ Failed to retrieve captcha")
+        return ""
+    captcha_text = await solve_captcha(captcha_response.content)
+    if captcha_text:
+        print(f"✓ Auto-solved captcha: {captcha_text}")
+    else:
+        print(f"⚠️ Captcha solve failed (OCR timeout or error)")
+    return captcha_text
+
+
+# Why post_login failed
+LOGIN_BAD_CAPTCHA = "captcha"  # portal answered "Invalid Captcha": worth retrying with a new one
+LOGIN_BAD_CREDENTIALS = "credentials"  # "Invalid Username or Password"
+LOGIN_REJECTED = "rejected"  # back on the login page for another reason
+
+# Captchas tried per automatic re-login before giving up (credentials are kept)
+RELOGIN_ATTEMPTS = 3
+
+
+async def post_login(session: httpx.AsyncClient, username: str, password: str, captcha_text: str) -> Optional[str]:
+    """Post the login form; None if the portal accepted it, otherwise a LOGIN_* reason"""
     login_data = {
-        'txtUserName': credentials.username,
-        'txtAuthKey': credentials.password,
+        'txtUserName': username,
+        'txtAuthKey': password,
         'ccode': captcha_text.upper()
     }
     
-    response = session.post(
+    response = await session.post(
         f"{BASE_URL}/StudentLoginToPortal",
         data=login_data,
         headers={
             'Referer': f'{BASE_URL}/StudentLoginPage',
-            'Origin': 'https://student.srmap.edu.in',
+            'Origin': PORTAL_ORIGIN,
             'Content-Type': 'application/x-www-form-urlencoded'
         },
-        allow_redirects=True
+        follow_redirects=True
     )
     
+    text = response.text
+    if 'Invalid Captcha' in text:
+        return LOGIN_BAD_CAPTCHA
+    if 'Invalid Username or Password' in text:
+        return LOGIN_BAD_CREDENTIALS
+    if 'Invalid' in text or 'login' in str(response.url).lower():
+        return LOGIN_REJECTED
+    return None
+
+
+async def complete_login(session: httpx.AsyncClient, session_id: str, credentials: LoginRequest, captcha_text: Optional[str]) -> LoginResponse:
+    """Solve the captcha if needed, post the login form and record the outcome"""
+    # Auto-solve captcha if not provided (with retry mechanism)
+    if not captcha_text:
+        max_attempts = 1  # Reduced to 1 attempt to avoid long waits
+        for attempt in range(max_attempts):
+            captcha_text = await solve_login_captcha(session)
+            if captcha_text:
+                break
+        
+        if not captcha_text:
+            return LoginResponse(
+                success=False,
+                message="Auto-captcha solving failed (OCR API timeout). Please try again or contact support if this persists."
+            )
+    
     # Check login success
-    if 'Invalid' in response.text or 'login' in response.url.lower():
+    failure = await post_login(session, credentials.username, credentials.password, captcha_text)
+    return await record_login(session, session_id, credentials, failure)
+
+
+async def record_login(session: httpx.AsyncClient, session_id: str, credentials: LoginRequest, failure: Optional[str]) -> LoginResponse:
+    """Keep the session after an accepted login, drop it after a rejected one"""
+    if failure is not None:
         # Remove failed session
-        if session_id in sessions:
-            del sessions[session_id]
+        await drop_session(session_id)
         return LoginResponse(
             success=False,
-            message="Login failed. Check your credentials or try again."
+            message="Invalid captcha. Please try again." if failure == LOGIN_BAD_CAPTCHA
+            else "Login failed. Check your credentials or try again."
         )
     
+    await in_store(session_store.save, session_id, SessionRecord(cookies=export_cookies(session), username=credentials.username))
+    if credentials.remember and not credential_vault.store(session_id, credentials.username, credentials.password):
+        print("⚠️ remember=true ignored: install 'cryptography' to enable the credential vault")
+    
     return LoginResponse(
         success=True,
         message="Login successful (captcha auto-solved)",
@@ -349,23 +881,151 @@ async def login(credentials: LoginRequest):
     )
 
 
+async def relogin(session_id: str) -> bool:
+    """
+    Log a session back into the portal with its remembered credentials after
+    the portal dropped it. A misread captcha is retried with a new one, up to
+    RELOGIN_ATTEMPTS times; only a rejected password forgets the credentials.
+    Concurrent callers share one attempt.
+    """
+    credentials = credential_vault.get(session_id)
+    if credentials is None:
+        return False
+    username, password = credentials
+    
+    async def attempt() -> Optional[str]:
+        """One login with a fresh portal session and captcha; None on success"""
+        warm = captcha_pool.take() if captcha_pool is not None else None
+        async with new_portal_client(warm.cookies if warm else None) as session:
+            if warm is not None:
+                captcha_text = warm.captcha
+            else:
+                await session.get(f"{BASE_URL}/StudentLoginPage")
+                captcha_text = await solve_login_captcha(session)
+                if not captcha_text:
+                    return LOGIN_BAD_CAPTCHA
+            
+            failure = await post_login(session, username, password, captcha_text)
+            if failure is None:
+                record = await in_store(session_store.get, session_id, touch=False)
+                if record is None:
+                    return LOGIN_REJECTED
+                record.cookies = export_cookies(session)
+                await in_store(session_store.save, session_id, record)
+            return failure
+    
+    async def login_again() -> bool:
+        for _ in range(RELOGIN_ATTEMPTS):
+            failure = await attempt()
+            if failure is None:
+                print(f"✓ Re-logged in expired portal session for {username}")
+                return True
+            if failure == LOGIN_BAD_CREDENTIALS:
+                # Password changed or account locked - don't keep retrying with it
+                credential_vault.forget(session_id)
+                return False
+            if failure != LOGIN_BAD_CAPTCHA:
+                return False
+            print(f"⚠️ Re-login captcha rejected for {username}, retrying with a new one")
+        return False
+    
+    return await upstream_flights.do(flight_key(session_id, "StudentLoginToPortal"), login_again)
+
+
+async def drop_session(session_id: str, reason: str = "logged out") -> bool:
+    """Forget a session and everything derived from it"""
+    removed = await in_store(session_store.delete, session_id)
+    report_cache.invalidate(session_id)
+    credential_vault.forget(session_id)
+    if snapshot_store is not None and reason != "session expired":
+        # An idle session stays prefetchable; a logout or a dead portal session doesn't
+        await run_in_threadpool(snapshot_store.forget_session, session_id)
+    watch_hub.stop(session_id, reason=reason)
+    return removed
+
+
 # ==================== STUDENT DATA ENDPOINTS ====================
 
-def get_student_data(session_id: str, ids: str):
-    """Helper function to fetch student data from report resources"""
-    if session_id not in sessions:
+async def get_session(session_id: str) -> SessionRecord:
+    """Look up a live session or reject the request"""
+    with span("session_lookup"):
+        record = await in_store(session_store.get, session_id)
+    if record is None:
         raise HTTPException(status_code=401, detail="Invalid or expired session. Please login again.")
+    if record.username and snapshot_store is not None:
+        # Remembered past the session's idle TTL, for the next morning's prefetch
+        await run_in_threadpool(snapshot_store.seen, record.username.upper(), session_id, record.cookies)
+    return record
+
+
+@asynccontextmanager
+async def portal_session(session_id: str) -> AsyncIterator[httpx.AsyncClient]:
+    """Rebuild the portal client for a session and write back any cookie changes"""
+    record = await get_session(session_id)
+    async with new_portal_client(record.cookies) as session:
+        yield session
+        cookies = export_cookies(session)
+        if cookies != record.cookies:
+            record.cookies = cookies
+            await in_store(session_store.save, session_id, record)
+
+
+# Page fetches are idempotent, so a slow high priority one may be raced by a duplicate
+UPSTREAM_HEDGING = os.getenv("UPSTREAM_HEDGING", "1") == "1"
+report_hedger = Hedger(quantile=0.95, min_delay=0.5, enabled=UPSTREAM_HEDGING)
+
+
+def flight_key(session_id: str, endpoint: str, data: Optional[dict] = None) -> Tuple[str, str, Tuple]:
+    """Identity of a portal call for request coalescing"""
+    return (session_id, endpoint, tuple(sorted((data or {}).items())))
+
+
+def is_login_page(response: httpx.Response) -> bool:
+    """The portal answers requests on an expired session with its login page"""
+    return 'login' in str(response.url).lower() or 'txtAuthKey' in response.text
+
+
+PORTAL_FORM_HEADERS = {
+    'Referer': f'{BASE_URL}/',
+    'Content-Type': 'application/x-www-form-urlencoded'
+}
+
+
+async def portal_post(session_id: str, endpoint: str, data: Optional[dict] = None) -> httpx.Response:
+    """
+    POST to a portal page. If the portal session has expired, log in again with
+    remembered credentials and retry once; otherwise end the session with a 401.
+    """
+    for attempt in range(2):
+        async with portal_session(session_id) as session:
+            response = await session.post(f"{BASE_URL}/{endpoint}", data=data or {}, headers=PORTAL_FORM_HEADERS)
+        if not is_login_page(response):
+            return response
+        if attempt or not await relogin(session_id):
+            break
     
-    session = sessions[session_id]
+    await drop_session(session_id, reason="portal session expired")
+    raise HTTPException(status_code=401, detail="Portal session expired. Please login again.")
+
+
+async def fetch_resource(session_id: str, resource: PortalResource) -> str:
+    """
+    Raw page of a portal resource. High priority pages are hedged past their p95;
+    low priority ones are refused while interactive portal calls are queued.
+    """
+    if resource.priority == PortalResource.LOW and upstream_guard.limiter.queued:
+        raise UpstreamUnavailable(f"Portal busy; {resource.title} is deferred", retry_after=10)
     
-    response = session.post(
-        f"{BASE_URL}/students/report/studentreportresources.jsp",
-        data={'ids': ids},
-        headers={
-            'Referer': f'{BASE_URL}/',
-            'Content-Type': 'application/x-www-form-urlencoded'
-        }
-    )
+    call = lambda: portal_post(session_id, resource.endpoint, {'ids': resource.ids})
+    if resource.priority == PortalResource.HIGH:
+        response = await report_hedger.call(
+            call,
+            key=resource.ids,
+            # Duplicates only help a healthy portal; a struggling one gets no extra load
+            allow=lambda: upstream_guard.breaker.state == CircuitBreaker.CLOSED
+        )
+    else:
+        response = await call()
     
     if response.status_code != 200:
         raise HTTPException(status_code=500, detail="Failed to fetch data from portal")
@@ -373,396 +1033,730 @@ def get_student_data(session_id: str, ids: str):
     return response.text
 
 
-def post_to_endpoint(session_id: str, endpoint: str, data: dict = None):
-    """Helper function to POST to any endpoint"""
-    if session_id not in sessions:
-        raise HTTPException(status_code=401, detail="Invalid or expired session. Please login again.")
+def project_fields(result: Dict[str, Any], fields: List[str]) -> Dict[str, Any]:
+    """
+    Keep only the requested keys. "key.field" keeps one field of a nested dict,
+    or of every record in a list (e.g. "attendance.attendance_percentage").
+    Unknown fields are ignored.
+    """
+    wanted: Dict[str, Optional[set]] = {}
+    for spec in fields:
+        key, _, field = spec.partition(".")
+        if not field:
+            wanted[key] = None
+        elif wanted.get(key, ()) is not None:
+            wanted.setdefault(key, set()).add(field)
     
-    session = sessions[session_id]
+    def pick(item: Any, names: set) -> Any:
+        return {k: v for k, v in item.items() if k in names} if isinstance(item, dict) else item
     
-    response = session.post(
-        f"{BASE_URL}/{endpoint}",
-        data=data or {},
-        headers={
-            'Referer': f'{BASE_URL}/',
-            'Content-Type': 'application/x-www-form-urlencoded'
-        }
-    )
+    projected = {}
+    for key, names in wanted.items():
+        if key not in result:
+            continue
+        value = result[key]
+        if names is None:
+            projected[key] = value
+        elif isinstance(value, list):
+            projected[key] = [pick(item, names) for item in value]
+        else:
+            projected[key] = pick(value, names)
+    return projected
+
+
+def wants_html(request: StudentDataRequest, parsed: bool) -> bool:
+    """Whether the raw portal page goes into the response"""
+    if request.fields:
+        return bool(request.include_html) or "html" in request.fields
+    # Unparsed reports have nothing but the html, so it stays on unless explicitly disabled
+    return request.include_html if request.include_html is not None else not parsed
+
+
+def shape_report(result: Dict[str, Any], request: StudentDataRequest, parsed: bool) -> Dict[str, Any]:
+    """Apply include_html / fields to a (possibly cached) report without mutating it"""
+    include_html = wants_html(request, parsed)
+    if request.fields:
+        shaped = project_fields(result, request.fields)
+        if include_html and "html" in result:
+            shaped["html"] = result["html"]
+        return shaped
+    if include_html or "html" not in result:
+        return result
+    return {key: value for key, value in result.items() if key != "html"}
+
+
+def report_etag(report: Report, request: StudentDataRequest, parsed: bool) -> str:
+    """Weak ETag for one shaped view of a report, derived from the stored digests"""
+    parts = [report.digest]
+    if wants_html(request, parsed):
+        parts.append(report.html_digest)
+    if request.fields:
+        parts.extend(sorted(set(request.fields)))
+    return f'W/"{content_hash(parts)}"'
+
+
+async def get_report(request: StudentDataRequest, resource: PortalResource) -> Report:
+    """
+    Fetch a report through the report cache, then the snapshot store.
+    The parsed result (plus raw html) is cached per session for the report's TTL
+    and kept on disk per student. An outdated snapshot is served at once while a
+    background refresh replaces it; request.refresh forces a new upstream fetch.
+    """
+    record = await get_session(request.session_id)
+    ids, ttl = resource.ids, resource.ttl
+    key = (request.session_id, ids)
+    flight = flight_key(request.session_id, resource.endpoint, {"ids": ids})
+    roll_number = record.username.upper() if record.username and snapshot_store is not None and ttl else None
     
-    if response.status_code != 200:
-        raise HTTPException(status_code=500, detail=f"Failed to fetch data from {endpoint}")
+    async def load() -> Report:
+        html_data = await fetch_resource(request.session_id, resource)
+        report = build_report(resource, html_data)
+        
+        if ttl:
+            # Parsed fields are a subset of the page text, so 2x the html is a safe size estimate
+            report_cache.set(key, report, ttl, size=2 * len(html_data), stale_ttl=REPORT_STALE_TTL)
+        if roll_number:
+            snapshot = Snapshot(report.data, report.digest, report.html_digest, report.fetched_at)
+            await run_in_threadpool(snapshot_store.put, roll_number, ids, snapshot)
+        return report
     
-    return response.text
+    if not request.refresh:
+        cached = report_cache.get(key)
+        if cached is not None:
+            return cached
+        snapshot = await load_snapshot(roll_number, ids)
+        if snapshot is not None:
+            report = Report(snapshot.data, snapshot.digest, snapshot.html_digest, fetched_at=snapshot.fetched_at)
+            if snapshot.age < ttl:
+                # Still within its TTL: as good as a cache entry
+                size = 2 * len(snapshot.data.get("html", ""))
+                report_cache.set(key, report, ttl - snapshot.age, size=size, stale_ttl=REPORT_STALE_TTL)
+            else:
+                revalidate(key, flight, load)
+            return report
+    
+    try:
+        # Concurrent requests for the same report share one portal fetch and one parse
+        return await upstream_flights.do(flight, load)
+    except (UpstreamUnavailable, DeadlineExceeded, httpx.TransportError, HTTPException) as e:
+        # Portal down, overloaded or erroring: an outdated copy beats an error (auth failures still raise)
+        if isinstance(e, HTTPException) and e.status_code < 500:
+            raise
+        stale = report_cache.get_stale(key)
+        if stale is None:
+            snapshot = await load_snapshot(roll_number, ids)
+            if snapshot is None:
+                raise
+            stale = Report(snapshot.data, snapshot.digest, snapshot.html_digest, fetched_at=snapshot.fetched_at)
+        return replace(stale, stale=True)
+
+
+def build_report(resource: PortalResource, html_data: str) -> Report:
+    """Parse a portal page into a Report; the raw html rides along in data["html"]"""
+    if resource.parser:
+        with PARSE_LATENCY.time(resource.ids), span("parse", resource.ids):
+            result = resource.parser(html_data)
+    else:
+        result = {}
+    report = Report(data=result, digest=content_hash(result), html_digest=content_hash(html_data), fetched_at=time.time())
+    result["html"] = html_data
+    return report
 
 
-# ==================== ACADEMIC ENDPOINTS ====================
+async def load_snapshot(roll_number: Optional[str], ids: str) -> Optional[Snapshot]:
+    if roll_number is None:
+        return None
+    with span("snapshot_read", ids):
+        return await run_in_threadpool(snapshot_store.get, roll_number, ids)
 
-@app.post("/api/student/profile")
-def get_profile(request: StudentDataRequest):
-    """Get student profile (ids=1)"""
-    html_data = get_student_data(request.session_id, "1")
-    soup = BeautifulSoup(html_data, 'html.parser')
-    
-    profile = {}
-    tables = soup.find_all('table')
-    for table in tables:
-        rows = table.find_all('tr')
-        for row in rows:
-            cells = row.find_all('td')
-            if len(cells) >= 2:
-                key = cells[0].get_text(strip=True).replace(':', '')
-                value = cells[1].get_text(strip=True)
-                if key and value:
-                    profile[key] = value
-    
-    return {"profile": profile, "html": html_data}
-
-
-@app.post("/api/student/subjects")
-def get_subjects(request: StudentDataRequest):
-    """Get student subjects (ids=2)"""
-    html_data = get_student_data(request.session_id, "2")
-    return {"html": html_data}
-
-
-@app.post("/api/student/attendance")
-def get_attendance(request: StudentDataRequest):
-    """Get attendance details (ids=3)"""
-    html_data = get_student_data(request.session_id, "3")
-    
-    soup = BeautifulSoup(html_data, 'html.parser')
-    attendance = []
-    tables = soup.find_all('table')
-    for table in tables:
-        rows = table.find_all('tr')
-        for row in rows:
-            cells = row.find_all('td')
-            if len(cells) >= 9:
-                subject_code = cells[0].get_text(strip=True) if len(cells) > 0 else ""
-                # Skip header rows
-                if subject_code and subject_code != "Subject Code" and not subject_code.startswith("For any"):
-                    record = {
-                        "subject_code": subject_code,
-                        "subject_name": cells[1].get_text(strip=True) if len(cells) > 1 else "",
-                        "classes_conducted": cells[2].get_text(strip=True) if len(cells) > 2 else "0",
-                        "present": cells[3].get_text(strip=True) if len(cells) > 3 else "0",
-                        "absent": cells[4].get_text(strip=True) if len(cells) > 4 else "0",
-                        "od_ml_taken": cells[5].get_text(strip=True) if len(cells) > 5 else "0",
-                        "present_percentage": cells[6].get_text(strip=True) if len(cells) > 6 else "0",
-                        "od_ml_approved": cells[7].get_text(strip=True) if len(cells) > 7 else "0",
-                        "attendance_percentage": cells[8].get_text(strip=True) if len(cells) > 8 else "0",
-                    }
-                    attendance.append(record)
-    
-    return {"attendance": attendance, "html": html_data}
-
-
-@app.post("/api/student/internal-marks")
-def get_internal_marks(request: StudentDataRequest):
-    """Get internal marks (ids=5)"""
-    html_data = get_student_data(request.session_id, "5")
-    return {"html": html_data}
-
-
-@app.post("/api/student/cgpa")
-def get_cgpa(request: StudentDataRequest):
-    """Get CGPA and exam marks (ids=6)"""
-    html_data = get_student_data(request.session_id, "6")
-    
-    soup = BeautifulSoup(html_data, 'html.parser')
-    
-    # Extract CGPA
-    cgpa = None
-    cgpa_div = soup.find('div', string=lambda text: text and 'CGPA' in text if text else False)
-    if cgpa_div:
-        cgpa_text = cgpa_div.get_text(strip=True)
-        cgpa = cgpa_text.replace('CGPA', '').replace(':', '').strip()
-    
-    # Extract semester results
-    subjects = []
-    tables = soup.find_all('table')
-    for table in tables:
-        rows = table.find_all('tr')
-        for row in rows:
-            cells = row.find_all('td')
-            if len(cells) >= 8:
-                semester = cells[0].get_text(strip=True)
-                subject_code = cells[2].get_text(strip=True)
-                
-                if subject_code and semester:
-                    subject = {
-                        "semester": semester,
-                        "month_year": cells[1].get_text(strip=True),
-                        "subject_code": subject_code,
-                        "subject_name": cells[3].get_text(strip=True),
-                        "credit": cells[4].get_text(strip=True),
-                        "grade": cells[5].get_text(strip=True),
-                        "grade_points": cells[6].get_text(strip=True),
-                        "result": cells[7].get_text(strip=True),
-                    }
-                    subjects.append(subject)
-    
-    return {"cgpa": cgpa, "subjects": subjects, "html": html_data}
-
-
-@app.post("/api/student/timetable")
-def get_timetable(request: StudentDataRequest):
-    """Get timetable (ids=10)"""
-    html_data = get_student_data(request.session_id, "10")
-    
-    soup = BeautifulSoup(html_data, 'html.parser')
-    timetable = []
-    tables = soup.find_all('table')
-    
-    for table in tables:
-        rows = table.find_all('tr')
-        for row in rows:
-            cells = row.find_all('td')
-            # Timetable usually has: Day, Period1, Period2, Period3, etc.
-            if len(cells) >= 2:
-                day = cells[0].get_text(strip=True) if len(cells) > 0 else ""
-                # Skip header rows
-                if day and day not in ["Day", "Days", ""]:
-                    periods = []
-                    for i in range(1, len(cells)):
-                        period_text = cells[i].get_text(strip=True)
-                        if period_text and period_text != "-":
-                            periods.append(period_text)
-                        else:
-                            periods.append("")
-                    
-                    if periods:  # Only add if there are periods
-                        timetable.append({
-                            "day": day,
-                            "periods": periods
-                        })
-    
-    return {"timetable": timetable, "html": html_data}
 
+# (session_id, report id) of snapshot refreshes running in the background
+revalidating: Set[Tuple[str, str]] = set()
 
-@app.post("/api/student/current-semester-results")
-def get_current_results(request: StudentDataRequest):
-    """Get current semester results (ids=15)"""
-    html_data = get_student_data(request.session_id, "15")
-    return {"html": html_data}
 
+def revalidate(key: Tuple[str, str], flight: Tuple, load: Callable[[], Awaitable[Report]]) -> None:
+    """Refresh a report in the background (stale-while-revalidate); failures keep the snapshot"""
+    if key in revalidating:
+        return
+    revalidating.add(key)
+    
+    async def refresh() -> None:
+        try:
+            await upstream_flights.do(flight, load)
+        except Exception as e:
+            print(f"⚠️ Background refresh of report {key[1]} failed: {e}")
+        finally:
+            revalidating.discard(key)
+    
+    # A fresh context: the refresh must not inherit the request's deadline or trace
+    Context().run(asyncio.create_task, refresh())
 
-@app.post("/api/student/earlier-internal-marks")
-def get_earlier_internal_marks(request: StudentDataRequest):
-    """Get earlier internal marks (ids=22)"""
-    html_data = get_student_data(request.session_id, "22")
-    return {"html": html_data}
 
+async def fetch_report(
+    request: StudentDataRequest,
+    resource: PortalResource,
+    if_none_match: Optional[str] = None
+) -> Response:
+    """
+    Serve a report shaped by request.include_html and request.fields, with an ETag.
+    A matching If-None-Match gets a 304; when the report is cached that needs
+    neither a portal call nor serialization.
+    """
+    parsed = resource.parser is not None
+    report = await get_report(request, resource)
+    etag = report_etag(report, request, parsed)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    age = int(time.time() - report.fetched_at) if report.fetched_at else 0
+    if age > 0:
+        headers["Age"] = str(age)
+    if report.stale:
+        headers["Warning"] = '110 - "Response is Stale"'
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return FastJSONResponse(shape_report(report.data, request, parsed), headers=headers)
+
+
+# Report routes by name and by id, used to resolve batch requests
+STUDENT_REPORTS: Dict[str, PortalResource] = {
+    resource.name: resource for resource in REPORT_ENDPOINTS.values() if resource.name
+}
+STUDENT_REPORTS_BY_ID: Dict[str, PortalResource] = {resource.ids: resource for resource in STUDENT_REPORTS.values()}
 
-@app.post("/api/student/od-ml-details")
-def get_od_ml_details(request: StudentDataRequest):
-    """Get OD/ML details (ids=53)"""
-    html_data = get_student_data(request.session_id, "53")
-    return {"html": html_data}
+MAX_BATCH_REPORTS = 16
 
 
-@app.post("/api/student/student-attendance-marking")
-def get_student_attendance_marking(request: StudentDataRequest):
-    """Get student attendance marking (ids=33)"""
-    html_data = post_to_endpoint(request.session_id, "students/transaction/studentattendance.jsp", {"ids": "33"})
-    return {"html": html_data}
+# ==================== REPORT WATCHER ====================
 
+# Reports a watcher polls, and how their records are matched between polls
+WATCHED_REPORTS: Dict[str, WatchSpec] = {
+    "3": WatchSpec(itemgetter("attendance"), key=itemgetter("subject_code")),
+    "5": WatchSpec(lambda data: parse_rows(data["html"])),
+    "6": WatchSpec(itemgetter("subjects"), key=itemgetter("semester", "subject_code")),
+    "15": WatchSpec(lambda data: parse_rows(data["html"])),
+}
+WATCH_RATE = float(os.getenv("WATCH_RATE", "1"))  # portal calls per second across all background work
+WATCH_MIN_INTERVAL = float(os.getenv("WATCH_MIN_INTERVAL", "120"))  # seconds
+WATCH_MAX_INTERVAL = float(os.getenv("WATCH_MAX_INTERVAL", "1800"))  # seconds
+WATCH_MAX_SESSIONS = int(os.getenv("WATCH_MAX_SESSIONS", "200"))
+WATCH_HEARTBEAT = 15  # seconds between keep-alive comments on an idle stream
 
-# ==================== FINANCE ENDPOINTS ====================
 
-@app.post("/api/finance/fee-paid")
-def get_fee_paid(request: StudentDataRequest):
-    """Get fee paid details (ids=7)"""
-    html_data = get_student_data(request.session_id, "7")
-    return {"html": html_data}
+# Background polls yield to interactive traffic: never hedged, and deferred while portal calls are queued
+WATCHED_RESOURCES: Dict[str, PortalResource] = {ids: replace(STUDENT_REPORTS_BY_ID[ids], priority=PortalResource.LOW) for ids in WATCHED_REPORTS}
 
 
-@app.post("/api/finance/fee-due")
-def get_fee_due(request: StudentDataRequest):
-    """Get fee due details (ids=8)"""
-    html_data = post_to_endpoint(request.session_id, "students/transaction/feeduegroups.jsp", {"ids": "8"})
-    return {"html": html_data}
+async def fetch_watched_report(session_id: str, ids: str) -> Dict[str, Any]:
+    """Fresh copy of a watched report; also refreshes the report cache"""
+    if not await in_store(session_store.__contains__, session_id):
+        raise SessionGone(session_id)
+    report = await get_report(StudentDataRequest(session_id=session_id, refresh=True), WATCHED_RESOURCES[ids])
+    return report.data
 
 
-@app.post("/api/finance/payment-verification")
-def get_payment_verification(request: StudentDataRequest):
-    """Get online payment verification (ids=26)"""
-    html_data = post_to_endpoint(request.session_id, "students/onlinepayments/onlinepaymentreconcilation.jsp", {"ids": "26"})
-    return {"html": html_data}
+# Shared by watchers and the prefetcher, so background work as a whole stays within WATCH_RATE
+background_limiter = RateLimiter(WATCH_RATE)
 
+watch_hub = WatchHub(
+    WATCHED_REPORTS,
+    fetch_watched_report,
+    min_interval=WATCH_MIN_INTERVAL,
+    max_interval=WATCH_MAX_INTERVAL,
+    max_sessions=WATCH_MAX_SESSIONS,
+    limiter=background_limiter
+)
 
-@app.post("/api/finance/payment-acknowledgment")
-def get_payment_acknowledgment(request: StudentDataRequest):
-    """Get payment acknowledgment (ids=27)"""
-    html_data = post_to_endpoint(request.session_id, "students/report/receiptgeneration.jsp", {"ids": "27"})
-    return {"html": html_data}
 
+# ==================== PREFETCH ====================
 
-@app.post("/api/finance/bank-details")
-def get_bank_details(request: StudentDataRequest):
-    """Get bank account details (ids=54)"""
-    html_data = post_to_endpoint(request.session_id, "students/transaction/studentbankdetails.jsp", {"ids": "54"})
-    return {"html": html_data}
+# Timetable and attendance are what everyone opens in the 8-9 AM rush; refresh them just before it
+PREFETCH_REPORTS = ("10", "3")
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "1") == "1"
+PREFETCH_WINDOW = parse_window(os.getenv("PREFETCH_WINDOW", "07:25-08:00"))  # IST
 
 
-# ==================== EXAMINATION ENDPOINTS ====================
+async def prefetch_report(roll_number: str, ids: str) -> bool:
+    """
+    Refresh one report into the snapshot store with the portal cookies of the
+    student's latest session, which has usually idled out overnight; the next
+    login is then served from the snapshot. Sessions are never looked up, so
+    prefetching doesn't renew their idle TTL. False if the portal has dropped
+    the session as well (there is nothing to log in with).
+    """
+    student = await run_in_threadpool(snapshot_store.student, roll_number)
+    if student is None:
+        return False
+    session_id, cookies = student
+    resource = STUDENT_REPORTS_BY_ID[ids]
+    async with new_portal_client(cookies) as session:
+        response = await session.post(f"{BASE_URL}/{resource.endpoint}", data={'ids': ids}, headers=PORTAL_FORM_HEADERS)
+    if is_login_page(response):
+        await run_in_threadpool(snapshot_store.forget_session, session_id)
+        return False
+    if response.status_code != 200:
+        raise HTTPException(status_code=500, detail="Failed to fetch data from portal")
+    
+    report = build_report(resource, response.text)
+    snapshot = Snapshot(report.data, report.digest, report.html_digest, report.fetched_at)
+    await run_in_threadpool(snapshot_store.put, roll_number, ids, snapshot)
+    if resource.ttl and await in_store(session_store.__contains__, session_id):
+        size = 2 * len(response.text)
+        report_cache.set((session_id, ids), report, resource.ttl, size=size, stale_ttl=REPORT_STALE_TTL)
+    return True
+
+
+def portal_has_headroom() -> bool:
+    """No interactive call is queued and at most half the portal concurrency limit is in use"""
+    limiter = upstream_guard.limiter
+    return (
+        upstream_guard.breaker.state == CircuitBreaker.CLOSED
+        and limiter.queued == 0
+        and limiter.in_flight < limiter.limit / 2
+    )
 
-@app.post("/api/exam/registration")
-def get_exam_registration(request: StudentDataRequest):
-    """Get exam registration page (ids=13)"""
-    html_data = post_to_endpoint(request.session_id, "students/transaction/semesterexamapplicationinstruction.jsp", {"ids": "13"})
-    return {"html": html_data}
 
+prefetcher = PrefetchScheduler(
+    PREFETCH_REPORTS,
+    prefetch_report,
+    # Students seen in the last day, not live sessions: those idle out long before morning
+    candidates=snapshot_store.recent_students if snapshot_store is not None else lambda since: [],
+    limiter=background_limiter,
+    has_headroom=portal_has_headroom,
+    window=PREFETCH_WINDOW
+)
 
-@app.post("/api/exam/registration-details")
-def get_exam_registration_details(request: StudentDataRequest):
-    """Get exam registration details (ids=159)"""
-    html_data = post_to_endpoint(request.session_id, "students/report/examaplicationreport.jsp", {"ids": "159"})
-    return {"html": html_data}
 
+# Live values for /metrics, read at scrape time
+metrics.gauge("srms_sessions", "Stored sessions, pending and logged in", lambda: len(session_store))
+metrics.gauge("srms_report_cache_entries", "Reports in the cache", lambda: len(report_cache))
+metrics.gauge("srms_report_cache_hit_ratio", "Report cache hit ratio since start", lambda: report_cache.stats()["hit_ratio"])
+metrics.gauge(
+    "srms_report_cache_lookups_total", "Report cache lookups by result",
+    lambda: {("hit",): report_cache.hits, ("miss",): report_cache.misses, ("stale",): report_cache.stale_hits},
+    labels=("result",), kind="counter"
+)
+metrics.gauge("srms_captcha_pool_size", "Pre-solved login sessions ready", lambda: len(captcha_pool) if captcha_pool else None)
+metrics.gauge("srms_watched_sessions", "Sessions with an active report watcher", lambda: len(watch_hub))
+metrics.gauge("srms_upstream_concurrency_limit", "Current adaptive portal concurrency limit", lambda: int(upstream_guard.limiter.limit))
+metrics.gauge("srms_upstream_in_flight", "Portal requests in flight", lambda: upstream_guard.limiter.in_flight)
+metrics.gauge(
+    "srms_upstream_circuit_open", "1 while the portal circuit breaker is not closed",
+    lambda: int(upstream_guard.breaker.state != CircuitBreaker.CLOSED)
+)
+metrics.gauge(
+    "srms_upstream_calls_total", "Portal calls by outcome",
+    lambda: {
+        ("coalesced",): upstream_flights.collapsed,
+        ("hedged",): report_hedger.hedged,
+        ("short_circuited",): upstream_guard.breaker.short_circuited,
+        ("rejected",): upstream_guard.limiter.rejected,
+    },
+    labels=("outcome",), kind="counter"
+)
 
-# ==================== HOSTEL ENDPOINTS ====================
 
-@app.post("/api/hostel/booking")
-def get_hostel_booking(request: StudentDataRequest):
-    """Get hostel booking for full year (ids=31)"""
-    html_data = post_to_endpoint(request.session_id, "students/registrations/hostelregistrationinstruction.jsp", {"ids": "31"})
-    return {"html": html_data}
+# ==================== WARM-UP ====================
 
+# WARMUP=1 pays the first-request costs at startup instead of on the first student:
+# captcha model and numpy/PIL, parser backends, and a pooled TLS connection to the portal.
+# Platforms with a warm-up ping can call GET /api/warmup instead.
+WARMUP = os.getenv("WARMUP", "0") == "1"
+warmup_task: Optional[asyncio.Task] = None
 
-@app.post("/api/hostel/room-details")
-def get_hostel_room_details(request: StudentDataRequest):
-    """Get hostel room details (ids=21)"""
-    html_data = get_student_data(request.session_id, "21")
-    return {"html": html_data}
 
+def warm_up_imports() -> Dict[str, float]:
+    """Blocking part of the warm-up; runs in a worker thread"""
+    started = time.perf_counter()
+    load_captcha_solver()
+    captcha_ms = (time.perf_counter() - started) * 1000
+    
+    started = time.perf_counter()
+    sample = "<table><tr><td>warm-up</td></tr></table>"
+    for resource in REPORT_ENDPOINTS.values():
+        if resource.parser:
+            resource.parser(sample)
+    parsers_ms = (time.perf_counter() - started) * 1000
+    
+    started = time.perf_counter()
+    credential_vault.encrypt(b"warm-up")  # imports cryptography
+    return {
+        "captcha_ms": round(captcha_ms, 1),
+        "parsers_ms": round(parsers_ms, 1),
+        "vault_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
 
-@app.post("/api/hostel/room-request")
-def get_hostel_room_request(request: StudentDataRequest):
-    """Get hostel room request page (ids=19)"""
-    html_data = post_to_endpoint(request.session_id, "students/transaction/hostelroomrequest.jsp", {"ids": "19"})
-    return {"html": html_data}
 
+async def warm_up() -> Dict[str, Any]:
+    timings: Dict[str, Any] = await run_in_threadpool(warm_up_imports)
+    started = time.perf_counter()
+    try:
+        async with new_portal_client() as session:
+            await session.get(f"{BASE_URL}/StudentLoginPage")
+        timings["portal_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    except Exception as e:
+        print(f"⚠️ Warm-up could not reach the portal: {e}")
+        timings["portal_ms"] = None
+    print(f"✓ Warmed up: {timings}")
+    return timings
 
-@app.post("/api/hostel/room-transfer")
-def get_hostel_room_transfer(request: StudentDataRequest):
-    """Get hostel room transfer page (ids=32)"""
-    html_data = post_to_endpoint(request.session_id, "students/transaction/hostelroomtransfer.jsp", {"ids": "32"})
-    return {"html": html_data}
 
+def start_warm_up() -> asyncio.Task:
+    """Start the warm-up once per process; later calls get the same task"""
+    global warmup_task
+    if warmup_task is None:
+        # A fresh context: the warm-up must not inherit a request's deadline or trace
+        warmup_task = Context().run(asyncio.create_task, warm_up())
+    return warmup_task
 
-# ==================== TRANSPORT ENDPOINTS ====================
 
-@app.post("/api/transport/registration")
-def get_transport_registration(request: StudentDataRequest):
-    """Get transport registration (ids=51)"""
-    html_data = post_to_endpoint(request.session_id, "students/registrations/transportregistrationinstructions.jsp", {"ids": "51"})
-    return {"html": html_data}
+# ==================== PORTAL RESOURCE ENDPOINTS ====================
 
+def resource_route(resource: PortalResource) -> Callable[..., Awaitable[Response]]:
+    """POST handler serving one registry entry through fetch_report"""
+    async def handler(request: StudentDataRequest, if_none_match: Optional[str] = Header(None)):
+        return await fetch_report(request, resource, if_none_match)
+    
+    handler.__name__ = "get_" + re.sub(r"\W", "_", resource.route[len("/api/"):])
+    handler.__doc__ = f"{resource.title} (ids={resource.ids})"
+    return handler
 
-@app.post("/api/transport/acknowledgment")
-def get_transport_acknowledgment(request: StudentDataRequest):
-    """Get transport registration acknowledgment (ids=52)"""
-    html_data = post_to_endpoint(request.session_id, "students/report/transportconfirmationprint.jsp", {"ids": "52"})
-    return {"html": html_data}
 
+for resource in REPORT_ENDPOINTS.values():
+    if resource.route:
+        app.add_api_route(resource.route, resource_route(resource), methods=["POST"], summary=resource.title)
 
-# ==================== COURSE REGISTRATION ENDPOINTS ====================
 
-@app.post("/api/course/registration")
-def get_course_registration(request: StudentDataRequest):
-    """Get course registration page (ids=39)"""
-    html_data = post_to_endpoint(request.session_id, "students/registrations/studentscourseregistrationinstruction2022.jsp", {"ids": "39"})
-    return {"html": html_data}
+# ==================== ACADEMIC ENDPOINTS ====================
 
+@app.post("/api/student/batch")
+async def get_batch(request: BatchRequest):
+    """
+    Fetch several reports concurrently in one call.
+    Each report succeeds or fails on its own; failures are listed under "errors".
+    """
+    await get_session(request.session_id)
+    
+    names = list(dict.fromkeys(request.reports))
+    if not names or len(names) > MAX_BATCH_REPORTS:
+        raise HTTPException(status_code=400, detail=f"Request between 1 and {MAX_BATCH_REPORTS} reports")
+    
+    unknown = [name for name in names if name not in STUDENT_REPORTS and name not in STUDENT_REPORTS_BY_ID]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown reports: {', '.join(unknown)}")
+    
+    async def fetch_one(name: str) -> Report:
+        resource = STUDENT_REPORTS.get(name) or STUDENT_REPORTS_BY_ID[name]
+        report = await get_report(request, resource)
+        return replace(report, data=shape_report(report.data, request, resource.parser is not None))
+    
+    outcomes = await asyncio.gather(*(fetch_one(name) for name in names), return_exceptions=True)
+    
+    results = {}
+    errors = {}
+    stale = []
+    ages = {}
+    for name, outcome in zip(names, outcomes):
+        if isinstance(outcome, HTTPException):
+            errors[name] = {"status": outcome.status_code, "detail": outcome.detail}
+        elif isinstance(outcome, UpstreamUnavailable):
+            errors[name] = {"status": 503, "detail": str(outcome)}
+        elif isinstance(outcome, DeadlineExceeded):
+            errors[name] = {"status": 504, "detail": "Deadline exceeded"}
+        elif isinstance(outcome, Exception):
+            errors[name] = {"status": 502, "detail": f"Portal request failed: {type(outcome).__name__}"}
+        else:
+            results[name] = outcome.data
+            ages[name] = int(time.time() - outcome.fetched_at) if outcome.fetched_at else 0
+            if outcome.stale:
+                stale.append(name)
+    
+    return {"results": results, "errors": errors, "stale": stale, "age": ages}
 
-@app.post("/api/course/registration-cancellation")
-def get_course_cancellation(request: StudentDataRequest):
-    """Get course registration cancellation (ids=42)"""
-    html_data = post_to_endpoint(request.session_id, "students/registrations/studentcourseregistrationcancellation.jsp", {"ids": "42"})
-    return {"html": html_data}
+
+@app.get("/api/student/watch")
+async def watch_reports(session_id: str):
+    """
+    Server-Sent Events stream of changes to attendance (3), internal marks (5),
+    exam marks (6) and current results (15). The first poll sets the baseline;
+    afterwards only added / removed / changed records are sent as "change" events.
+    """
+    await get_session(session_id)
+    queue = watch_hub.subscribe(session_id)
+    if queue is None:
+        raise HTTPException(status_code=503, detail="Too many watched sessions, try again later")
+    
+    async def events():
+        try:
+            yield sse_event("ready", {"reports": list(WATCHED_REPORTS)})
+            while True:
+                try:
+                    event, data = await asyncio.wait_for(queue.get(), timeout=WATCH_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"
+                    continue
+                yield sse_event(event, data)
+                if event == "end":
+                    return
+        finally:
+            watch_hub.unsubscribe(session_id, queue)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
-@app.post("/api/course/minor-registration")
-def get_minor_registration(request: StudentDataRequest):
-    """Get minor program registration (ids=152)"""
-    html_data = post_to_endpoint(request.session_id, "students/registrations/minorregistrationinstruction.jsp", {"ids": "152"})
-    return {"html": html_data}
+# ==================== SCHEDULE ====================
 
+# Schedule indexes by timetable digest: built once per distinct timetable, not per request
+schedule_indexes = ScheduleCache(max_entries=1024)
 
-# ==================== SAP ENDPOINTS ====================
 
-@app.post("/api/sap/details")
-def get_sap_details(request: StudentDataRequest):
-    """Get SAP details (ids=47)"""
-    html_data = get_student_data(request.session_id, "47")
-    return {"html": html_data}
+async def get_schedule(session_id: str) -> Tuple[ScheduleIndex, Report]:
+    """The timetable (through the report cache and snapshots) and its schedule index"""
+    report = await get_report(StudentDataRequest(session_id=session_id), STUDENT_REPORTS["timetable"])
+    return schedule_index(report), report
 
 
-@app.post("/api/sap/process")
-def get_sap_process(request: StudentDataRequest):
-    """Get SAP process page (ids=43)"""
-    html_data = post_to_endpoint(request.session_id, "students/registrations/sapregistrationinstruction.jsp", {"ids": "43"})
-    return {"html": html_data}
+def schedule_index(report: Report) -> ScheduleIndex:
+    """Schedule index of a timetable report, shared by every report with the same content"""
+    def build() -> ScheduleIndex:
+        slots = report.data.get("slots")
+        if slots is None:
+            # Copies cached before period times were parsed still have the page
+            slots = parse_timetable(report.data.get("html", ""))["slots"]
+        with span("schedule_index"):
+            return ScheduleIndex(report.data.get("timetable", []), slots)
+    
+    index = schedule_indexes.get(report.digest, build)
+    if not index.slots:
+        raise HTTPException(status_code=404, detail="Timetable has no period times")
+    return index
 
 
-@app.post("/api/sap/withdraw")
-def get_sap_withdraw(request: StudentDataRequest):
-    """Get SAP withdraw page (ids=46)"""
-    html_data = post_to_endpoint(request.session_id, "students/registrations/sapwithdraw.jsp", {"ids": "46"})
-    return {"html": html_data}
+@app.get("/api/student/schedule")
+async def get_weekly_schedule(session_id: str):
+    """Weekly timetable with period times, subject and room per class (back-to-back periods merged)"""
+    index, _ = await get_schedule(session_id)
+    return index.to_dict()
 
 
-@app.post("/api/sap/attachments")
-def get_sap_attachments(request: StudentDataRequest):
-    """Get SAP attachments (ids=48)"""
-    html_data = post_to_endpoint(request.session_id, "students/registrations/sapattachfiles.jsp", {"ids": "48"})
-    return {"html": html_data}
+@app.get("/api/student/next-class")
+async def get_next_class(session_id: str):
+    """
+    The class in progress (if any) and the next one to start, with its start time
+    in IST and seconds until then. Served from the schedule index without
+    re-parsing the timetable.
+    """
+    index, _ = await get_schedule(session_id)
+    now = datetime.now(IST)
+    current, upcoming = index.lookup(now)
+    next_class = None
+    if upcoming is not None:
+        starts_at, scheduled = upcoming
+        next_class = {
+            **scheduled.to_dict(),
+            "starts_at": starts_at.isoformat(),
+            "starts_in": int((starts_at - now).total_seconds()),
+        }
+    return {
+        "now": now.isoformat(timespec="seconds"),
+        "current": current.to_dict() if current else None,
+        "next": next_class,
+    }
 
 
-@app.post("/api/sap/feedback")
-def get_sap_feedback(request: StudentDataRequest):
-    """Get SAP feedback (ids=49)"""
-    html_data = post_to_endpoint(request.session_id, "students/registrations/sapfeedback.jsp", {"ids": "49"})
-    return {"html": html_data}
+@app.get("/api/student/timetable.ics")
+async def get_timetable_ical(session_id: str, if_none_match: Optional[str] = Header(None)):
+    """
+    iCalendar download of the weekly timetable (one recurring event per class).
+    Only works while the session lives; calendar subscriptions should use a
+    feed link from POST /api/student/timetable/feed instead.
+    """
+    index, report = await get_schedule(session_id)
+    return ical_response(index, report, if_none_match)
 
 
-# ==================== FEEDBACK ENDPOINTS ====================
+async def feed_owner(session_id: str) -> str:
+    """Roll number of a logged-in session, for managing its calendar feeds"""
+    record = await get_session(session_id)
+    if snapshot_store is None:
+        raise HTTPException(status_code=503, detail="Calendar feeds need the snapshot store (SNAPSHOT_DB_PATH)")
+    if not record.username:
+        raise HTTPException(status_code=401, detail="Login required")
+    return record.username.upper()
 
-@app.post("/api/feedback/end-semester")
-def get_end_semester_feedback(request: StudentDataRequest):
-    """Get end semester feedback (ids=9)"""
-    html_data = post_to_endpoint(request.session_id, "students/transaction/subjectwisefeedback.jsp", {"ids": "9"})
-    return {"html": html_data}
 
+@app.post("/api/student/timetable/feed")
+async def create_timetable_feed(request: StudentDataRequest, http_request: Request):
+    """
+    Issue a read-only calendar feed link for the student's timetable. The link
+    carries a random token, not the session, and keeps working after the
+    session ends, until revoked with DELETE.
+    """
+    roll_number = await feed_owner(request.session_id)
+    await get_schedule(request.session_id)  # the feed is served from the timetable snapshot this leaves behind
+    token = await run_in_threadpool(snapshot_store.issue_feed, roll_number)
+    if token is None:
+        raise HTTPException(status_code=503, detail="Could not create the calendar feed")
+    return {"url": str(http_request.url_for("get_timetable_feed", token=token))}
 
-# ==================== OTHER ENDPOINTS ====================
 
-@app.post("/api/announcements")
-def get_announcements(request: StudentDataRequest):
-    """Get announcements (ids=107)"""
-    html_data = post_to_endpoint(request.session_id, "students/report/announcements.jsp", {"ids": "107"})
-    return {"html": html_data}
+@app.delete("/api/student/timetable/feed")
+async def revoke_timetable_feeds(request: StudentDataRequest):
+    """Revoke every calendar feed link issued to the student"""
+    roll_number = await feed_owner(request.session_id)
+    return {"revoked": await run_in_threadpool(snapshot_store.revoke_feeds, roll_number)}
 
 
-@app.post("/api/change-password")
-def change_password_page(request: StudentDataRequest):
-    """Get change password page (ids=17)"""
-    html_data = post_to_endpoint(request.session_id, "students/transaction/changepassoword.jsp", {"ids": "17"})
-    return {"html": html_data}
+@app.get("/api/calendar/{token}.ics")
+async def get_timetable_feed(token: str, if_none_match: Optional[str] = Header(None)):
+    """
+    Calendar feed by token, for calendar apps to subscribe to. Served from the
+    student's timetable snapshot (kept fresh by their own visits and the
+    morning prefetch); never touches a session or the portal.
+    """
+    roll_number = await run_in_threadpool(snapshot_store.feed_owner, token) if snapshot_store is not None else None
+    if roll_number is None:
+        raise HTTPException(status_code=404, detail="Unknown or revoked calendar feed")
+    snapshot = await run_in_threadpool(snapshot_store.get, roll_number, STUDENT_REPORTS["timetable"].ids)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="No timetable saved for this feed yet")
+    report = Report(snapshot.data, snapshot.digest, snapshot.html_digest, fetched_at=snapshot.fetched_at)
+    return ical_response(schedule_index(report), report, if_none_match)
+
+
+def ical_response(index: ScheduleIndex, report: Report, if_none_match: Optional[str]) -> Response:
+    """The rendered iCal feed (once per timetable), or a 304 for a matching ETag"""
+    ttl = int(STUDENT_REPORTS["timetable"].ttl)
+    etag = f'W/"ics-{report.digest}"'
+    headers = {"ETag": etag, "Cache-Control": f"private, max-age={ttl}"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(
+        index.to_ical(refresh=timedelta(seconds=ttl)),
+        media_type="text/calendar; charset=utf-8",
+        headers={**headers, "Content-Disposition": 'inline; filename="timetable.ics"'}
+    )
 
 
 # ==================== SESSION MANAGEMENT ====================
 
 @app.delete("/api/logout")
-def logout(request: StudentDataRequest):
+async def logout(request: StudentDataRequest):
     """Logout and clear session"""
-    if request.session_id in sessions:
-        del sessions[request.session_id]
+    if await drop_session(request.session_id):
         return {"message": "Logged out successfully"}
     return {"message": "Session not found"}
 
 
+# ==================== CACHE ====================
+
+@app.get("/api/cache/stats")
+def cache_stats():
+    """Report cache size and hit/miss counters, plus the on-disk snapshot store and schedule indexes"""
+    snapshots = snapshot_store.stats() if snapshot_store is not None else {"enabled": False}
+    return {**report_cache.stats(), "snapshots": snapshots, "schedules": schedule_indexes.stats()}
+
+
+@app.get("/api/watch/stats")
+def watch_stats():
+    """Active report watchers, subscribers and poll counters"""
+    return watch_hub.stats()
+
+
+@app.get("/api/prefetch/stats")
+def prefetch_stats():
+    """Prefetch window, next run and the outcome of the last one"""
+    return {"enabled": PREFETCH_ENABLED, **prefetcher.stats()}
+
+
+@app.get("/api/upstream/stats")
+def upstream_stats():
+    """Coalesced and hedged portal calls, concurrency limit and circuit breaker state"""
+    return {"coalescing": upstream_flights.stats(), "hedging": report_hedger.stats(), **upstream_guard.stats()}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Prometheus text exposition of request, portal, parser and captcha metrics"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/health")
+def health():
+    """Liveness check that never touches the portal"""
+    return {"status": "ok", "portal": upstream_guard.breaker.state}
+
+
+@app.get("/api/warmup")
+async def warmup():
+    """Run the one-time warm-up (if it hasn't run yet) and return its timings"""
+    return await asyncio.shield(start_warm_up())
+
+
+@app.get("/api/captcha/pool")
+def captcha_pool_stats():
+    """Pre-warmed login session pool size and hit/miss counters"""
+    if captcha_pool is None:
+        return {"enabled": False}
+    return {"enabled": True, **captcha_pool.stats()}
+
+
+# ==================== ADMIN ====================
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Check X-Admin-Token; with no ADMIN_TOKEN configured the admin routes don't exist unless ADMIN_OPEN=1"""
+    if ADMIN_TOKEN:
+        if not secrets.compare_digest(x_admin_token or "", ADMIN_TOKEN):
+            raise HTTPException(status_code=403, detail="Admin token required")
+    elif not ADMIN_OPEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+
+
+class TracingConfig(BaseModel):
+    enabled: Optional[bool] = None
+    sample_rate: Optional[float] = None
+    capacity: Optional[int] = None
+
+
+@app.get("/api/admin/traces", dependencies=[Depends(require_admin)])
+def admin_traces(limit: int = Query(50, ge=1, le=1000), min_ms: float = 0.0, path: Optional[str] = None):
+    """Recent traces, newest first; min_ms keeps only slow requests, path one route"""
+    return {"tracing": tracer.stats(), "traces": tracer.recent(limit, min_ms, path)}
+
+
+@app.post("/api/admin/tracing", dependencies=[Depends(require_admin)])
+def admin_tracing(config: TracingConfig):
+    """Switch per-request tracing on or off and set its sampling rate or buffer size"""
+    tracer.configure(config.enabled, config.sample_rate, config.capacity)
+    return tracer.stats()
+
+
+@app.get("/api/admin/profile", dependencies=[Depends(require_admin)])
+def admin_profile_status():
+    """Whether a profile is running, and a summary of the last one"""
+    return profiler.stats()
+
+
+@app.post("/api/admin/profile", response_class=PlainTextResponse, dependencies=[Depends(require_admin)])
+async def admin_profile(
+    seconds: float = Query(10.0, gt=0, le=60),
+    interval: float = Query(0.005, ge=0.001, le=1.0),
+    include_idle: bool = False
+):
+    """
+    Sample this worker's event loop for `seconds` and return collapsed stacks
+    ("frame;frame;frame count" per line) for flamegraph.pl or speedscope.
+    """
+    loop_thread = threading.get_ident()  # async routes run on the event loop thread
+    try:
+        stacks = await run_in_threadpool(profiler.profile, loop_thread, seconds, interval, include_idle)
+    except ProfilerBusy:
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    return PlainTextResponse(stacks)
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,251 @@
+"""
+SRMAP Student Portal - Mock Portal
+Local stand-in for student.srmap.edu.in, for load tests and offline development.
+
+Serves the login page, captcha, login form and report pages from recorded
+fixtures (loginapi.txt, apis.txt, fixtures/reports/<ids>.html), with
+configurable latency, error injection and portal session expiry.
+
+Usage:
+    python mock_portal.py --port 9000 --latency 0.3 --error-rate 0.02
+    SRMAP_BASE_URL=http://127.0.0.1:9000/srmapstudentcorner uvicorn main:app
+
+Runtime knobs: GET/POST /__mock__/config (JSON), GET /__mock__/stats
+"""
+from collections import Counter
+from dataclasses import asdict, dataclass, fields
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs
+import argparse
+import asyncio
+import os
+import random
+import secrets
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import HTMLResponse, RedirectResponse, Response
+from starlette.requests import ClientDisconnect
+
+ROOT = Path(__file__).parent
+REPORT_FIXTURES = ROOT / "fixtures" / "reports"
+PREFIX = "/srmapstudentcorner"
+SESSION_COOKIE = "JSESSIONID"
+
+
+@dataclass
+class MockConfig:
+    """
+    latency:       median response time in seconds
+    jitter:        lognormal sigma around the median (0 = constant latency)
+    error_rate:    share of requests answered with a 500
+    stall_rate:    share of requests that hang for stall_seconds (upstream timeouts)
+    session_ttl:   idle seconds before a portal session expires (0 = never)
+    captcha:       captcha text the login form must match ("" = accept any)
+    password:      password the login form must match ("" = accept any)
+    """
+    latency: float = 0.0
+    jitter: float = 0.0
+    error_rate: float = 0.0
+    stall_rate: float = 0.0
+    stall_seconds: float = 30.0
+    session_ttl: float = 0.0
+    captcha: str = ""
+    password: str = ""
+
+    @classmethod
+    def from_env(cls) -> "MockConfig":
+        values = {}
+        for field in fields(cls):
+            raw = os.getenv(f"MOCK_{field.name.upper()}")
+            if raw is not None:
+                values[field.name] = type(field.default)(raw)
+        return cls(**values)
+
+    def update(self, changes: Dict[str, object]) -> None:
+        for field in fields(self):
+            if field.name in changes:
+                setattr(self, field.name, type(field.default)(changes[field.name]))
+
+
+@dataclass
+class PortalSession:
+    logged_in: bool = False
+    last_seen: float = 0.0
+
+
+def read_fixture(path: Path) -> Optional[str]:
+    try:
+        return path.read_text(encoding="utf-8")
+    except FileNotFoundError:
+        return None
+
+
+def generic_report(ids: str) -> str:
+    """Stand-in page for reports without a recorded fixture"""
+    return (
+        '<div class="x_panel"><table class="table table-bordered">'
+        f"<tr><td>Report</td><td>{ids}</td></tr>"
+        "<tr><td>Status</td><td>No records found</td></tr>"
+        "</table></div>"
+    )
+
+
+config = MockConfig.from_env()
+sessions: Dict[str, PortalSession] = {}
+stats: Counter = Counter()
+
+LOGIN_PAGE = read_fixture(ROOT / "loginapi.txt") or '<form id="frmSL"><input name="txtAuthKey"></form>'
+HOME_PAGE = read_fixture(ROOT / "apis.txt") or "<html><body>Welcome</body></html>"
+CAPTCHA_IMAGE = (ROOT / "sample_captcha.png").read_bytes()
+_reports: Dict[str, str] = {}
+
+
+def report_page(ids: str) -> str:
+    page = _reports.get(ids)
+    if page is None:
+        page = _reports[ids] = read_fixture(REPORT_FIXTURES / f"{ids}.html") or generic_report(ids)
+    return page
+
+
+app = FastAPI(title="Mock SRMAP Portal", docs_url=None, redoc_url=None)
+
+
+@app.middleware("http")
+async def inject_faults(request: Request, call_next):
+    """Latency, stalls and 500s for every portal page; the control routes are exempt"""
+    if request.url.path.startswith("/__mock__"):
+        return await call_next(request)
+    stats["requests"] += 1
+    if config.latency > 0:
+        delay = config.latency * (random.lognormvariate(0, config.jitter) if config.jitter > 0 else 1)
+        await asyncio.sleep(delay)
+    if config.stall_rate > 0 and random.random() < config.stall_rate:
+        stats["stalled"] += 1
+        await asyncio.sleep(config.stall_seconds)
+    if config.error_rate > 0 and random.random() < config.error_rate:
+        stats["errors"] += 1
+        return HTMLResponse("<html><body><h1>HTTP Status 500 - Internal Server Error</h1></body></html>", status_code=500)
+    return await call_next(request)
+
+
+def portal_session(request: Request) -> Tuple[str, PortalSession, bool]:
+    """(session id, session, is_new); expired sessions come back logged out"""
+    session_id = request.cookies.get(SESSION_COOKIE)
+    session = sessions.get(session_id) if session_id else None
+    now = time.monotonic()
+    is_new = session is None
+    if is_new:
+        session_id = secrets.token_hex(16).upper()
+        session = sessions[session_id] = PortalSession()
+    elif config.session_ttl > 0 and now - session.last_seen > config.session_ttl:
+        if session.logged_in:
+            stats["expired"] += 1
+        session.logged_in = False
+    session.last_seen = now
+    return session_id, session, is_new
+
+
+def with_cookie(response: Response, session_id: str, is_new: bool) -> Response:
+    if is_new:
+        response.set_cookie(SESSION_COOKIE, session_id, path=PREFIX, httponly=True)
+    return response
+
+
+async def read_form(request: Request) -> Optional[Dict[str, str]]:
+    """Form fields of a POST; None if the client hung up first (e.g. a cancelled hedge)"""
+    try:
+        body = await request.body()
+    except ClientDisconnect:
+        stats["disconnected"] += 1
+        return None
+    return {key: values[0] for key, values in parse_qs(body.decode("utf-8")).items()}
+
+
+def login_page(error: str = "") -> str:
+    if not error:
+        return LOGIN_PAGE
+    return LOGIN_PAGE.replace('id="divmsg">', f'id="divmsg">{error}', 1)
+
+
+@app.get(f"{PREFIX}/StudentLoginPage", response_class=HTMLResponse)
+async def student_login_page(request: Request):
+    session_id, _, is_new = portal_session(request)
+    return with_cookie(HTMLResponse(login_page()), session_id, is_new)
+
+
+@app.get(f"{PREFIX}/captchas")
+async def captchas(request: Request):
+    session_id, _, is_new = portal_session(request)
+    return with_cookie(Response(CAPTCHA_IMAGE, media_type="image/png"), session_id, is_new)
+
+
+@app.post(f"{PREFIX}/StudentLoginToPortal")
+async def student_login_to_portal(request: Request):
+    session_id, session, is_new = portal_session(request)
+    form = await read_form(request)
+    if form is None:
+        return Response(status_code=499)
+    captcha = form.get("ccode", "")
+    if not form.get("txtUserName") or not captcha or (config.captcha and captcha.upper() != config.captcha.upper()):
+        stats["login_failed"] += 1
+        return with_cookie(HTMLResponse(login_page("Invalid Captcha")), session_id, is_new)
+    if config.password and form.get("txtAuthKey") != config.password:
+        stats["login_failed"] += 1
+        return with_cookie(HTMLResponse(login_page("Invalid Username or Password")), session_id, is_new)
+    session.logged_in = True
+    stats["logins"] += 1
+    return with_cookie(RedirectResponse(f"{PREFIX}/HRDSystem", status_code=302), session_id, is_new)
+
+
+@app.get(f"{PREFIX}/HRDSystem", response_class=HTMLResponse)
+async def hrd_system(request: Request):
+    session_id, session, is_new = portal_session(request)
+    page = HOME_PAGE if session.logged_in else login_page()
+    return with_cookie(HTMLResponse(page), session_id, is_new)
+
+
+@app.post(f"{PREFIX}/students/{{page:path}}")
+async def student_page(page: str, request: Request):
+    """Every report and transaction page; expired sessions are sent back to the login page"""
+    session_id, session, is_new = portal_session(request)
+    if not session.logged_in:
+        stats["login_redirects"] += 1
+        return with_cookie(RedirectResponse(f"{PREFIX}/StudentLoginPage", status_code=302), session_id, is_new)
+    form = await read_form(request)
+    if form is None:
+        return Response(status_code=499)
+    stats["reports"] += 1
+    return with_cookie(HTMLResponse(report_page(form.get("ids", "0"))), session_id, is_new)
+
+
+@app.get("/__mock__/config")
+async def get_config():
+    return asdict(config)
+
+
+@app.post("/__mock__/config")
+async def set_config(request: Request):
+    config.update(await request.json())
+    return asdict(config)
+
+
+@app.get("/__mock__/stats")
+async def get_stats():
+    return {"sessions": len(sessions), **stats}
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Mock SRMAP portal")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    for field in fields(MockConfig):
+        parser.add_argument(f"--{field.name.replace('_', '-')}", type=type(field.default), default=getattr(config, field.name))
+    args = parser.parse_args()
+    config.update(vars(args))
+
+    print(f"✓ Mock portal at http://{args.host}:{args.port}{PREFIX} ({asdict(config)})")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,322 @@
+"""
+SRMAP Student Portal - Report Parsers
+Declarative table extraction for studentreportresources.jsp report pages
+
+Each report declares a TableSchema (layout, column names, header-skip rules,
+minimum cell count). One engine walks the page's table rows and applies the
+schema. The lxml backend is used when installed; BeautifulSoup (html.parser)
+is the fallback and the reference for the output format. Pages with markup
+that libxml2 reads differently (unclosed cells, CDATA, raw-text elements) also
+go to html.parser. Both are imported on first use, so `import parsers` stays
+cheap, and with lxml installed bs4 is normally never loaded.
+"""
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+import importlib.util
+import re
+
+# lxml is optional; set to False to force the html.parser backend (bench_parsers compares both)
+lxml_enabled = importlib.util.find_spec("lxml") is not None
+
+# libxml2 folds \r\n into \n; carriage returns are swapped for a private-use
+# character before parsing and restored in cell text to match html.parser
+_CR_PLACEHOLDER = "\ue000"
+
+# html.parser's get_text() leaves out the contents of these elements
+_NON_TEXT_TAGS = ("script", "style", "template")
+
+_TABLE_START = re.compile(r"<table", re.IGNORECASE)
+
+# Markup that libxml2 reads differently from html.parser: CDATA sections (dropped),
+# tags inside elements whose content it keeps as raw text, and cells or rows left
+# unclosed (html.parser nests them, libxml2 closes them). Such pages go to SoupDocument.
+_LXML_DIVERGES = re.compile(
+    r"<!\[CDATA\[|<plaintext\b"
+    r"|<(textarea|title|xmp|iframe|noembed|noframes)\b[^>]*>[^<]*<(?!/\1\s*>)",
+    re.IGNORECASE,
+)
+_CELL_TAGS = tuple(
+    (re.compile(rf"<{tag}\b", re.IGNORECASE), re.compile(rf"</{tag}\s*>", re.IGNORECASE))
+    for tag in ("td", "th", "tr")
+)
+
+
+@dataclass(frozen=True)
+class TableSchema:
+    """
+    How to turn table rows into output.
+    layout:
+        "records"  - one dict per row, cells named by `columns`
+        "pairs"    - first cell (without ':') -> second cell
+        "labelled" - {columns[0]: first cell, columns[1]: [remaining cells]}
+        "rows"     - raw list of cell texts per row
+    min_cells: rows with fewer <td> cells are ignored
+    required: cells that must be non-empty for a row to count
+    skip_first / skip_prefixes: first-cell values that mark header or footer rows
+    blanks: cell values normalised to "" in labelled rows
+    """
+    layout: str
+    min_cells: int
+    columns: Tuple[str, ...] = ()
+    required: Tuple[int, ...] = ()
+    skip_first: Tuple[str, ...] = ()
+    skip_prefixes: Tuple[str, ...] = ()
+    blanks: Tuple[str, ...] = ()
+
+
+PROFILE_SCHEMA = TableSchema("pairs", min_cells=2)
+
+ATTENDANCE_SCHEMA = TableSchema(
+    "records",
+    min_cells=9,
+    columns=(
+        "subject_code", "subject_name", "classes_conducted", "present", "absent",
+        "od_ml_taken", "present_percentage", "od_ml_approved", "attendance_percentage",
+    ),
+    required=(0,),
+    skip_first=("Subject Code",),
+    skip_prefixes=("For any",),
+)
+
+CGPA_SCHEMA = TableSchema(
+    "records",
+    min_cells=8,
+    columns=(
+        "semester", "month_year", "subject_code", "subject_name",
+        "credit", "grade", "grade_points", "result",
+    ),
+    required=(0, 2),
+)
+
+TIMETABLE_SCHEMA = TableSchema(
+    "labelled",
+    min_cells=2,
+    columns=("day", "periods"),
+    required=(0,),
+    skip_first=("Day", "Days"),
+    blanks=("-",),
+)
+
+ROWS_SCHEMA = TableSchema("rows", min_cells=1)
+
+
+# ==================== BACKENDS ====================
+
+class SoupDocument:
+    """html.parser tree - the reference behaviour"""
+
+    def __init__(self, html: str):
+        from bs4 import BeautifulSoup  # ~80 ms to import; only needed without lxml or for odd pages
+        self.soup = BeautifulSoup(html, "html.parser")
+
+    def rows(self) -> Iterator[list]:
+        # Every <tr> under every <table>, nested tables included, like the original parsers
+        for table in self.soup.find_all("table"):
+            for row in table.find_all("tr"):
+                yield row.find_all("td")
+
+    @staticmethod
+    def text(cell) -> str:
+        return cell.get_text(strip=True)
+
+    def find_div_text(self, needle: str) -> Optional[str]:
+        """get_text(strip=True) of the first <div> whose .string contains needle"""
+        div = self.soup.find("div", string=lambda text: text and needle in text if text else False)
+        return div.get_text(strip=True) if div else None
+
+
+class LxmlDocument:
+    """libxml2 tree with html.parser-compatible text extraction"""
+
+    def __init__(self, html: str):
+        from lxml import etree, html as lxml_html  # ~10 ms to import; done by the first parse or the warm-up
+        self.has_cr = "\r" in html
+        if self.has_cr:
+            html = html.replace("\r", _CR_PLACEHOLDER)
+        self.root = lxml_html.document_fromstring(html)
+        etree.strip_elements(self.root, *_NON_TEXT_TAGS, with_tail=False)
+        if self.has_cr:
+            self.text = self._text_with_cr
+
+    def rows(self) -> Iterator[list]:
+        for table in self.root.iter("table"):
+            for row in table.iter("tr"):
+                yield list(row.iter("td"))
+
+    @staticmethod
+    def text(cell) -> str:
+        return "".join(part.strip() for part in cell.itertext())
+
+    @staticmethod
+    def _text_with_cr(cell) -> str:
+        return "".join(part.replace(_CR_PLACEHOLDER, "\r").strip() for part in cell.itertext())
+
+    def find_div_text(self, needle: str) -> Optional[str]:
+        for div in self.root.iter("div"):
+            string = self._single_string(div)
+            if string and needle in string:
+                return self.text(div)
+        return None
+
+    def _single_string(self, element) -> Optional[str]:
+        """Equivalent of BeautifulSoup's Tag.string: the only child string, recursively"""
+        contents: List[Any] = [element.text] if element.text else []
+        for child in element:
+            contents.append(child)
+            if child.tail:
+                contents.append(child.tail)
+            if len(contents) > 1:
+                return None
+        if len(contents) != 1:
+            return None
+        only = contents[0]
+        if isinstance(only, str):
+            return only.replace(_CR_PLACEHOLDER, "\r") if self.has_cr else only
+        if not isinstance(only.tag, str):  # comment / processing instruction
+            return only.text
+        return self._single_string(only)
+
+
+def table_region(html: str) -> str:
+    """
+    Slice the page down to the span between the first <table and the last </table>,
+    skipping nav boilerplate. Falls back to the whole page if the first match sits
+    inside a <script> or comment.
+    """
+    match = _TABLE_START.search(html)
+    if match is None:
+        return ""
+    start = match.start()
+    lower_head = html[:start].lower()
+    if lower_head.rfind("<script") > lower_head.rfind("</script") or lower_head.rfind("<!--") > lower_head.rfind("-->"):
+        return html
+    end = html.lower().rfind("</table>")
+    return html[start:end + len("</table>")] if end > start else html[start:]
+
+
+def lxml_diverges(html: str) -> bool:
+    """True if the lxml backend would not reproduce html.parser's output for this markup"""
+    if _LXML_DIVERGES.search(html):
+        return True
+    return any(len(opening.findall(html)) != len(closing.findall(html)) for opening, closing in _CELL_TAGS)
+
+
+def parse_document(html: str, region: bool = True):
+    """Parse a report page with the fastest available backend"""
+    if region:
+        html = table_region(html)
+    if lxml_enabled and html.strip() and not lxml_diverges(html):
+        from lxml.etree import ParserError
+        try:
+            return LxmlDocument(html)
+        except (ValueError, ParserError):
+            pass
+    return SoupDocument(html)
+
+
+# ==================== ENGINE ====================
+
+def extract(document, schema: TableSchema) -> Any:
+    """Apply a schema to every table row of a parsed document"""
+    text = document.text
+    min_cells = schema.min_cells
+    required = schema.required
+    skip_first = schema.skip_first
+    skip_prefixes = schema.skip_prefixes
+    layout = schema.layout
+    columns = schema.columns
+
+    output: Any = {} if layout == "pairs" else []
+    for cells in document.rows():
+        if len(cells) < min_cells:
+            continue
+
+        if layout == "pairs":
+            key = text(cells[0]).replace(":", "")
+            value = text(cells[1])
+            if key and value:
+                output[key] = value
+            continue
+
+        texts: Dict[int, str] = {}
+        for index in required:
+            texts[index] = text(cells[index])
+            if not texts[index]:
+                break
+        else:
+            first = texts.get(0)
+            if first is None:
+                first = texts[0] = text(cells[0])
+            if first in skip_first or (skip_prefixes and first.startswith(skip_prefixes)):
+                continue
+
+            if layout == "records":
+                output.append({
+                    name: texts[i] if i in texts else text(cells[i])
+                    for i, name in enumerate(columns)
+                })
+            elif layout == "labelled":
+                rest = []
+                for cell in cells[1:]:
+                    value = text(cell)
+                    rest.append("" if not value or value in schema.blanks else value)
+                if rest:
+                    output.append({columns[0]: first, columns[1]: rest})
+            else:
+                output.append([texts[0]] + [text(cell) for cell in cells[1:]])
+    return output
+
+
+def extract_html(html: str, schema: TableSchema) -> Any:
+    return extract(parse_document(html), schema)
+
+
+# ==================== REPORT PARSERS ====================
+
+def parse_profile(html_data: str) -> Dict[str, Any]:
+    """Profile key/value pairs from the ids=1 report"""
+    return {"profile": extract_html(html_data, PROFILE_SCHEMA)}
+
+
+def parse_attendance(html_data: str) -> Dict[str, Any]:
+    """Per-subject attendance records from the ids=3 report"""
+    return {"attendance": extract_html(html_data, ATTENDANCE_SCHEMA)}
+
+
+def parse_cgpa(html_data: str) -> Dict[str, Any]:
+    """CGPA and per-subject exam results from the ids=6 report"""
+    # The CGPA <div> may sit outside the tables, so this report parses the whole page
+    document = parse_document(html_data, region=False)
+    cgpa = None
+    cgpa_text = document.find_div_text("CGPA")
+    if cgpa_text is not None:
+        cgpa = cgpa_text.replace("CGPA", "").replace(":", "").strip()
+    return {"cgpa": cgpa, "subjects": extract(document, CGPA_SCHEMA)}
+
+
+def parse_timetable(html_data: str) -> Dict[str, Any]:
+    """Day-wise period strings from the ids=10 report, plus the period times of its header row"""
+    document = parse_document(html_data)
+    return {"timetable": extract(document, TIMETABLE_SCHEMA), "slots": timetable_slots(document)}
+
+
+def timetable_slots(document) -> List[str]:
+    """Header cells after "Day" ("09:00-09:50", ...); [] when the page has no header row"""
+    text = document.text
+    for cells in document.rows():
+        if cells and text(cells[0]) in TIMETABLE_SCHEMA.skip_first:
+            return [text(cell) for cell in cells[1:]]
+    return []
+
+
+def parse_rows(html_data: str) -> List[List[str]]:
+    """Raw cell text of every table row, for reports without a dedicated schema"""
+    return extract_html(html_data, ROWS_SCHEMA)
+
+
+REPORT_PARSERS: Dict[str, Callable[[str], Dict[str, Any]]] = {
+    "1": parse_profile,
+    "3": parse_attendance,
+    "6": parse_cgpa,
+    "10": parse_timetable,
+}
@@ -0,0 +1,122 @@
+"""
+SRMAP Student Portal - Prefetch Scheduler
+Off-peak refresh of the reports everyone opens at the start of the day, so the
+morning rush is served from the report cache instead of the portal
+"""
+from datetime import datetime, time as dtime, timedelta, timezone, tzinfo
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, List, Optional, Sequence, Tuple
+import asyncio
+import random
+import time
+
+from report_watcher import RateLimiter
+
+IST = timezone(timedelta(hours=5, minutes=30))
+
+
+def parse_window(spec: str) -> Tuple[dtime, dtime]:
+    """'07:20-08:00' -> (07:20, 08:00)"""
+    start, _, end = spec.partition("-")
+    return dtime.fromisoformat(start.strip()), dtime.fromisoformat(end.strip())
+
+
+class PrefetchScheduler:
+    """
+    Once per day, inside `window` (local time, ending where the peak begins),
+    refreshes `reports` for every student (roll number) seen in the last
+    `active_within` seconds. Each fetch gets a random slot in the window so the load is spread
+    out. Fetches are lowest priority: each one takes a token from the shared
+    background RateLimiter, and waits while has_headroom() reports interactive
+    traffic on the portal. Work still pending when the window closes is skipped.
+    """
+
+    def __init__(
+        self,
+        reports: Sequence[str],
+        fetch: Callable[[str, str], Awaitable[bool]],  # (roll number, report id)
+        candidates: Callable[[float], List[str]],
+        limiter: RateLimiter,
+        has_headroom: Callable[[], bool],
+        window: Tuple[dtime, dtime],
+        active_within: float = 24 * 60 * 60,
+        weekdays: FrozenSet[int] = frozenset(range(6)),  # Monday-Saturday
+        tz: tzinfo = IST
+    ):
+        self.reports = list(reports)
+        self.fetch = fetch
+        self.candidates = candidates
+        self.limiter = limiter
+        self.has_headroom = has_headroom
+        self.window = window
+        self.active_within = active_within
+        self.weekdays = weekdays
+        self.tz = tz
+        self.next_run: Optional[datetime] = None
+        self.last_run: Optional[Dict[str, Any]] = None
+
+    def next_window(self, now: datetime) -> Tuple[datetime, datetime]:
+        """Start and end of the next window that has not ended yet"""
+        day = now.date()
+        while True:
+            start = datetime.combine(day, self.window[0], self.tz)
+            end = datetime.combine(day, self.window[1], self.tz)
+            if day.weekday() in self.weekdays and end > now:
+                return max(start, now), end
+            day += timedelta(days=1)
+
+    async def run(self) -> None:
+        while True:
+            start, end = self.next_window(datetime.now(self.tz))
+            self.next_run = start
+            await asyncio.sleep(max(0.0, (start - datetime.now(self.tz)).total_seconds()))
+            await self.run_window(end)
+            # Step past the window so it isn't picked again
+            await asyncio.sleep(max(0.0, (end - datetime.now(self.tz)).total_seconds()) + 1)
+
+    async def run_window(self, end: datetime) -> Dict[str, Any]:
+        """Spread one round of fetches over the time left until `end`"""
+        deadline = time.monotonic() + max(0.0, (end - datetime.now(self.tz)).total_seconds())
+        students = self.candidates(time.time() - self.active_within)
+        span = max(0.0, deadline - time.monotonic())
+        plan = sorted(
+            (time.monotonic() + random.uniform(0, span * 0.9), roll_number, ids)
+            for roll_number in students for ids in self.reports
+        )
+        run = self.last_run = {
+            "started_at": round(time.time(), 3),
+            "students": len(students),
+            "planned": len(plan),
+            "fetched": 0,
+            "failed": 0,
+            "skipped": 0,
+            "deferred_s": 0.0,
+        }
+        print(f"✓ Prefetching {len(self.reports)} reports for {len(students)} students")
+
+        for index, (due, roll_number, ids) in enumerate(plan):
+            await asyncio.sleep(max(0.0, due - time.monotonic()))
+            # Interactive requests go first: hold back while the portal is busy with them
+            waited = time.monotonic()
+            while not self.has_headroom() and time.monotonic() < deadline:
+                await asyncio.sleep(0.5)
+            run["deferred_s"] = round(run["deferred_s"] + time.monotonic() - waited, 1)
+            if time.monotonic() >= deadline:
+                run["skipped"] = len(plan) - index
+                break
+            await self.limiter.acquire()
+            try:
+                ok = await self.fetch(roll_number, ids)
+            except Exception as e:
+                print(f"⚠️ Prefetch of report {ids} failed: {e}")
+                ok = False
+            run["fetched" if ok else "failed"] += 1
+        run["finished_at"] = round(time.time(), 3)
+        return run
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "reports": self.reports,
+            "window": f"{self.window[0]:%H:%M}-{self.window[1]:%H:%M}",
+            "next_run": self.next_run.isoformat() if self.next_run else None,
+            "last_run": self.last_run,
+        }
@@ -0,0 +1,106 @@
+"""
+SRMAP Student Portal - Report Cache
+Bounded TTL + LRU cache for parsed portal reports
+"""
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+import time
+
+
+class CacheEntry:
+    """A cached value with its expiry time, how long it may still be served stale, and approximate size in bytes"""
+
+    __slots__ = ("value", "expires_at", "stale_until", "size")
+
+    def __init__(self, value: Any, expires_at: float, stale_until: float, size: int):
+        self.value = value
+        self.expires_at = expires_at
+        self.stale_until = stale_until
+        self.size = size
+
+
+class ReportCache:
+    """
+    LRU cache with a per-entry TTL, capped by entry count and total size.
+    Keys are (owner, report_id) tuples so a whole session can be dropped at once.
+    Expired entries are kept for their stale_ttl so get_stale() can serve them
+    while the portal is down.
+    """
+
+    def __init__(self, max_entries: int = 2048, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[Hashable, Hashable], CacheEntry]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.stale_hits = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Tuple[Hashable, Hashable]) -> Optional[Any]:
+        """Return a fresh cached value, or None on a miss"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        now = time.monotonic()
+        if entry.expires_at <= now:
+            if entry.stale_until <= now:
+                self._remove(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry.value
+
+    def get_stale(self, key: Tuple[Hashable, Hashable]) -> Optional[Any]:
+        """Return a cached value even if expired, as long as it is within its stale window"""
+        entry = self._entries.get(key)
+        if entry is None or entry.stale_until <= time.monotonic():
+            return None
+        self.stale_hits += 1
+        return entry.value
+
+    def set(self, key: Tuple[Hashable, Hashable], value: Any, ttl: float, size: int, stale_ttl: float = 0) -> None:
+        """Store a value for ttl seconds (plus stale_ttl as a fallback), evicting least recently used entries if needed"""
+        if ttl <= 0 or size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        expires_at = time.monotonic() + ttl
+        self._entries[key] = CacheEntry(value, expires_at, expires_at + stale_ttl, size)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def invalidate(self, owner: Hashable) -> None:
+        """Drop every entry belonging to one owner (e.g. on logout)"""
+        for key in [k for k in self._entries if k[0] == owner]:
+            self._remove(key)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "stale_hits": self.stale_hits,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def _remove(self, key: Tuple[Hashable, Hashable]) -> None:
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
@@ -0,0 +1,280 @@
+"""
+SRMAP Student Portal - Report Watcher
+Opt-in background polling of a session's reports, pushing only the changed
+records to subscribers (served as Server-Sent Events by main.py)
+"""
+from collections import Counter
+from contextvars import Context
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Set
+import asyncio
+import random
+import time
+
+
+class SessionGone(Exception):
+    """The watched session expired or logged out"""
+
+
+@dataclass(frozen=True)
+class WatchSpec:
+    """How to pull diffable records out of a report and identify them across polls"""
+    records: Callable[[Dict[str, Any]], List[Any]]
+    key: Optional[Callable[[Any], Hashable]] = None  # None: records are compared whole
+
+
+class RateLimiter:
+    """Token bucket: at most `rate` acquisitions per second on average, bursts up to `burst`"""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+def _identity(record: Any) -> Hashable:
+    if isinstance(record, dict):
+        return tuple(sorted(record.items()))
+    if isinstance(record, list):
+        return tuple(record)
+    return record
+
+
+def diff_records(old: List[Any], new: List[Any], key: Optional[Callable[[Any], Hashable]] = None) -> Dict[str, List[Any]]:
+    """
+    Compare two snapshots of a report's records.
+    With a key, records present in both but with different values are "changed";
+    without one, a modified record shows up as removed + added.
+    """
+    if key is None:
+        # Multiset difference, so duplicate rows are counted correctly
+        added_left = Counter(_identity(r) for r in new)
+        added_left.subtract(_identity(r) for r in old)
+        removed_left = Counter({identity: -count for identity, count in added_left.items() if count < 0})
+        added, removed = [], []
+        for record, pending, out in [(r, added_left, added) for r in new] + [(r, removed_left, removed) for r in old]:
+            identity = _identity(record)
+            if pending[identity] > 0:
+                out.append(record)
+                pending[identity] -= 1
+        return {"added": added, "removed": removed, "changed": []}
+
+    old_by_key = {key(r): r for r in old}
+    new_by_key = {key(r): r for r in new}
+    return {
+        "added": [r for k, r in new_by_key.items() if k not in old_by_key],
+        "removed": [r for k, r in old_by_key.items() if k not in new_by_key],
+        "changed": [r for k, r in new_by_key.items() if k in old_by_key and old_by_key[k] != r],
+    }
+
+
+class WatchedReport:
+    """Polling state of one report: its current interval and last snapshot"""
+
+    __slots__ = ("ids", "spec", "interval", "next_poll", "snapshot")
+
+    def __init__(self, ids: str, spec: WatchSpec, interval: float):
+        self.ids = ids
+        self.spec = spec
+        self.interval = interval
+        self.next_poll = 0.0
+        self.snapshot: Optional[List[Any]] = None
+
+
+class SessionWatcher:
+    """
+    Polls one session's reports on an adaptive schedule.
+    A report that just changed is polled again after min_interval; each quiet
+    poll stretches its interval by `backoff` up to max_interval. Every delay is
+    jittered so watchers started together don't poll in lockstep.
+    """
+
+    def __init__(
+        self,
+        session_id: str,
+        specs: Dict[str, WatchSpec],
+        fetch: Callable[[str, str], Awaitable[Dict[str, Any]]],
+        limiter: RateLimiter,
+        min_interval: float,
+        max_interval: float,
+        backoff: float = 2.0,
+        jitter: float = 0.2,
+        queue_size: int = 100
+    ):
+        self.session_id = session_id
+        self.fetch = fetch
+        self.limiter = limiter
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.jitter = jitter
+        self.queue_size = queue_size
+        self.reports = [WatchedReport(ids, spec, min_interval) for ids, spec in specs.items()]
+        self.subscribers: Set[asyncio.Queue] = set()
+        self.polls = 0
+        self.changes = 0
+
+    def subscribe(self) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self.subscribers.add(queue)
+        return queue
+
+    def publish(self, event: str, data: Dict[str, Any]) -> None:
+        for queue in list(self.subscribers):
+            if event == "end":
+                self._put_last(queue, (event, data))
+                continue
+            try:
+                queue.put_nowait((event, data))
+            except asyncio.QueueFull:
+                # A stalled client is closed rather than holding memory, but still told why
+                self.subscribers.discard(queue)
+                self._put_last(queue, ("end", {"reason": "client too slow"}))
+
+    @staticmethod
+    def _put_last(queue: asyncio.Queue, item: Any) -> None:
+        """Queue a terminal event, evicting the oldest one if the queue is full"""
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(item)
+
+    async def run(self) -> None:
+        try:
+            while True:
+                now = time.monotonic()
+                for report in self.reports:
+                    if report.next_poll <= now:
+                        await self.limiter.acquire()
+                        await self.poll(report)
+                if not self.subscribers:
+                    return  # every subscriber was closed for falling behind
+                wake_at = min(report.next_poll for report in self.reports)
+                await asyncio.sleep(max(0.0, wake_at - time.monotonic()))
+        except SessionGone:
+            self.publish("end", {"reason": "session expired"})
+
+    async def poll(self, report: WatchedReport) -> None:
+        self.polls += 1
+        try:
+            records = report.spec.records(await self.fetch(self.session_id, report.ids))
+        except SessionGone:
+            raise
+        except Exception as e:
+            print(f"⚠️ Watcher poll of report {report.ids} failed: {e}")
+            report.interval = min(self.max_interval, report.interval * self.backoff)
+            self._schedule(report)
+            return
+
+        if report.snapshot is not None:
+            delta = diff_records(report.snapshot, records, report.spec.key)
+            if any(delta.values()):
+                self.changes += 1
+                self.publish("change", {"report": report.ids, **delta})
+                report.interval = self.min_interval
+            else:
+                report.interval = min(self.max_interval, report.interval * self.backoff)
+        report.snapshot = records
+        self._schedule(report)
+
+    def _schedule(self, report: WatchedReport) -> None:
+        spread = random.uniform(1 - self.jitter, 1 + self.jitter)
+        report.next_poll = time.monotonic() + report.interval * spread
+
+
+class WatchHub:
+    """
+    Starts a SessionWatcher when a session's first subscriber connects and
+    stops it when the last one leaves or is closed. All watchers share one RateLimiter, so
+    total portal load stays bounded however many sessions are watched.
+    """
+
+    def __init__(
+        self,
+        specs: Dict[str, WatchSpec],
+        fetch: Callable[[str, str], Awaitable[Dict[str, Any]]],
+        rate: float = 1.0,
+        min_interval: float = 2 * 60,
+        max_interval: float = 30 * 60,
+        max_sessions: int = 200,
+        limiter: Optional[RateLimiter] = None
+    ):
+        self.specs = specs
+        self.fetch = fetch
+        self.limiter = limiter or RateLimiter(rate)  # pass one to share a budget with other background work
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.max_sessions = max_sessions
+        self._watchers: Dict[str, SessionWatcher] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._watchers)
+
+    def subscribe(self, session_id: str) -> Optional[asyncio.Queue]:
+        """Join (or start) the session's watcher; None when the hub is full"""
+        watcher = self._watchers.get(session_id)
+        if watcher is None:
+            if len(self._watchers) >= self.max_sessions:
+                return None
+            watcher = SessionWatcher(
+                session_id, self.specs, self.fetch, self.limiter, self.min_interval, self.max_interval
+            )
+            self._watchers[session_id] = watcher
+            # A fresh context: the watcher outlives this request and must not carry its deadline or trace
+            task = self._tasks[session_id] = Context().run(asyncio.create_task, watcher.run())
+            task.add_done_callback(lambda _: self._forget(session_id, watcher))
+        return watcher.subscribe()
+
+    def unsubscribe(self, session_id: str, queue: asyncio.Queue) -> None:
+        watcher = self._watchers.get(session_id)
+        if watcher is None:
+            return
+        watcher.subscribers.discard(queue)
+        if not watcher.subscribers:
+            self._stop(session_id)
+
+    def stop(self, session_id: str, reason: str = "logged out") -> None:
+        """End a session's watcher and tell its subscribers (e.g. on logout)"""
+        watcher = self._watchers.get(session_id)
+        if watcher is not None:
+            watcher.publish("end", {"reason": reason})
+            self._stop(session_id)
+
+    def close(self) -> None:
+        for session_id in list(self._watchers):
+            self._stop(session_id)
+
+    def _stop(self, session_id: str) -> None:
+        self._watchers.pop(session_id, None)
+        task = self._tasks.pop(session_id, None)
+        if task is not None:
+            task.cancel()
+
+    def _forget(self, session_id: str, watcher: SessionWatcher) -> None:
+        """A watcher that ended on its own (session gone, every subscriber closed) leaves the hub"""
+        if self._watchers.get(session_id) is watcher:
+            del self._watchers[session_id]
+            self._tasks.pop(session_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sessions": len(self._watchers),
+            "subscribers": sum(len(w.subscribers) for w in self._watchers.values()),
+            "polls": sum(w.polls for w in self._watchers.values()),
+            "changes": sum(w.changes for w in self._watchers.values()),
+            "max_sessions": self.max_sessions,
+            "rate_per_s": self.limiter.rate,
+        }
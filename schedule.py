@@ -0,0 +1,296 @@
+"""
+SRMAP Student Portal - Schedule Index
+Structured weekly schedule built once per distinct timetable: classes per day
+with period times, subject and room, an O(1) next-class lookup and an iCal feed
+"""
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date, datetime, time as dtime, timedelta, timezone
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+import hashlib
+import re
+
+from prefetch import IST
+
+DAY_NAMES = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+ICAL_DAYS = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+MINUTES_PER_DAY = 24 * 60
+# Periods this close together (minutes) are back-to-back; a longer gap (lunch) splits a class
+MAX_BREAK = 10
+
+# "09:00-09:50", "9.00 - 9.50", "01:20 to 02:10"
+_TIME_SLOT = re.compile(r"(\d{1,2})[:.](\d{2})\s*(?:-|–|to)\s*(\d{1,2})[:.](\d{2})")
+# "CSE 401 (C-204)" -> subject, room
+_PERIOD = re.compile(r"^(.*?)\s*\(([^()]*)\)\s*$")
+
+
+def parse_slot(text: str) -> Optional[Tuple[int, int]]:
+    """'09:00-09:50' -> (540, 590) minutes of the day; None if it isn't a time range"""
+    match = _TIME_SLOT.search(text)
+    if not match:
+        return None
+    h1, m1, h2, m2 = (int(group) for group in match.groups())
+    # No classes run before 7 AM, so smaller hours are afternoon times in 12-hour form
+    h1, h2 = (h + 12 if h < 7 else h for h in (h1, h2))
+    start, end = h1 * 60 + m1, h2 * 60 + m2
+    return (start, end) if 0 <= start < end <= MINUTES_PER_DAY else None
+
+
+@lru_cache(maxsize=64)
+def slot_positions(starts: Tuple[int, ...]) -> bytes:
+    """
+    For every minute of the day, how many periods have started by then.
+    Shared by every index with the same period times (usually all of them).
+    """
+    table = bytearray(MINUTES_PER_DAY)
+    position = 0
+    for minute in range(MINUTES_PER_DAY):
+        while position < len(starts) and starts[position] <= minute:
+            position += 1
+        table[minute] = position
+    return bytes(table)
+
+
+def _clock(minute: int) -> str:
+    return f"{minute // 60:02d}:{minute % 60:02d}"
+
+
+@dataclass(frozen=True)
+class ScheduledClass:
+    """One class on one weekday; back-to-back periods of the same class (labs) are merged, but not across a break"""
+    day: int  # 0 = Monday
+    first: int  # index of the first period in ScheduleIndex.slots
+    last: int
+    start: int  # minutes since midnight
+    end: int
+    subject: str
+    room: Optional[str]
+    periods: Tuple[int, ...]  # timetable column numbers, 1-based
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "day": DAY_NAMES[self.day],
+            "periods": list(self.periods),
+            "start": _clock(self.start),
+            "end": _clock(self.end),
+            "subject": self.subject,
+            "room": self.room,
+        }
+
+
+class ScheduleIndex:
+    """
+    Weekly schedule from a parsed timetable (parse_timetable output). Lookups go
+    through precomputed tables: minute of the day -> period position (shared),
+    and per weekday, period position -> class held / next class to start.
+    Periods whose header has no readable time are left out.
+    """
+
+    def __init__(self, timetable: Sequence[Dict[str, Any]], slots: Sequence[str]):
+        columns = [(column, parse_slot(text)) for column, text in enumerate(slots, start=1)]
+        columns = [(column, span) for column, span in columns if span is not None]
+        columns.sort(key=lambda item: item[1])
+        self.slots: List[Tuple[int, int]] = [span for _, span in columns]
+        self.columns: List[int] = [column for column, _ in columns]
+        self.days: Dict[int, List[ScheduledClass]] = {}
+        self._ical: Optional[str] = None
+
+        day_numbers = {name[:3].lower(): number for number, name in enumerate(DAY_NAMES)}
+        for row in timetable:
+            day = day_numbers.get(str(row.get("day", ""))[:3].lower())
+            if day is None:
+                continue
+            periods = row.get("periods") or []
+            texts = [periods[column - 1] if column <= len(periods) else "" for column in self.columns]
+            self.days[day] = self._classes(day, texts)
+
+        count = len(self.slots)
+        self._positions = slot_positions(tuple(start for start, _ in self.slots))
+        # _held[day][i]: class in period i; _upcoming[day][i]: (days ahead, first class starting at period >= i)
+        self._held: List[List[Optional[ScheduledClass]]] = [[None] * count for _ in range(7)]
+        self._upcoming: List[List[Optional[Tuple[int, ScheduledClass]]]] = [[None] * (count + 1) for _ in range(7)]
+        for day, classes in self.days.items():
+            for scheduled in classes:
+                for position in range(scheduled.first, scheduled.last + 1):
+                    self._held[day][position] = scheduled
+
+        # Walk two weeks backwards so the end of the week sees the start of the next one
+        upcoming: Optional[Tuple[int, ScheduledClass]] = None
+        for absolute in range(13, -1, -1):
+            classes = self.days.get(absolute % 7, [])
+            pending = len(classes)
+            for position in range(count, -1, -1):
+                while pending and classes[pending - 1].first >= position:
+                    pending -= 1
+                    upcoming = (absolute, classes[pending])
+                if absolute < 7 and upcoming is not None:
+                    self._upcoming[absolute][position] = (upcoming[0] - absolute, upcoming[1])
+
+    def _classes(self, day: int, texts: List[str]) -> List[ScheduledClass]:
+        classes: List[ScheduledClass] = []
+        position = 0
+        while position < len(texts):
+            text = texts[position].strip()
+            if not text:
+                position += 1
+                continue
+            last = position
+            while (
+                last + 1 < len(texts)
+                and texts[last + 1].strip() == text
+                and self.slots[last + 1][0] - self.slots[last][1] <= MAX_BREAK
+            ):
+                last += 1
+            match = _PERIOD.match(text)
+            subject, room = (match.group(1), match.group(2).strip() or None) if match else (text, None)
+            classes.append(ScheduledClass(
+                day=day,
+                first=position,
+                last=last,
+                start=self.slots[position][0],
+                end=self.slots[last][1],
+                subject=subject,
+                room=room,
+                periods=tuple(self.columns[position:last + 1]),
+            ))
+            position = last + 1
+        return classes
+
+    def __len__(self) -> int:
+        return sum(len(classes) for classes in self.days.values())
+
+    def lookup(self, now: datetime) -> Tuple[Optional[ScheduledClass], Optional[Tuple[datetime, ScheduledClass]]]:
+        """(class in progress at `now`, (start, class) of the next one to start); `now` in the timetable's timezone"""
+        day = now.weekday()
+        minute = now.hour * 60 + now.minute
+        position = self._positions[minute]
+        current = None
+        if position and minute < self.slots[position - 1][1]:
+            current = self._held[day][position - 1]
+        upcoming = self._upcoming[day][position]
+        if upcoming is None:
+            return current, None
+        days_ahead, scheduled = upcoming
+        start = datetime.combine(
+            now.date() + timedelta(days=days_ahead),
+            dtime(scheduled.start // 60, scheduled.start % 60),
+            now.tzinfo
+        )
+        return current, (start, scheduled)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "slots": [{"period": column, "start": _clock(start), "end": _clock(end)}
+                      for column, (start, end) in zip(self.columns, self.slots)],
+            "days": [
+                {"day": DAY_NAMES[day], "classes": [scheduled.to_dict() for scheduled in self.days[day]]}
+                for day in sorted(self.days)
+            ],
+        }
+
+    def to_ical(self, name: str = "SRMAP Timetable", refresh: timedelta = timedelta(hours=6), today: Optional[date] = None) -> str:
+        """
+        VCALENDAR with one weekly recurring event per class, starting in the
+        current week. Rendered once per index and reused.
+        """
+        if self._ical is not None:
+            return self._ical
+        today = today or datetime.now(IST).date()
+        monday = today - timedelta(days=today.weekday())
+        hours = max(1, int(refresh.total_seconds() // 3600))
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        lines = [
+            "BEGIN:VCALENDAR",
+            "VERSION:2.0",
+            "PRODID:-//SRMAP Student Portal API//Timetable//EN",
+            "CALSCALE:GREGORIAN",
+            "METHOD:PUBLISH",
+            f"X-WR-CALNAME:{_escape(name)}",
+            "X-WR-TIMEZONE:Asia/Kolkata",
+            f"REFRESH-INTERVAL;VALUE=DURATION:PT{hours}H",
+            f"X-PUBLISHED-TTL:PT{hours}H",
+            "BEGIN:VTIMEZONE",
+            "TZID:Asia/Kolkata",
+            "BEGIN:STANDARD",
+            "DTSTART:19700101T000000",
+            "TZOFFSETFROM:+0530",
+            "TZOFFSETTO:+0530",
+            "TZNAME:IST",
+            "END:STANDARD",
+            "END:VTIMEZONE",
+        ]
+        for day in sorted(self.days):
+            first_date = monday + timedelta(days=day)
+            for scheduled in self.days[day]:
+                uid = hashlib.blake2b(
+                    f"{day}|{scheduled.periods}|{scheduled.subject}|{scheduled.room}".encode("utf-8"), digest_size=10
+                ).hexdigest()
+                periods = ", ".join(str(period) for period in scheduled.periods)
+                lines += [
+                    "BEGIN:VEVENT",
+                    f"UID:{uid}@srmap-portal-api",
+                    f"DTSTAMP:{stamp}",
+                    f"DTSTART;TZID=Asia/Kolkata:{first_date:%Y%m%d}T{_clock(scheduled.start).replace(':', '')}00",
+                    f"DTEND;TZID=Asia/Kolkata:{first_date:%Y%m%d}T{_clock(scheduled.end).replace(':', '')}00",
+                    f"RRULE:FREQ=WEEKLY;BYDAY={ICAL_DAYS[day]}",
+                    f"SUMMARY:{_escape(scheduled.subject)}",
+                ]
+                if scheduled.room:
+                    lines.append(f"LOCATION:{_escape(scheduled.room)}")
+                lines += [f"DESCRIPTION:{_escape('Period ' + periods)}", "END:VEVENT"]
+        lines.append("END:VCALENDAR")
+        self._ical = "".join(_fold(line) + "\r\n" for line in lines)
+        return self._ical
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+
+def _fold(line: str) -> str:
+    """RFC 5545 line folding at 75 octets"""
+    data = line.encode("utf-8")
+    parts = []
+    while True:
+        limit = 74 if parts else 75  # continuation lines start with a space
+        if len(data) <= limit:
+            parts.append(data.decode("utf-8"))
+            return "\r\n ".join(parts)
+        cut = limit
+        while (data[cut] & 0xC0) == 0x80:  # don't split a UTF-8 sequence
+            cut -= 1
+        parts.append(data[:cut].decode("utf-8"))
+        data = data[cut:]
+
+
+class ScheduleCache:
+    """
+    Schedule indexes keyed by the timetable's content digest, so an index is
+    built once per distinct timetable and shared by every session (and every
+    student of a section) that fetched the same one
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._indexes: "OrderedDict[str, ScheduleIndex]" = OrderedDict()
+        self.hits = 0
+        self.builds = 0
+
+    def __len__(self) -> int:
+        return len(self._indexes)
+
+    def get(self, digest: str, build: Callable[[], ScheduleIndex]) -> ScheduleIndex:
+        index = self._indexes.get(digest)
+        if index is not None:
+            self._indexes.move_to_end(digest)
+            self.hits += 1
+            return index
+        index = self._indexes[digest] = build()
+        self.builds += 1
+        while len(self._indexes) > self.max_entries:
+            self._indexes.popitem(last=False)
+        return index
+
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._indexes), "max_entries": self.max_entries, "hits": self.hits, "builds": self.builds}
@@ -0,0 +1,234 @@
+"""
+SRMAP Student Portal - Session Store
+Expiring, size-bounded store of portal sessions (cookie jar + timestamps)
+
+Two backends share one interface:
+- MemorySessionStore: per-process, fastest, single worker only
+- SQLiteSessionStore: WAL-mode database file shared by every worker on the host
+"""
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+import json
+import sqlite3
+import threading
+import time
+import uuid
+
+# (name, value, domain, path) - enough to rebuild the portal cookie jar
+CookieTuple = Tuple[str, str, str, str]
+
+
+@dataclass
+class SessionRecord:
+    """Everything needed to resume a portal session without keeping a live client around"""
+    cookies: List[CookieTuple] = field(default_factory=list)
+    created_at: float = field(default_factory=time.time)
+    last_seen: float = field(default_factory=time.time)
+    username: Optional[str] = None
+
+
+class SessionStore(ABC):
+    """
+    Session store with idle TTL, absolute lifetime and a maximum entry count.
+    Sessions that never completed a login (captcha fetched, login never posted)
+    expire after the shorter pending_ttl.
+    """
+
+    # True when calls do disk I/O and should be made from a thread pool rather than the event loop
+    blocking = False
+
+    def __init__(
+        self,
+        idle_ttl: float = 30 * 60,
+        pending_ttl: float = 5 * 60,
+        max_lifetime: float = 12 * 60 * 60,
+        max_entries: int = 10000
+    ):
+        self.idle_ttl = idle_ttl
+        self.pending_ttl = pending_ttl
+        self.max_lifetime = max_lifetime
+        self.max_entries = max_entries
+
+    def __contains__(self, session_id: str) -> bool:
+        return self.get(session_id, touch=False) is not None
+
+    def create(self, cookies: List[CookieTuple]) -> str:
+        """Store a new session and return its id"""
+        session_id = str(uuid.uuid4())
+        self.save(session_id, SessionRecord(cookies=cookies))
+        return session_id
+
+    def is_expired(self, record: SessionRecord, now: float) -> bool:
+        idle_ttl = self.idle_ttl if record.username else self.pending_ttl
+        return now - record.last_seen > idle_ttl or now - record.created_at > self.max_lifetime
+
+    @abstractmethod
+    def __len__(self) -> int:
+        ...
+
+    @abstractmethod
+    def get(self, session_id: str, touch: bool = True) -> Optional[SessionRecord]:
+        """Return a live session, dropping it if it has expired"""
+
+    @abstractmethod
+    def save(self, session_id: str, record: SessionRecord) -> None:
+        """Insert or update a session"""
+
+    @abstractmethod
+    def delete(self, session_id: str) -> bool:
+        ...
+
+    @abstractmethod
+    def sweep(self) -> List[str]:
+        """Remove every expired session (and any evicted over max_entries) and return the removed ids"""
+
+    def close(self) -> None:
+        pass
+
+
+class MemorySessionStore(SessionStore):
+    """In-process store backed by an OrderedDict in LRU order; save() evicts over max_entries"""
+
+    def __init__(self, **limits):
+        super().__init__(**limits)
+        self._records: "OrderedDict[str, SessionRecord]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def get(self, session_id: str, touch: bool = True) -> Optional[SessionRecord]:
+        record = self._records.get(session_id)
+        if record is None:
+            return None
+        now = time.time()
+        if self.is_expired(record, now):
+            self.delete(session_id)
+            return None
+        if touch:
+            record.last_seen = now
+            self._records.move_to_end(session_id)
+        return record
+
+    def save(self, session_id: str, record: SessionRecord) -> None:
+        self._records[session_id] = record
+        self._records.move_to_end(session_id)
+        while len(self._records) > self.max_entries:
+            self._records.popitem(last=False)
+
+    def delete(self, session_id: str) -> bool:
+        return self._records.pop(session_id, None) is not None
+
+    def sweep(self) -> List[str]:
+        now = time.time()
+        expired = [sid for sid, record in self._records.items() if self.is_expired(record, now)]
+        for session_id in expired:
+            del self._records[session_id]
+        return expired
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Store shared between processes through a WAL-mode SQLite file.
+    Cookies are serialized as JSON so any worker can rebuild the portal client.
+    last_seen is only written back every touch_interval seconds to keep reads cheap.
+    max_entries is enforced by sweep() rather than on every save, so the table
+    may run over it by the logins of one sweep interval.
+    """
+
+    blocking = True
+
+    def __init__(self, path: str = "sessions.db", touch_interval: float = 30, **limits):
+        super().__init__(**limits)
+        self.path = path
+        self.touch_interval = touch_interval
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        # Opened lazily so each forked worker gets its own connection
+        if self._connection is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS sessions (
+                    session_id TEXT PRIMARY KEY,
+                    cookies TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_seen REAL NOT NULL,
+                    username TEXT
+                )"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_last_seen ON sessions (last_seen)")
+            self._connection = conn
+        return self._connection
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def get(self, session_id: str, touch: bool = True) -> Optional[SessionRecord]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT cookies, created_at, last_seen, username FROM sessions WHERE session_id = ?",
+                (session_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        record = SessionRecord(
+            cookies=[tuple(c) for c in json.loads(row[0])],
+            created_at=row[1],
+            last_seen=row[2],
+            username=row[3]
+        )
+        now = time.time()
+        if self.is_expired(record, now):
+            self.delete(session_id)
+            return None
+        if touch and now - record.last_seen > self.touch_interval:
+            record.last_seen = now
+            with self._lock:
+                self._conn.execute("UPDATE sessions SET last_seen = ? WHERE session_id = ?", (now, session_id))
+        return record
+
+    def save(self, session_id: str, record: SessionRecord) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, cookies, created_at, last_seen, username) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (session_id, json.dumps(record.cookies), record.created_at, record.last_seen, record.username)
+            )
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            return self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,)).rowcount > 0
+
+    def sweep(self) -> List[str]:
+        now = time.time()
+        expired_where = (
+            "(? - last_seen) > CASE WHEN username IS NULL THEN ? ELSE ? END OR (? - created_at) > ?"
+        )
+        params = (now, self.pending_ttl, self.idle_ttl, now, self.max_lifetime)
+        with self._lock:
+            expired = [row[0] for row in self._conn.execute(
+                f"SELECT session_id FROM sessions WHERE {expired_where}", params
+            )]
+            if expired:
+                self._conn.execute(f"DELETE FROM sessions WHERE {expired_where}", params)
+            overflow = self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                evicted = [row[0] for row in self._conn.execute(
+                    "SELECT session_id FROM sessions ORDER BY last_seen LIMIT ?", (overflow,)
+                )]
+                self._conn.executemany("DELETE FROM sessions WHERE session_id = ?", [(sid,) for sid in evicted])
+                expired.extend(evicted)
+        return expired
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
@@ -0,0 +1,45 @@
+"""
+SRMAP Student Portal - Request Coalescing
+Concurrent identical upstream calls share one in-flight task
+"""
+from typing import Any, Awaitable, Callable, Dict, Hashable
+import asyncio
+
+
+class SingleFlight:
+    """
+    Run at most one call per key at a time; callers arriving while it is in
+    flight await the same result (or exception) instead of starting their own.
+    The work runs in its own task, so a caller disconnecting does not cancel
+    it for the others.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self.leaders = 0
+        self.collapsed = 0
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._calls.get(key)
+        if task is None:
+            self.leaders += 1
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda _, key=key: self._calls.pop(key, None))
+            # Retrieve the exception even if every caller was cancelled, to avoid "never retrieved" warnings
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        else:
+            self.collapsed += 1
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, Any]:
+        calls = self.leaders + self.collapsed
+        return {
+            "in_flight": len(self._calls),
+            "upstream_calls": self.leaders,
+            "collapsed_calls": self.collapsed,
+            "collapse_ratio": round(self.collapsed / calls, 4) if calls else 0.0,
+        }
@@ -0,0 +1,288 @@
+"""
+SRMAP Student Portal - Snapshot Store
+Durable copy of the last successfully parsed payload per student and report,
+so reports can be served after a restart or while the portal is down, and
+the students seen recently, for the morning prefetch
+"""
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+import hashlib
+import json
+import secrets
+import sqlite3
+import threading
+import time
+import zlib
+
+from credential_vault import CredentialVault
+from session_store import CookieTuple
+
+
+def _token_hash(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    data: Dict[str, Any]
+    digest: str
+    html_digest: str
+    fetched_at: float  # epoch seconds of the portal fetch
+
+    @property
+    def age(self) -> float:
+        return max(0.0, time.time() - self.fetched_at)
+
+
+class SnapshotStore:
+    """
+    WAL-mode SQLite table keyed by (roll number, report id), so any worker and
+    any later session of the same student can read it. Payloads are JSON,
+    zlib-compressed (report pages shrink about tenfold). Rows older than
+    max_age are pruned. Database errors are logged and treated as misses, so
+    a read-only or broken disk degrades to no snapshots rather than failures.
+
+    A second table remembers, per roll number, when the student was last seen
+    and the portal cookies of their latest session. It outlives the session's
+    idle TTL (rows go after seen_ttl) so the prefetcher can refresh reports the
+    next morning. Writes for the same session are at most every seen_interval.
+    Cookies are encrypted with `vault`; without one (or when it can't decrypt
+    a row) they aren't kept and the student can't be prefetched.
+
+    A third holds calendar feed tokens: random, read-only, revocable links to a
+    student's timetable that don't depend on any session. Only a hash of each
+    token is stored.
+    """
+
+    def __init__(
+        self,
+        path: str = "snapshots.db",
+        max_age: float = 7 * 24 * 60 * 60,
+        level: int = 6,
+        seen_ttl: float = 24 * 60 * 60,
+        seen_interval: float = 60,
+        vault: Optional[CredentialVault] = None
+    ):
+        self.path = path
+        self.vault = vault
+        self.max_age = max_age
+        self.level = level
+        self.seen_ttl = seen_ttl
+        self.seen_interval = seen_interval
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        # roll number -> (written at, session id, cookies) of the last students row written
+        self._seen: Dict[str, Tuple[float, str, List[CookieTuple]]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.errors = 0
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        # Opened lazily so each forked worker gets its own connection
+        if self._connection is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS snapshots (
+                    roll_number TEXT NOT NULL,
+                    report_id TEXT NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    digest TEXT NOT NULL,
+                    html_digest TEXT NOT NULL,
+                    payload BLOB NOT NULL,
+                    PRIMARY KEY (roll_number, report_id)
+                ) WITHOUT ROWID"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS snapshots_fetched_at ON snapshots (fetched_at)")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS students (
+                    roll_number TEXT PRIMARY KEY,
+                    last_seen REAL NOT NULL,
+                    session_id TEXT NOT NULL,
+                    cookies TEXT NOT NULL
+                ) WITHOUT ROWID"""
+            )
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS feeds (
+                    token_hash TEXT PRIMARY KEY,
+                    roll_number TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                ) WITHOUT ROWID"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS feeds_roll_number ON feeds (roll_number)")
+            # Rows from before cookies were encrypted held them as plain JSON
+            conn.execute("UPDATE students SET cookies = '' WHERE cookies LIKE '[%'")
+            self._connection = conn
+        return self._connection
+
+    def _failed(self, action: str, error: Exception) -> None:
+        self.errors += 1
+        print(f"⚠️ Snapshot {action} failed: {error}")
+
+    def get(self, roll_number: str, report_id: str) -> Optional[Snapshot]:
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT fetched_at, digest, html_digest, payload FROM snapshots WHERE roll_number = ? AND report_id = ?",
+                    (roll_number, report_id)
+                ).fetchone()
+        except sqlite3.Error as e:
+            self._failed("read", e)
+            return None
+        if row is None or time.time() - row[0] > self.max_age:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return Snapshot(data=json.loads(zlib.decompress(row[3])), digest=row[1], html_digest=row[2], fetched_at=row[0])
+
+    def put(self, roll_number: str, report_id: str, snapshot: Snapshot) -> None:
+        """Insert or replace; blocking, so call it through a thread pool from the event loop"""
+        payload = zlib.compress(json.dumps(snapshot.data, ensure_ascii=False).encode("utf-8"), self.level)
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO snapshots (roll_number, report_id, fetched_at, digest, html_digest, payload) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (roll_number, report_id, snapshot.fetched_at, snapshot.digest, snapshot.html_digest, payload)
+                )
+        except sqlite3.Error as e:
+            self._failed("write", e)
+            return
+        self.writes += 1
+
+    def seen(self, roll_number: str, session_id: str, cookies: List[CookieTuple]) -> None:
+        """Record that a student used the API, with the portal cookies of that session"""
+        now = time.time()
+        last = self._seen.get(roll_number)
+        if last is not None and now - last[0] < self.seen_interval and last[1:] == (session_id, cookies):
+            return
+        self._seen[roll_number] = (now, session_id, cookies)
+        sealed = self.vault.encrypt(json.dumps(cookies).encode("utf-8")) if self.vault is not None else None
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO students (roll_number, last_seen, session_id, cookies) VALUES (?, ?, ?, ?)",
+                    (roll_number, now, session_id, sealed.decode("ascii") if sealed else "")
+                )
+        except sqlite3.Error as e:
+            self._failed("write", e)
+
+    def student(self, roll_number: str) -> Optional[Tuple[str, List[CookieTuple]]]:
+        """(session id, portal cookies) of the student's latest session, if seen within seen_ttl"""
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT session_id, cookies FROM students WHERE roll_number = ? AND last_seen >= ?",
+                    (roll_number, time.time() - self.seen_ttl)
+                ).fetchone()
+        except sqlite3.Error as e:
+            self._failed("read", e)
+            return None
+        if row is None or not row[1] or self.vault is None:
+            return None
+        cookies = self.vault.decrypt(row[1].encode("ascii"))
+        if cookies is None:
+            return None  # written under another worker's or an earlier process's key
+        return row[0], [tuple(cookie) for cookie in json.loads(cookies)]
+
+    def recent_students(self, since: float) -> List[str]:
+        """Roll numbers of students seen at or after `since` (epoch seconds), whether or not their session is alive"""
+        try:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT roll_number FROM students WHERE last_seen >= ? ORDER BY roll_number",
+                    (max(since, time.time() - self.seen_ttl),)
+                ).fetchall()
+        except sqlite3.Error as e:
+            self._failed("read", e)
+            return []
+        return [row[0] for row in rows]
+
+    def forget_session(self, session_id: str) -> None:
+        """Drop the students row of a session that logged out or was rejected by the portal"""
+        for roll_number in [roll for roll, last in self._seen.items() if last[1] == session_id]:
+            del self._seen[roll_number]
+        try:
+            with self._lock:
+                self._conn.execute("DELETE FROM students WHERE session_id = ?", (session_id,))
+        except sqlite3.Error as e:
+            self._failed("write", e)
+
+    def issue_feed(self, roll_number: str) -> Optional[str]:
+        """New calendar feed token for a student; None if it couldn't be stored"""
+        token = secrets.token_urlsafe(24)
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT INTO feeds (token_hash, roll_number, created_at) VALUES (?, ?, ?)",
+                    (_token_hash(token), roll_number, time.time())
+                )
+        except sqlite3.Error as e:
+            self._failed("write", e)
+            return None
+        return token
+
+    def feed_owner(self, token: str) -> Optional[str]:
+        """Roll number a feed token was issued to, or None if unknown or revoked"""
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT roll_number FROM feeds WHERE token_hash = ?", (_token_hash(token),)
+                ).fetchone()
+        except sqlite3.Error as e:
+            self._failed("read", e)
+            return None
+        return row[0] if row else None
+
+    def revoke_feeds(self, roll_number: str) -> int:
+        """Revoke every feed token of a student; returns how many there were"""
+        try:
+            with self._lock:
+                return self._conn.execute("DELETE FROM feeds WHERE roll_number = ?", (roll_number,)).rowcount
+        except sqlite3.Error as e:
+            self._failed("write", e)
+            return 0
+
+    def prune(self) -> int:
+        """Delete snapshots older than max_age and students not seen within seen_ttl; returns how many snapshots were removed"""
+        now = time.time()
+        for roll_number in [roll for roll, last in self._seen.items() if now - last[0] >= self.seen_interval]:
+            del self._seen[roll_number]
+        try:
+            with self._lock:
+                self._conn.execute("DELETE FROM students WHERE last_seen < ?", (now - self.seen_ttl,))
+                return self._conn.execute(
+                    "DELETE FROM snapshots WHERE fetched_at < ?", (now - self.max_age,)
+                ).rowcount
+        except sqlite3.Error as e:
+            self._failed("prune", e)
+            return 0
+
+    def stats(self) -> Dict[str, Any]:
+        try:
+            with self._lock:
+                rows, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(payload)), 0) FROM snapshots").fetchone()
+                students = self._conn.execute("SELECT COUNT(*) FROM students").fetchone()[0]
+        except sqlite3.Error:
+            rows = size = students = None
+        lookups = self.hits + self.misses
+        return {
+            "path": self.path,
+            "rows": rows,
+            "payload_bytes": size,
+            "students": students,
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "errors": self.errors,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
@@ -0,0 +1,121 @@
+"""
+Shared fixtures: the API wired to an in-process fake portal (httpx.MockTransport)
+"""
+from typing import Awaitable, Callable, List, Set
+from urllib.parse import parse_qs
+import itertools
+import os
+import re
+import sys
+
+import httpx
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SNAPSHOT_DB_PATH", "")
+os.environ.setdefault("CAPTCHA_POOL_MAX", "0")
+os.environ.setdefault("PREFETCH_ENABLED", "0")
+
+import main  # noqa: E402
+from snapshot_store import SnapshotStore  # noqa: E402
+
+PREFIX = main.PORTAL_PATH_PREFIX
+_SESSION_COOKIE = re.compile(r"JSESSIONID=([^;\s]+)")
+
+
+def login_page(message: str) -> httpx.Response:
+    return httpx.Response(200, text=f'<form><input name="txtAuthKey"></form><div class="error">{message}</div>')
+
+
+def report_table(request: httpx.Request) -> httpx.Response:
+    """A small table naming the requested report"""
+    ids = parse_qs(request.content.decode()).get("ids", [""])[0]
+    return httpx.Response(200, text=f"<table><tr><td>ids</td><td>{ids}</td></tr></table>")
+
+
+class FakePortal:
+    """
+    Stand-in for the portal. The n-th login gets logins[n] ("ok" or the error
+    text to show; the last one repeats), and a successful login sets a new
+    JSESSIONID. Report pages need a live JSESSIONID and come from
+    report(request); otherwise the login page is served.
+    """
+
+    def __init__(self):
+        self.logins: List[str] = ["ok"]
+        self.report: Callable[[httpx.Request], Awaitable[httpx.Response]] = self._report_table
+        self.login_count = 0
+        self.served = 0
+        self.report_requests: List[httpx.Request] = []
+        self._sessions: Set[str] = set()
+        self._ids = itertools.count(1)
+
+    async def _report_table(self, request: httpx.Request) -> httpx.Response:
+        return report_table(request)
+
+    def expire(self) -> None:
+        """The portal drops every session, as it does after its own idle timeout"""
+        self._sessions.clear()
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        if path.endswith("StudentLoginToPortal"):
+            outcome = self.logins[min(self.login_count, len(self.logins) - 1)]
+            self.login_count += 1
+            if outcome != "ok":
+                return login_page(outcome)
+            cookie = f"s{next(self._ids)}"
+            self._sessions.add(cookie)
+            return httpx.Response(302, headers=[("location", f"{PREFIX}HRDSystem"), ("set-cookie", f"JSESSIONID={cookie}; Path=/")])
+        if path.endswith(".jsp"):
+            self.report_requests.append(request)
+            match = _SESSION_COOKIE.search(request.headers.get("cookie", ""))
+            if match is None or match.group(1) not in self._sessions:
+                return login_page("Session expired")
+            self.served += 1
+            return await self.report(request)
+        return httpx.Response(200, text="ok")
+
+
+@pytest.fixture
+def portal(monkeypatch) -> Callable[[Callable], None]:
+    """Call with an async handler(request) -> httpx.Response to stand in for the portal"""
+    def install(handler: Callable) -> None:
+        monkeypatch.setattr(main.upstream_transport, "_transport", httpx.MockTransport(handler))
+    return install
+
+
+@pytest.fixture
+def fake_portal(portal) -> FakePortal:
+    fake = FakePortal()
+    portal(fake.handle)
+    return fake
+
+
+@pytest.fixture
+def client():
+    from fastapi.testclient import TestClient
+    with TestClient(main.app) as test_client:
+        yield test_client
+    main.report_cache.clear()
+
+
+@pytest.fixture
+def login(client) -> Callable[..., str]:
+    """Log in through the API (captcha supplied) and return the session id"""
+    def log_in(username: str = "AP1", remember: bool = False) -> str:
+        body = client.post(
+            "/api/login", json={"username": username, "password": "secret", "captcha": "ABCDE", "remember": remember}
+        ).json()
+        assert body["success"], body
+        return body["session_id"]
+    return log_in
+
+
+@pytest.fixture
+def snapshots(tmp_path, monkeypatch) -> SnapshotStore:
+    """A snapshot store in a temporary file, in place of the disabled one"""
+    store = SnapshotStore(str(tmp_path / "snapshots.db"), vault=main.credential_vault)
+    monkeypatch.setattr(main, "snapshot_store", store)
+    yield store
+    store.close()
@@ -0,0 +1,30 @@
+"""
+Admin routes (traces, tracing switch, profiler) are closed unless configured
+"""
+import main
+
+
+def test_admin_routes_are_hidden_without_a_token(client, monkeypatch):
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "")
+    monkeypatch.setattr(main, "ADMIN_OPEN", False)
+
+    assert client.get("/api/admin/traces").status_code == 404
+    assert client.get("/api/admin/profile").status_code == 404
+    assert client.post("/api/admin/profile", params={"seconds": 1}).status_code == 404
+    assert client.post("/api/admin/tracing", json={"enabled": True}).status_code == 404
+    assert not main.tracer.enabled
+
+
+def test_admin_token_is_required_when_set(client, monkeypatch):
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "s3cret")
+
+    assert client.get("/api/admin/traces").status_code == 403
+    assert client.get("/api/admin/traces", headers={"X-Admin-Token": "wrong"}).status_code == 403
+    assert client.get("/api/admin/traces", headers={"X-Admin-Token": "s3cret"}).status_code == 200
+
+
+def test_admin_open_opts_in_for_local_development(client, monkeypatch):
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "")
+    monkeypatch.setattr(main, "ADMIN_OPEN", True)
+
+    assert client.get("/api/admin/profile").status_code == 200
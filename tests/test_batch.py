@@ -0,0 +1,49 @@
+"""
+Batch endpoint: reports fetched concurrently, each succeeding or failing on its own
+"""
+import asyncio
+from urllib.parse import parse_qs
+
+import httpx
+
+from conftest import report_table
+
+
+def test_reports_are_fetched_concurrently_and_fail_separately(fake_portal, client, login):
+    waiting = []
+    in_flight_at_answer = []
+
+    async def report(request: httpx.Request) -> httpx.Response:
+        ids = parse_qs(request.content.decode())["ids"][0]
+        if ids == "6":
+            return httpx.Response(500, text="Internal Server Error")
+        # Neither page is answered until both were requested: they must be in flight together
+        waiting.append(ids)
+        for _ in range(100):
+            if len(waiting) >= 2:
+                break
+            await asyncio.sleep(0.01)
+        in_flight_at_answer.append(len(waiting))
+        return report_table(request)
+
+    fake_portal.report = report
+    session_id = login()
+
+    body = client.post(
+        "/api/student/batch", json={"session_id": session_id, "reports": ["subjects", "22", "cgpa", "subjects"]}
+    ).json()
+
+    assert sorted(waiting) == ["2", "22"] and in_flight_at_answer == [2, 2]
+    assert set(body["results"]) == {"subjects", "22"}
+    assert "<td>2</td>" in body["results"]["subjects"]["html"]  # no parser: the page itself
+    assert body["errors"] == {"cgpa": {"status": 500, "detail": "Failed to fetch data from portal"}}
+
+
+def test_unknown_or_too_many_reports_are_rejected(fake_portal, client, login):
+    session_id = login()
+
+    unknown = client.post("/api/student/batch", json={"session_id": session_id, "reports": ["attendance", "nope"]})
+    assert unknown.status_code == 400 and "nope" in unknown.json()["detail"]
+    empty = client.post("/api/student/batch", json={"session_id": session_id, "reports": []})
+    assert empty.status_code == 400
+    assert fake_portal.served == 0
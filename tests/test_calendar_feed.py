@@ -0,0 +1,39 @@
+"""
+Calendar feed links: token instead of session id, outliving the session, revocable
+"""
+import os
+
+import httpx
+
+FIXTURE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fixtures", "reports", "10.html")
+with open(FIXTURE, encoding="utf-8") as f:
+    TIMETABLE = f.read()
+
+
+async def timetable(request: httpx.Request) -> httpx.Response:
+    return httpx.Response(200, text=TIMETABLE)
+
+
+def test_feed_link_outlives_the_session_and_can_be_revoked(fake_portal, client, login, snapshots):
+    fake_portal.report = timetable
+    session_id = login()
+
+    url = client.post("/api/student/timetable/feed", json={"session_id": session_id}).json()["url"]
+    assert session_id not in url
+
+    client.request("DELETE", "/api/logout", json={"session_id": session_id})
+    served = fake_portal.served
+    feed = client.get(url)
+    assert feed.status_code == 200
+    assert feed.headers["content-type"].startswith("text/calendar")
+    assert "SUMMARY:CSE 401" in feed.text
+    assert fake_portal.served == served  # from the snapshot, not the portal
+    assert client.get(url, headers={"If-None-Match": feed.headers["etag"]}).status_code == 304
+
+    session_id = login()
+    assert client.request("DELETE", "/api/student/timetable/feed", json={"session_id": session_id}).json() == {"revoked": 1}
+    assert client.get(url).status_code == 404
+
+
+def test_unknown_feed_token_is_a_404(client, snapshots):
+    assert client.get("/api/calendar/not-a-token.ics").status_code == 404
@@ -0,0 +1,38 @@
+"""
+Lazy loading of the captcha solver
+"""
+from types import SimpleNamespace
+import asyncio
+import time
+
+import captcha_solver
+import main
+
+
+def test_concurrent_first_captchas_share_one_load(monkeypatch, tmp_path):
+    model = tmp_path / "model.npz"
+    model.write_bytes(b"")
+    loads = []
+    solver = SimpleNamespace(labels=["A"])
+
+    def slow_load(path):
+        loads.append(path)
+        time.sleep(0.2)
+        return solver
+
+    monkeypatch.setattr(main, "CAPTCHA_MODEL_PATH", str(model))
+    monkeypatch.setattr(main, "captcha_solver_loaded", False)
+    monkeypatch.setattr(main, "local_captcha_solver", None)
+    monkeypatch.setattr(captcha_solver.CaptchaSolver, "load", staticmethod(slow_load))
+
+    async def first_captchas():
+        async def one():
+            tools = await main.captcha_tools()
+            # Every caller must see the loaded model, not fall back to OCR.Space
+            return tools, main.local_captcha_solver
+        return await asyncio.gather(*(one() for _ in range(5)))
+
+    results = asyncio.run(first_captchas())
+
+    assert loads == [str(model)]
+    assert all(tools is captcha_solver and loaded is solver for tools, loaded in results)
@@ -0,0 +1,50 @@
+"""
+Pre-solved captcha pool: built outside the event loop, falls back on a misread captcha
+"""
+import asyncio
+
+import main
+from captcha_pool import CaptchaPool, WarmSession
+
+
+async def _solved(text: str) -> str:
+    return text
+
+
+def test_pool_built_outside_the_loop_starts_and_fills():
+    async def produce():
+        return WarmSession(cookies=[], captcha="ABCDE")
+
+    pool = CaptchaPool(produce, min_size=2, refill_interval=60)
+    assert pool.take() is None  # usable before start()
+
+    async def run():
+        task = pool.start()
+        await asyncio.sleep(0.01)
+        size = len(pool)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return size
+
+    assert asyncio.run(run()) >= pool.min_size
+
+
+def test_rejected_pooled_captcha_falls_back_to_a_fresh_one(fake_portal, client, monkeypatch):
+    fake_portal.logins = ["Invalid Captcha", "ok"]
+    pool = CaptchaPool(lambda: _solved(None))
+    pool._entries.append(WarmSession(cookies=[], captcha="WRONG"))
+    monkeypatch.setattr(main, "captcha_pool", pool)
+    solved = []
+
+    async def solve(session):
+        solved.append(session)
+        return "ABCDE"
+
+    monkeypatch.setattr(main, "solve_login_captcha", solve)
+
+    body = client.post("/api/login", json={"username": "AP1", "password": "secret"}).json()
+
+    assert body["success"], body
+    assert fake_portal.login_count == 2
+    assert len(solved) == 1
+    assert pool.hits == 1
@@ -0,0 +1,138 @@
+"""
+Per-request deadlines and hedged portal calls
+"""
+import asyncio
+import json
+import time
+
+import pytest
+
+from deadlines import DeadlineExceeded, DeadlineMiddleware, Hedger, LatencyTracker, _deadline, clamp_timeouts, remaining
+
+
+def warmed_hedger(latency: float = 0.01) -> Hedger:
+    """A hedger whose p95 is already known, so the next call is hedged"""
+    hedger = Hedger(min_delay=0.01)
+    tracker = hedger._latency["report"] = LatencyTracker()
+    for _ in range(tracker.min_samples):
+        tracker.add(latency)
+    return hedger
+
+
+def test_success_wins_when_both_attempts_finish_together():
+    async def run():
+        hedger = warmed_hedger()
+        release = asyncio.Event()
+        attempts = []
+
+        async def call():
+            attempt = len(attempts)
+            attempts.append(attempt)
+            await release.wait()
+            if attempt == 0:
+                raise ConnectionError("original failed")
+            return "hedge"
+
+        async def release_after_hedge():
+            while len(attempts) < 2:
+                await asyncio.sleep(0.005)
+            release.set()  # both attempts complete in the same wake-up of the hedger
+
+        results = []
+        for _ in range(10):  # set iteration order varies; each run must prefer the success
+            attempts.clear()
+            release.clear()
+            releaser = asyncio.ensure_future(release_after_hedge())
+            results.append(await hedger.call(call, key="report"))
+            await releaser
+        return results, hedger
+
+    results, hedger = asyncio.run(run())
+    assert results == ["hedge"] * 10
+    assert hedger.hedged == 10 and hedger.hedge_wins == 10
+
+
+def call_with_budget(app, path: str, budgets, default: float = 1.0):
+    """Run an ASGI app behind DeadlineMiddleware; returns the messages it sent"""
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "path": path}
+    asyncio.run(DeadlineMiddleware(app, budgets=budgets, default=default)(scope, receive, send))
+    return sent
+
+
+def test_overrunning_request_is_a_504():
+    async def slow(scope, receive, send):
+        await asyncio.sleep(1)
+
+    sent = call_with_budget(slow, "/api/student/attendance", {"/api/student/attendance": 0.05})
+    assert sent[0]["status"] == 504
+    assert json.loads(sent[1]["body"]) == {"detail": "Request exceeded its 0.05s deadline"}
+
+
+def test_the_budget_is_visible_to_upstream_calls_and_streams_are_exempt():
+    seen = []
+
+    async def app(scope, receive, send):
+        seen.append(remaining())
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    call_with_budget(app, "/api/student/cgpa", {"/api/student/watch": None}, default=8)
+    call_with_budget(app, "/api/student/watch", {"/api/student/watch": None}, default=8)
+    assert 7 < seen[0] <= 8 and seen[1] is None
+
+
+def test_timeouts_are_clamped_to_the_remaining_budget():
+    token = _deadline.set(time.monotonic() + 2)
+    try:
+        clamped = clamp_timeouts({"connect": 5.0, "read": 1.0, "pool": None})
+        assert 1.9 < clamped["connect"] <= 2 and clamped["read"] == 1.0 and 1.9 < clamped["pool"] <= 2
+    finally:
+        _deadline.reset(token)
+    token = _deadline.set(time.monotonic() - 1)
+    try:
+        with pytest.raises(DeadlineExceeded):
+            clamp_timeouts({"read": 1.0})
+    finally:
+        _deadline.reset(token)
+
+
+def test_slow_call_is_hedged_and_the_faster_copy_wins():
+    async def run():
+        hedger = warmed_hedger()
+        attempts = []
+
+        async def call():
+            attempts.append(1)
+            await asyncio.sleep(1 if len(attempts) == 1 else 0.01)
+            return len(attempts)
+
+        result = await hedger.call(call, key="report")
+        return result, hedger
+
+    result, hedger = asyncio.run(run())
+    assert result == 2 and hedger.hedged == 1 and hedger.hedge_wins == 1
+
+
+def test_no_hedging_without_samples_or_without_budget_for_a_second_try():
+    async def run():
+        async def call():
+            await asyncio.sleep(0.05)
+            return "ok"
+
+        cold = Hedger(min_delay=0.01)
+        await cold.call(call, key="report")
+
+        tight = warmed_hedger(latency=0.5)
+        _deadline.set(time.monotonic() + 0.6)  # less than twice the 0.5 s hedging delay
+        await tight.call(call, key="report")
+        return cold.hedged, tight.hedged
+
+    assert asyncio.run(run()) == (0, 0)
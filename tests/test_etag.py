@@ -0,0 +1,58 @@
+"""
+Conditional GETs on report routes: ETag per view, 304 without a portal call
+"""
+from urllib.parse import parse_qs
+
+import httpx
+
+from responses import etag_matches
+
+PAGES = {"3": "<table><tr><td>CSE 401</td><td>Compiler Design</td><td>48</td><td>44</td><td>4</td>"
+              "<td>0</td><td>91.67</td><td>0</td><td>91.67</td></tr></table>"}
+
+
+async def attendance(request: httpx.Request) -> httpx.Response:
+    return httpx.Response(200, text=PAGES[parse_qs(request.content.decode())["ids"][0]])
+
+
+def test_matching_etag_is_a_304_from_the_cache(fake_portal, client, login):
+    fake_portal.report = attendance
+    session_id = login()
+    payload = {"session_id": session_id}
+
+    first = client.post("/api/student/attendance", json=payload)
+    etag = first.headers["etag"]
+    assert etag.startswith('W/"')
+
+    cached = client.post("/api/student/attendance", json=payload, headers={"If-None-Match": etag})
+    assert cached.status_code == 304 and cached.content == b""
+    assert fake_portal.served == 1
+
+    # A different view of the same report has its own ETag
+    projected = client.post("/api/student/attendance", json={**payload, "fields": ["attendance.present"]})
+    assert projected.headers["etag"] != etag
+    with_html = client.post("/api/student/attendance", json={**payload, "include_html": True})
+    assert with_html.headers["etag"] not in (etag, projected.headers["etag"])
+
+
+def test_changed_report_gets_a_new_etag(fake_portal, client, login):
+    fake_portal.report = attendance
+    session_id = login()
+    etag = client.post("/api/student/attendance", json={"session_id": session_id}).headers["etag"]
+
+    PAGES["3"], original = PAGES["3"].replace("91.67", "93.75"), PAGES["3"]
+    try:
+        changed = client.post(
+            "/api/student/attendance", json={"session_id": session_id, "refresh": True}, headers={"If-None-Match": etag}
+        )
+    finally:
+        PAGES["3"] = original
+    assert changed.status_code == 200 and changed.headers["etag"] != etag
+
+
+def test_if_none_match_uses_weak_comparison():
+    assert etag_matches('"abc"', 'W/"abc"')
+    assert etag_matches('W/"x", W/"abc"', 'W/"abc"')
+    assert etag_matches("*", 'W/"abc"')
+    assert not etag_matches('W/"abd"', 'W/"abc"')
+    assert not etag_matches(None, 'W/"abc"')
@@ -0,0 +1,24 @@
+"""
+Both parser backends reproduce the golden outputs, malformed pages included
+"""
+import bench_parsers
+import parsers
+
+
+def test_every_page_matches_its_golden_output():
+    assert bench_parsers.check_golden(bench_parsers.corpus(), update=False) == 0
+
+
+def test_only_malformed_pages_leave_the_lxml_backend():
+    if not parsers.lxml_enabled:
+        return
+    for name, html, _ in bench_parsers.corpus():
+        document = parsers.parse_document(html)
+        malformed = name in ("1_cdata", "3_textarea", "10_unclosed_td")
+        assert isinstance(document, parsers.SoupDocument) == malformed, name
+
+
+def test_raw_text_elements_without_markup_stay_on_lxml():
+    assert not parsers.lxml_diverges("<head><title>Student's Corner | SRM AP</title></head><table></table>")
+    assert parsers.lxml_diverges("<td><textarea>a <b>b</b></textarea></td>")
+    assert parsers.lxml_diverges("<tr><td>Mon<td>CSE 401</tr>")
@@ -0,0 +1,73 @@
+"""
+Morning prefetch: candidates outlive idle sessions, and prefetching never renews them
+"""
+import time
+
+import main
+from credential_vault import CredentialVault
+from snapshot_store import SnapshotStore
+
+DAY = 24 * 60 * 60
+
+
+def visit(client, session_id: str) -> None:
+    assert client.post("/api/student/timetable", json={"session_id": session_id}).status_code == 200
+
+
+def test_session_expired_overnight_is_still_prefetched(fake_portal, client, login, snapshots):
+    session_id = login(username="ap1")
+    visit(client, session_id)
+
+    # Nine hours later the session has idled out and been swept
+    main.session_store.get(session_id, touch=False).last_seen -= 9 * 60 * 60
+    for expired in main.session_store.sweep():
+        client.portal.call(main.drop_session, expired, "session expired")
+    assert session_id not in main.session_store
+
+    assert snapshots.recent_students(time.time() - DAY) == ["AP1"]
+    served_before = fake_portal.served
+    assert client.portal.call(main.prefetch_report, "AP1", "10")
+    assert fake_portal.served == served_before + 1
+    assert snapshots.get("AP1", "10").age < 5
+
+
+def test_prefetch_does_not_touch_the_session(fake_portal, client, login, snapshots):
+    session_id = login()
+    visit(client, session_id)
+    idle_since = time.time() - 20 * 60
+    main.session_store.get(session_id, touch=False).last_seen = idle_since
+
+    assert client.portal.call(main.prefetch_report, "AP1", "3")
+
+    assert main.session_store.get(session_id, touch=False).last_seen == idle_since
+    assert main.report_cache.get((session_id, "3")) is not None
+
+
+def test_dropped_students_are_not_prefetched(fake_portal, client, login, snapshots):
+    visit(client, login())
+
+    # The portal ended the session: nothing to prefetch with, and the student is dropped
+    fake_portal.expire()
+    assert not client.portal.call(main.prefetch_report, "AP1", "10")
+    assert snapshots.recent_students(time.time() - DAY) == []
+
+    # Logging out drops the student too
+    session_id = login()
+    visit(client, session_id)
+    client.request("DELETE", "/api/logout", json={"session_id": session_id})
+    assert snapshots.recent_students(time.time() - DAY) == []
+
+
+def test_portal_cookies_are_encrypted_at_rest(tmp_path):
+    path = str(tmp_path / "snapshots.db")
+    store = SnapshotStore(path, vault=CredentialVault())
+    store.seen("AP1", "sid", [("JSESSIONID", "s1", "portal", "/")])
+    assert store.student("AP1") == ("sid", [("JSESSIONID", "s1", "portal", "/")])
+    raw = store._conn.execute("SELECT cookies FROM students").fetchone()[0]
+    assert "JSESSIONID" not in raw
+    store.close()
+
+    # Another process's key can't read them: the student is simply not prefetchable
+    other = SnapshotStore(path, vault=CredentialVault())
+    assert other.student("AP1") is None
+    other.close()
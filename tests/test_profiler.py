@@ -0,0 +1,32 @@
+"""
+Sampling profiler stack collapsing
+"""
+import sys
+
+from tracing import SamplingProfiler
+
+
+def nested(depth: int, profiler: SamplingProfiler) -> str:
+    if depth:
+        return nested(depth - 1, profiler)
+    return profiler._collapse(sys._getframe())
+
+
+def test_deep_stacks_keep_their_root_and_leaf_frames():
+    untruncated = SamplingProfiler(max_depth=500)
+    here = untruncated._collapse(sys._getframe()).split(";")
+    full = nested(100, untruncated).split(";")
+    assert full[:len(here)] == here
+
+    deep = nested(100, SamplingProfiler(max_depth=16)).split(";")
+
+    assert len(deep) == 16
+    assert deep[:8] == full[:8]  # the root frames, as for any other stack from this thread
+    assert deep[8] == SamplingProfiler.TRUNCATED
+    assert deep[9:] == ["test_profiler.py:nested"] * 7
+
+
+def test_shallow_stacks_are_unchanged():
+    stack = nested(3, SamplingProfiler(max_depth=500)).split(";")
+    assert SamplingProfiler.TRUNCATED not in stack
+    assert stack[-4:] == ["test_profiler.py:nested"] * 4
@@ -0,0 +1,48 @@
+"""
+Automatic re-login of remembered sessions
+"""
+import main
+
+
+async def _solved(text: str) -> str:
+    return text
+
+
+def test_misread_captcha_is_retried_and_credentials_kept(fake_portal, client, login, monkeypatch):
+    fake_portal.logins = ["ok", "Invalid Captcha", "Invalid Captcha", "ok"]
+    monkeypatch.setattr(main, "solve_login_captcha", lambda session: _solved("WRONG"))
+    session_id = login(remember=True)
+    fake_portal.expire()
+
+    response = client.post("/api/student/subjects", json={"session_id": session_id})
+
+    assert response.status_code == 200
+    assert fake_portal.login_count == 4  # first login, two misread captchas, then success
+    assert session_id in main.credential_vault
+
+
+def test_captcha_retries_are_bounded(fake_portal, client, login, monkeypatch):
+    fake_portal.logins = ["ok", "Invalid Captcha"]
+    monkeypatch.setattr(main, "solve_login_captcha", lambda session: _solved("WRONG"))
+    session_id = login(remember=True)
+    fake_portal.expire()
+
+    response = client.post("/api/student/subjects", json={"session_id": session_id})
+
+    assert response.status_code == 401
+    assert fake_portal.login_count == 1 + main.RELOGIN_ATTEMPTS
+
+
+def test_wrong_password_forgets_credentials(fake_portal, client, login, monkeypatch):
+    fake_portal.logins = ["ok", "Invalid Username or Password"]
+    monkeypatch.setattr(main, "solve_login_captcha", lambda session: _solved("ABCDE"))
+    session_id = login(remember=True)
+    fake_portal.expire()
+    forgotten = []
+    monkeypatch.setattr(main.credential_vault, "forget", forgotten.append)
+
+    response = client.post("/api/student/subjects", json={"session_id": session_id})
+
+    assert response.status_code == 401
+    assert fake_portal.login_count == 2  # no retry with a rejected password
+    assert session_id in forgotten
@@ -0,0 +1,64 @@
+"""
+Report cache: per-report TTLs, LRU bounds and the refresh bypass
+"""
+import report_cache
+from report_cache import ReportCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_entries_expire_after_their_ttl_and_stay_available_as_stale(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(report_cache.time, "monotonic", clock)
+    cache = ReportCache()
+    cache.set(("s1", "3"), "attendance", ttl=60, size=10, stale_ttl=300)
+
+    clock.now += 59
+    assert cache.get(("s1", "3")) == "attendance"
+    clock.now += 2
+    assert cache.get(("s1", "3")) is None
+    assert cache.get_stale(("s1", "3")) == "attendance"
+    clock.now += 300
+    assert cache.get_stale(("s1", "3")) is None
+
+
+def test_least_recently_used_entries_go_first():
+    cache = ReportCache(max_entries=2, max_bytes=100)
+    cache.set(("s1", "1"), "profile", ttl=60, size=10)
+    cache.set(("s1", "3"), "attendance", ttl=60, size=10)
+    cache.get(("s1", "1"))
+    cache.set(("s1", "10"), "timetable", ttl=60, size=10)
+    assert cache.get(("s1", "3")) is None and cache.get(("s1", "1")) == "profile"
+
+    # The byte budget evicts too, and a value larger than all of it is not cached
+    cache.set(("s2", "6"), "cgpa", ttl=60, size=95)
+    assert len(cache) == 1
+    cache.set(("s2", "15"), "results", ttl=60, size=101)
+    assert cache.get(("s2", "15")) is None
+    assert cache.evictions == 3
+
+
+def test_a_session_is_invalidated_as_a_whole():
+    cache = ReportCache()
+    for owner, ids in [("s1", "1"), ("s1", "3"), ("s2", "3")]:
+        cache.set((owner, ids), ids, ttl=60, size=1)
+    cache.invalidate("s1")
+    assert len(cache) == 1 and cache.get(("s2", "3")) == "3"
+
+
+def test_report_routes_are_cached_until_refresh(fake_portal, client, login):
+    session_id = login()
+
+    first = client.post("/api/student/attendance", json={"session_id": session_id})
+    again = client.post("/api/student/attendance", json={"session_id": session_id})
+    assert first.status_code == again.status_code == 200
+    assert fake_portal.served == 1
+
+    client.post("/api/student/attendance", json={"session_id": session_id, "refresh": True})
+    assert fake_portal.served == 2
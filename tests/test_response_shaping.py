@@ -0,0 +1,59 @@
+"""
+Report responses: raw html opt-in, field projection and compression
+"""
+import os
+
+import httpx
+
+import responses
+
+FIXTURE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fixtures", "reports", "3.html")
+with open(FIXTURE, encoding="utf-8") as f:
+    ATTENDANCE = f.read()
+
+
+async def attendance(request: httpx.Request) -> httpx.Response:
+    return httpx.Response(200, text=ATTENDANCE)
+
+
+def test_parsed_reports_leave_out_the_page_unless_asked(fake_portal, client, login):
+    fake_portal.report = attendance
+    session_id = login()
+
+    body = client.post("/api/student/attendance", json={"session_id": session_id}).json()
+    assert "html" not in body and body["attendance"][0]["subject_code"] == "CSE 401"
+
+    body = client.post("/api/student/attendance", json={"session_id": session_id, "include_html": True}).json()
+    assert body["html"] == ATTENDANCE
+
+
+def test_fields_project_records(fake_portal, client, login):
+    fake_portal.report = attendance
+    session_id = login()
+
+    body = client.post(
+        "/api/student/attendance",
+        json={"session_id": session_id, "fields": ["attendance.subject_code", "attendance.attendance_percentage", "nope"]},
+    ).json()
+    assert body["attendance"][0] == {"subject_code": "CSE 401", "attendance_percentage": "91.67"}
+    assert set(body) == {"attendance"}
+
+
+def test_large_bodies_are_compressed_as_the_client_accepts(fake_portal, client, login):
+    fake_portal.report = attendance
+    session_id = login()
+    payload = {"session_id": session_id, "include_html": True}
+
+    preferred = client.post("/api/student/attendance", json=payload, headers={"Accept-Encoding": "gzip, br"})
+    assert preferred.headers["content-encoding"] == ("br" if responses.brotli is not None else "gzip")
+    assert preferred.json()["html"] == ATTENDANCE
+    assert "accept-encoding" in preferred.headers["vary"].lower()
+
+    gzip = client.post("/api/student/attendance", json=payload, headers={"Accept-Encoding": "gzip"})
+    assert gzip.headers["content-encoding"] == "gzip"
+
+    plain = client.post("/api/student/attendance", json=payload, headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+
+    small = client.post("/api/student/attendance", json={"session_id": session_id, "fields": ["nope"]})
+    assert "content-encoding" not in small.headers
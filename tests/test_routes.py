@@ -0,0 +1,47 @@
+"""
+Portal page routes generated from REPORT_ENDPOINTS
+"""
+from urllib.parse import parse_qs
+
+import httpx
+
+import main
+from conftest import report_table
+
+
+def test_every_registered_resource_has_its_route_and_deadline():
+    routes = {(route.path, method) for route in main.app.routes for method in getattr(route, "methods", ())}
+    for resource in main.REPORT_ENDPOINTS.values():
+        if resource.route:
+            assert (resource.route, "POST") in routes, resource.route
+            if resource.timeout:
+                assert main.ROUTE_DEADLINES[resource.route] == resource.timeout
+
+
+def test_generated_route_posts_the_resource_ids_to_its_page(fake_portal, client, login):
+    requested = []
+
+    async def page(request: httpx.Request) -> httpx.Response:
+        requested.append((request.url.path.rsplit("/", 1)[-1], parse_qs(request.content.decode())["ids"][0]))
+        return report_table(request)
+
+    fake_portal.report = page
+    session_id = login()
+    resource = main.REPORT_ENDPOINTS["54"]
+
+    body = client.post(resource.route, json={"session_id": session_id}).json()
+
+    assert requested == [(resource.endpoint.rsplit("/", 1)[-1], "54")]
+    assert "<td>54</td>" in body["html"]
+
+
+def test_low_priority_pages_are_shed_while_portal_calls_queue(fake_portal, client, login, monkeypatch):
+    session_id = login()
+    monkeypatch.setattr(type(main.upstream_guard.limiter), "queued", property(lambda self: 1))
+
+    low = client.post(main.REPORT_ENDPOINTS["31"].route, json={"session_id": session_id})
+    normal = client.post(main.REPORT_ENDPOINTS["54"].route, json={"session_id": session_id})
+
+    assert low.status_code == 503 and low.headers["retry-after"] == "10"
+    assert normal.status_code == 200
+    assert fake_portal.served == 1
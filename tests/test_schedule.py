@@ -0,0 +1,32 @@
+"""
+Weekly schedule index: merging repeated periods into one class
+"""
+from datetime import datetime
+
+from prefetch import IST
+from schedule import ScheduleIndex
+
+SLOTS = ["09:00-09:50", "09:50-10:40", "10:40-11:30", "11:30-12:20", "01:20-02:10", "02:10-03:00"]
+
+
+def test_identical_periods_around_lunch_are_separate_classes():
+    lab = "CSE 401 (Lab 2)"
+    index = ScheduleIndex([{"day": "Monday", "periods": ["", "", "", lab, lab, ""]}], SLOTS)
+
+    classes = [(c.periods, c.to_dict()["start"], c.to_dict()["end"]) for c in index.days[0]]
+    assert classes == [((4,), "11:30", "12:20"), ((5,), "13:20", "14:10")]
+
+    # During lunch nothing is in progress and the afternoon period is next
+    current, upcoming = index.lookup(datetime(2026, 10, 19, 12, 45, tzinfo=IST))
+    assert current is None
+    assert upcoming[0].hour == 13 and upcoming[0].minute == 20
+    assert "DTEND;TZID=Asia/Kolkata:20261019T122000" in index.to_ical(today=datetime(2026, 10, 19).date())
+
+
+def test_back_to_back_periods_are_merged():
+    lab = "CSE 401 (Lab 2)"
+    index = ScheduleIndex([{"day": "Monday", "periods": [lab, lab, "", "", "", ""]}], SLOTS)
+
+    (merged,) = index.days[0]
+    assert merged.periods == (1, 2)
+    assert (merged.to_dict()["start"], merged.to_dict()["end"]) == ("09:00", "10:40")
@@ -0,0 +1,84 @@
+"""
+Session stores: expiry and the max_entries bound
+"""
+import time
+
+import main
+from session_store import MemorySessionStore, SessionRecord, SQLiteSessionStore
+
+
+def test_sqlite_store_evicts_the_least_recently_seen_on_sweep(tmp_path):
+    store = SQLiteSessionStore(path=str(tmp_path / "sessions.db"), max_entries=2)
+    now = time.time()
+    for n, session_id in enumerate(["a", "b", "c"]):
+        store.save(session_id, SessionRecord(username="AP1", last_seen=now - 10 + n))
+    assert len(store) == 3  # saves don't count rows
+
+    assert store.sweep() == ["a"]
+    assert len(store) == 2 and "a" not in store
+    store.close()
+
+
+def test_memory_store_evicts_on_save():
+    store = MemorySessionStore(max_entries=2)
+    for session_id in ["a", "b", "c"]:
+        store.save(session_id, SessionRecord(username="AP1"))
+    assert len(store) == 2 and "a" not in store
+
+
+def test_sessions_expire_when_idle_pending_or_too_old():
+    store = MemorySessionStore(idle_ttl=30, pending_ttl=5, max_lifetime=100)
+    now = time.time()
+    store.save("idle", SessionRecord(username="AP1", last_seen=now - 31))
+    store.save("active", SessionRecord(username="AP1", last_seen=now - 20))
+    store.save("pending", SessionRecord(last_seen=now - 6))  # captcha fetched, login never posted
+    store.save("old", SessionRecord(username="AP1", created_at=now - 101, last_seen=now))
+
+    assert sorted(store.sweep()) == ["idle", "old", "pending"]
+    assert len(store) == 1 and store.get("active") is not None
+
+
+def test_get_renews_the_idle_ttl_unless_asked_not_to():
+    store = MemorySessionStore(idle_ttl=30)
+    store.save("s1", SessionRecord(username="AP1", last_seen=time.time() - 20))
+
+    store.get("s1", touch=False)
+    assert time.time() - store.get("s1", touch=False).last_seen >= 20
+    store.get("s1")
+    assert time.time() - store.get("s1", touch=False).last_seen < 1
+
+
+def test_expired_session_is_a_401(fake_portal, client, login):
+    session_id = login()
+    main.session_store.get(session_id, touch=False).last_seen -= main.session_store.idle_ttl + 1
+
+    response = client.post("/api/student/attendance", json={"session_id": session_id})
+    assert response.status_code == 401
+    assert session_id not in main.session_store
+
+
+def test_sqlite_sessions_are_shared_between_workers(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    first, second = SQLiteSessionStore(path=path), SQLiteSessionStore(path=path)
+    session_id = first.create([("JSESSIONID", "s1", "portal", "/")])
+    first.save(session_id, SessionRecord(cookies=[("JSESSIONID", "s2", "portal", "/")], username="AP1"))
+
+    record = second.get(session_id)
+    assert record.username == "AP1" and record.cookies == [("JSESSIONID", "s2", "portal", "/")]
+    assert second.delete(session_id)
+    assert first.get(session_id) is None
+    first.close()
+    second.close()
+
+
+def test_sqlite_store_writes_last_seen_back_only_every_touch_interval(tmp_path):
+    store = SQLiteSessionStore(path=str(tmp_path / "sessions.db"), touch_interval=30)
+    now = time.time()
+    store.save("recent", SessionRecord(username="AP1", last_seen=now - 10))
+    store.save("stale", SessionRecord(username="AP1", last_seen=now - 60))
+
+    store.get("recent")
+    store.get("stale")
+    assert store.get("recent", touch=False).last_seen == now - 10
+    assert now - store.get("stale", touch=False).last_seen < 1
+    store.close()
@@ -0,0 +1,79 @@
+"""
+Request coalescing: identical concurrent calls share one upstream call
+"""
+import asyncio
+
+import pytest
+
+import main
+from conftest import report_table
+from single_flight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call_and_its_error():
+    async def run():
+        flights = SingleFlight()
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return len(calls)
+
+        async def fail():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            raise ConnectionError("portal down")
+
+        shared = await asyncio.gather(*(flights.do("attendance", fetch) for _ in range(5)))
+        errors = await asyncio.gather(*(flights.do("cgpa", fail) for _ in range(3)), return_exceptions=True)
+        again = await flights.do("attendance", fetch)  # the finished call isn't reused
+        return shared, errors, again, flights
+
+    shared, errors, again, flights = asyncio.run(run())
+    assert shared == [1] * 5
+    assert [type(e) for e in errors] == [ConnectionError] * 3
+    assert again == 3
+    assert flights.stats()["upstream_calls"] == 3 and flights.collapsed == 6 and len(flights) == 0
+
+
+def test_a_cancelled_caller_does_not_cancel_the_others():
+    async def run():
+        flights = SingleFlight()
+
+        async def fetch():
+            await asyncio.sleep(0.02)
+            return "report"
+
+        first = asyncio.ensure_future(flights.do("key", fetch))
+        second = asyncio.ensure_future(flights.do("key", fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(run()) == "report"
+
+
+def test_identical_report_requests_reach_the_portal_once(fake_portal, client, login):
+    session_id = login()
+
+    async def burst():
+        release = asyncio.Event()
+
+        async def slow_report(request):
+            await release.wait()
+            return report_table(request)
+
+        fake_portal.report = slow_report
+        request = main.StudentDataRequest(session_id=session_id, refresh=True)
+        resource = main.STUDENT_REPORTS["attendance"]
+        pending = [asyncio.ensure_future(main.get_report(request, resource)) for _ in range(4)]
+        await asyncio.sleep(0.05)
+        release.set()
+        return await asyncio.gather(*pending)
+
+    reports = client.portal.call(burst)
+    assert len({id(report) for report in reports}) == 1
+    assert fake_portal.served == 1
@@ -0,0 +1,59 @@
+"""
+Portal timeouts and transport errors on ordinary report routes
+"""
+import httpx
+
+import main
+
+
+def test_stalled_portal_is_a_504(fake_portal, client, login):
+    async def stall(request):
+        raise httpx.ReadTimeout("stalled", request=request)
+
+    fake_portal.report = stall
+    session_id = login()
+
+    response = client.post("/api/student/subjects", json={"session_id": session_id})
+
+    assert response.status_code == 504
+    # The read timeout follows the route's deadline rather than the 20 s client default
+    read = fake_portal.report_requests[0].extensions["timeout"]["read"]
+    assert main.UPSTREAM_TIMEOUT.read < read <= main.DEFAULT_DEADLINE
+
+
+def test_unreachable_portal_is_a_502(fake_portal, client, login):
+    async def refuse(request):
+        raise httpx.ConnectError("connection refused", request=request)
+
+    fake_portal.report = refuse
+    session_id = login()
+
+    response = client.post("/api/student/subjects", json={"session_id": session_id})
+
+    assert response.status_code == 502
+
+
+class GuardedBody(httpx.AsyncByteStream):
+    """Response body that records whether a limiter slot was held while it was read"""
+
+    def __init__(self, held):
+        self.held = held
+
+    async def __aiter__(self):
+        self.held.append(main.upstream_guard.limiter.in_flight)
+        yield b"<table><tr><td>ok</td></tr></table>"
+
+
+def test_limiter_slot_covers_the_body(fake_portal, client, login):
+    held = []
+
+    async def report(request):
+        return httpx.Response(200, stream=GuardedBody(held))
+
+    fake_portal.report = report
+    session_id = login()
+
+    response = client.post("/api/student/subjects", json={"session_id": session_id, "refresh": True})
+
+    assert response.status_code == 200
+    assert held and held[0] >= 1
@@ -0,0 +1,127 @@
+"""
+Portal guard: AIMD concurrency limit and circuit breaker
+"""
+import asyncio
+import time
+
+import pytest
+
+import main
+import upstream_guard
+from upstream_guard import AIMDLimiter, CircuitBreaker, UpstreamGuard, UpstreamUnavailable
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_limit_grows_on_fast_calls_and_shrinks_once_per_burst_of_slow_ones(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(upstream_guard.time, "monotonic", clock)
+    limiter = AIMDLimiter(initial=10, min_limit=2, decrease=0.5, min_latency=0.25)
+
+    for _ in range(10):
+        limiter.in_flight += 1
+        limiter.release(0.1)
+    assert 10.9 < limiter.limit < 11.1  # about one more slot per limit's worth of good calls
+
+    limiter.in_flight += 2
+    limiter.release(2.0)  # much slower than the baseline
+    limiter.release(2.0)  # same burst: no second decrease
+    assert int(limiter.limit) == 5
+
+    clock.now += 1
+    for _ in range(3):
+        limiter.in_flight += 1
+        limiter.release(None, ok=False)  # cancelled calls don't move the limit
+        limiter.in_flight += 1
+        limiter.release(0.1, ok=False)
+        clock.now += 1
+    assert limiter.limit == 2  # never below min_limit
+
+
+def test_callers_over_the_limit_queue_then_get_rejected():
+    async def run():
+        limiter = AIMDLimiter(initial=1, max_limit=1, max_wait=0.05)
+        await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        assert limiter.queued == 1
+        limiter.release(0.1)
+        await waiter  # the freed slot goes to the queued caller
+        assert limiter.in_flight == 1
+        with pytest.raises(UpstreamUnavailable):
+            await limiter.acquire()
+        return limiter.rejected
+
+    assert asyncio.run(run()) == 1
+
+
+def test_breaker_opens_fails_fast_and_closes_after_a_good_probe(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(upstream_guard.time, "monotonic", clock)
+    breaker = CircuitBreaker(failure_ratio=0.5, min_calls=4, open_duration=10, max_open_duration=40)
+
+    for ok in (True, False, True, False):
+        breaker.before_call()
+        breaker.record(ok)
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(UpstreamUnavailable):
+        breaker.before_call()
+
+    # A failed probe re-opens for twice as long
+    clock.now += 10
+    breaker.before_call()
+    with pytest.raises(UpstreamUnavailable):
+        breaker.before_call()  # one probe at a time
+    breaker.record(False)
+    assert breaker.state == CircuitBreaker.OPEN and breaker.open_duration == 20
+
+    clock.now += 20
+    breaker.before_call()
+    breaker.record(True)
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.open_duration == 10
+
+
+def test_guard_counts_portal_failures_but_not_the_callers_own():
+    class Deadline(Exception):
+        pass
+
+    async def run():
+        guard = UpstreamGuard(AIMDLimiter(initial=4), CircuitBreaker(min_calls=2), neutral_errors=(Deadline,))
+
+        async def raise_(error):
+            raise error
+
+        for error in (Deadline(), Deadline(), Deadline()):
+            with pytest.raises(Deadline):
+                await guard.call(lambda: raise_(error), is_failure=lambda result: False)
+        assert guard.breaker.state == CircuitBreaker.CLOSED
+
+        async def portal_500():
+            return 500
+
+        for _ in range(2):
+            await guard.call(portal_500, is_failure=lambda status: status >= 500)
+        return guard
+
+    guard = asyncio.run(run())
+    assert guard.breaker.state == CircuitBreaker.OPEN
+    assert guard.limiter.in_flight == 0
+
+
+def test_open_circuit_is_a_503_with_retry_after(fake_portal, client, login, monkeypatch):
+    session_id = login()
+    breaker = CircuitBreaker(open_duration=30)
+    breaker._open(time.monotonic(), 30)
+    monkeypatch.setattr(main.upstream_guard, "breaker", breaker)
+
+    response = client.post("/api/student/subjects", json={"session_id": session_id})
+
+    assert response.status_code == 503
+    assert 29 <= int(response.headers["retry-after"]) <= 30
+    assert fake_portal.served == 0
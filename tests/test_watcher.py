@@ -0,0 +1,121 @@
+"""
+Report watchers run detached from the request that started them, at low priority
+"""
+import asyncio
+import time
+
+import main
+from deadlines import _deadline, remaining
+from report_watcher import RateLimiter, SessionGone, SessionWatcher, WatchHub, WatchSpec
+from session_store import SessionRecord
+
+
+def test_watcher_does_not_inherit_the_request_context():
+    seen = []
+
+    async def fetch(session_id, ids):
+        seen.append(remaining())
+        return {"records": []}
+
+    async def subscribe_from_a_request():
+        hub = WatchHub({"3": WatchSpec(lambda data: data["records"])}, fetch, limiter=RateLimiter(100, burst=10))
+        _deadline.set(time.monotonic() + 5)  # as DeadlineMiddleware does for the subscribing request
+        hub.subscribe("s1")
+        await asyncio.sleep(0.05)
+        hub.close()
+
+    asyncio.run(subscribe_from_a_request())
+    assert seen == [None]
+
+
+def test_watcher_polls_are_low_priority(monkeypatch):
+    priorities = []
+
+    async def fetch_resource(session_id, resource):
+        priorities.append(resource.priority)
+        return "<table></table>"
+
+    monkeypatch.setattr(main, "fetch_resource", fetch_resource)
+    session_id = main.session_store.create([])
+    main.session_store.save(session_id, SessionRecord(username="AP1"))
+    try:
+        for ids in main.WATCHED_REPORTS:
+            asyncio.run(main.fetch_watched_report(session_id, ids))
+    finally:
+        asyncio.run(main.drop_session(session_id))
+        main.report_cache.clear()
+
+    assert priorities == [main.PortalResource.LOW] * len(main.WATCHED_REPORTS)
+
+
+def drain(queue):
+    items = []
+    while not queue.empty():
+        items.append(queue.get_nowait())
+    return items
+
+
+def test_a_full_queue_still_gets_the_end_event():
+    async def run():
+        watcher = SessionWatcher("s1", {}, None, RateLimiter(1), 60, 60, queue_size=2)
+        queue = watcher.subscribe()
+        watcher.publish("change", {"n": 1})
+        watcher.publish("change", {"n": 2})
+        watcher.publish("end", {"reason": "logged out"})
+        return drain(queue)
+
+    assert asyncio.run(run()) == [("change", {"n": 2}), ("end", {"reason": "logged out"})]
+
+
+def test_a_stalled_subscriber_is_closed_and_told_so():
+    async def run():
+        watcher = SessionWatcher("s1", {}, None, RateLimiter(1), 60, 60, queue_size=2)
+        slow, fast = watcher.subscribe(), watcher.subscribe()
+        for n in range(3):
+            watcher.publish("change", {"n": n})
+            drain(fast)
+        return drain(slow), watcher.subscribers == {fast}
+
+    events, only_fast_left = asyncio.run(run())
+    assert events[-1] == ("end", {"reason": "client too slow"})
+    assert only_fast_left
+
+
+def test_hub_forgets_a_watcher_whose_session_is_gone():
+    async def run():
+        async def fetch(session_id, ids):
+            raise SessionGone()
+
+        hub = WatchHub({"3": WatchSpec(lambda data: data["records"])}, fetch, limiter=RateLimiter(100, burst=10))
+        queue = hub.subscribe("s1")
+        event = await asyncio.wait_for(queue.get(), timeout=1)
+        await asyncio.sleep(0)
+        return event, len(hub)
+
+    assert asyncio.run(run()) == (("end", {"reason": "session expired"}), 0)
+
+
+def test_cancelled_stream_leaves_the_hub(monkeypatch):
+    async def run():
+        async def fetch(session_id, ids):
+            await asyncio.sleep(60)
+
+        hub = WatchHub({"3": WatchSpec(lambda data: data["records"])}, fetch, limiter=RateLimiter(100, burst=10))
+        monkeypatch.setattr(main, "watch_hub", hub)
+        session_id = main.session_store.create([])
+        main.session_store.save(session_id, SessionRecord(username="AP1"))
+        try:
+            response = await main.watch_reports(session_id)
+            stream = response.body_iterator
+            await stream.__anext__()  # "ready"
+            waiting = asyncio.ensure_future(stream.__anext__())
+            await asyncio.sleep(0.01)
+            watched = len(hub)
+            waiting.cancel()  # the client went away while the stream waited for an event
+            await asyncio.gather(waiting, return_exceptions=True)
+            await asyncio.sleep(0)
+            return watched, len(hub)
+        finally:
+            main.session_store.delete(session_id)
+
+    assert asyncio.run(run()) == (1, 0)
@@ -0,0 +1,230 @@
+"""
+SRMAP Student Portal - Tracing and Profiling
+Per-request phase spans kept in a ring buffer, and an on-demand sampling
+profiler that emits collapsed stacks (flamegraph.pl / speedscope input).
+Both cost next to nothing while switched off.
+"""
+from collections import Counter, deque
+from contextlib import nullcontext
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, List, Optional
+import os
+import random
+import sys
+import threading
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# The trace of the request being handled, if it is being traced
+_current: ContextVar[Optional["Trace"]] = ContextVar("trace", default=None)
+_NOOP = nullcontext()
+
+
+class Trace:
+    """Phases of one request, as (name, detail, start offset, duration) in seconds"""
+
+    __slots__ = ("method", "path", "route", "status", "started_at", "started", "duration", "spans")
+
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.route: Optional[str] = None
+        self.status = 0
+        self.started_at = time.time()
+        self.started = time.perf_counter()
+        self.duration = 0.0
+        self.spans: List[tuple] = []
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "method": self.method,
+            "path": self.path,
+            "route": self.route,
+            "status": self.status,
+            "started_at": round(self.started_at, 3),
+            "duration_ms": round(self.duration * 1000, 2),
+            "spans": [
+                {"name": name, "detail": detail, "start_ms": round(start * 1000, 2), "duration_ms": round(length * 1000, 2)}
+                for name, detail, start, length in self.spans
+            ],
+        }
+
+
+class _Span:
+    __slots__ = ("trace", "name", "detail", "started")
+
+    def __init__(self, trace: Trace, name: str, detail: Optional[str]):
+        self.trace = trace
+        self.name = name
+        self.detail = detail
+
+    def __enter__(self) -> "_Span":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        ended = time.perf_counter()
+        self.trace.spans.append((self.name, self.detail, self.started - self.trace.started, ended - self.started))
+
+
+def span(name: str, detail: Optional[str] = None):
+    """
+    Time a phase of the current request. Outside a traced request this returns
+    a shared no-op context manager, so untraced calls cost one ContextVar read.
+    Work started in a task (e.g. a coalesced fetch) is recorded on the trace of
+    the request that started it.
+    """
+    trace = _current.get()
+    if trace is None:
+        return _NOOP
+    return _Span(trace, name, detail)
+
+
+class Tracer:
+    """Runtime switch, sampling rate and ring buffer of finished traces"""
+
+    def __init__(self, capacity: int = 500, enabled: bool = False, sample_rate: float = 1.0):
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.traces: Deque[Trace] = deque(maxlen=capacity)
+
+    def configure(self, enabled: Optional[bool] = None, sample_rate: Optional[float] = None, capacity: Optional[int] = None) -> None:
+        if enabled is not None:
+            self.enabled = enabled
+        if sample_rate is not None:
+            self.sample_rate = min(1.0, max(0.0, sample_rate))
+        if capacity is not None and capacity != self.traces.maxlen:
+            self.traces = deque(self.traces, maxlen=max(1, capacity))
+
+    def should_trace(self) -> bool:
+        return self.enabled and (self.sample_rate >= 1.0 or random.random() < self.sample_rate)
+
+    def recent(self, limit: int = 50, min_ms: float = 0.0, path: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Newest first, optionally only slow ones or one route"""
+        found = []
+        for trace in reversed(self.traces):
+            if trace.duration * 1000 < min_ms or (path and path not in (trace.path, trace.route)):
+                continue
+            found.append(trace.to_dict())
+            if len(found) >= limit:
+                break
+        return found
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "sample_rate": self.sample_rate,
+            "buffered": len(self.traces),
+            "capacity": self.traces.maxlen,
+        }
+
+
+class TracingMiddleware:
+    """Open a Trace for sampled requests and file it in the tracer's ring buffer when done"""
+
+    def __init__(self, app: ASGIApp, tracer: Tracer):
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.tracer.should_trace():
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace(scope.get("method", ""), scope["path"])
+
+        async def send_tracking(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                trace.status = message["status"]
+            await send(message)
+
+        token = _current.set(trace)
+        try:
+            await self.app(scope, receive, send_tracking)
+        finally:
+            _current.reset(token)
+            trace.duration = time.perf_counter() - trace.started
+            trace.route = getattr(scope.get("route"), "path", None)
+            self.tracer.traces.append(trace)
+
+
+# ==================== PROFILER ====================
+
+class ProfilerBusy(Exception):
+    """A profile is already being taken"""
+
+
+class SamplingProfiler:
+    """
+    Samples the stack of one thread (the event loop's) from a helper thread
+    every `interval` seconds and counts identical stacks. Nothing runs between
+    profiles. Output is one "frame;frame;frame count" line per stack, root first.
+    """
+
+    # Leaf frames of an event loop waiting for I/O
+    IDLE_FRAMES = {("selectors.py", "select"), ("selectors.py", "poll")}
+    # Stands in for the middle frames of a stack deeper than max_depth
+    TRUNCATED = "[truncated]"
+
+    def __init__(self, max_depth: int = 64):
+        self.max_depth = max_depth
+        self._lock = threading.Lock()
+        self.last_run: Optional[Dict[str, Any]] = None
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    def profile(self, thread_id: int, seconds: float, interval: float = 0.005, include_idle: bool = False) -> str:
+        """Block for `seconds` while sampling thread_id; call from a worker thread"""
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusy()
+        try:
+            stacks: Counter = Counter()
+            samples = idle = 0
+            stop_at = time.monotonic() + seconds
+            while time.monotonic() < stop_at:
+                frame = sys._current_frames().get(thread_id)
+                if frame is not None:
+                    samples += 1
+                    is_idle = self._is_idle(frame)
+                    idle += is_idle
+                    if include_idle or not is_idle:
+                        stacks[self._collapse(frame)] += 1
+                time.sleep(interval)
+            self.last_run = {
+                "finished_at": round(time.time(), 3),
+                "seconds": seconds,
+                "interval": interval,
+                "samples": samples,
+                "idle_samples": idle,
+                "stacks": len(stacks),
+            }
+            return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+        finally:
+            self._lock.release()
+
+    def _is_idle(self, frame) -> bool:
+        return (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in self.IDLE_FRAMES
+
+    def _collapse(self, frame) -> str:
+        """
+        Root-first frame labels joined by ';'. Stacks deeper than max_depth keep
+        their root and leaf frames with a marker in place of the middle, so they
+        still merge under the right root in a flame graph.
+        """
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+            frame = frame.f_back
+        names.reverse()
+        if len(names) > self.max_depth:
+            root = self.max_depth // 2
+            leaf = self.max_depth - root - 1
+            names = names[:root] + [self.TRUNCATED] + names[-leaf:]
+        return ";".join(names)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"running": self.running, "last_run": self.last_run}
@@ -0,0 +1,245 @@
+"""
+SRMAP Student Portal - Upstream Guard
+Adaptive concurrency limit and circuit breaker for calls to the portal
+"""
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+import asyncio
+import time
+
+
+class UpstreamUnavailable(Exception):
+    """The portal is failing or saturated; the call was not attempted"""
+
+    def __init__(self, message: str, retry_after: float = 5):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AIMDLimiter:
+    """
+    Concurrency limit that grows by one per window of fast calls (additive
+    increase) and shrinks by `decrease` when a call fails or is much slower than
+    the long-run baseline latency (multiplicative decrease). At most one
+    decrease per baseline latency, so one burst of slow calls counts once.
+    Callers over the limit queue for up to max_wait seconds.
+    """
+
+    def __init__(
+        self,
+        initial: int = 20,
+        min_limit: int = 2,
+        max_limit: int = 100,
+        decrease: float = 0.7,
+        tolerance: float = 2.0,
+        min_latency: float = 0.25,
+        max_wait: float = 10.0
+    ):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease = decrease
+        self.tolerance = tolerance
+        self.min_latency = min_latency  # samples below this never count as slow
+        self.max_wait = max_wait
+        self.in_flight = 0
+        self.baseline = 0.0  # slow EWMA of call latency
+        self._last_decrease = 0.0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self.rejected = 0
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> None:
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout=self.max_wait)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise UpstreamUnavailable("Portal is overloaded, try again shortly", retry_after=self.max_wait)
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()  # the slot was handed over just as we were cancelled
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    def release(self, latency: Optional[float] = None, ok: bool = True) -> None:
+        """Free a slot; latency=None (cancelled call) leaves the limit alone"""
+        self.in_flight -= 1
+        if latency is not None:
+            self._adjust(latency, ok)
+        # Hand freed slots straight to queued callers, oldest first
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                self.in_flight += 1
+
+    def _adjust(self, latency: float, ok: bool) -> None:
+        slow = bool(self.baseline) and latency > max(self.min_latency, self.baseline * self.tolerance)
+        self.baseline = latency if not self.baseline else 0.95 * self.baseline + 0.05 * latency
+        now = time.monotonic()
+        if not ok or slow:
+            if now - self._last_decrease > max(self.baseline, self.min_latency):
+                self.limit = max(self.min_limit, self.limit * self.decrease)
+                self._last_decrease = now
+        else:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "baseline_latency_s": round(self.baseline, 3),
+            "rejected": self.rejected,
+        }
+
+
+class CircuitBreaker:
+    """
+    closed:    calls go through; opens when at least `failure_ratio` of the calls
+               in the last `window` seconds failed (and there were min_calls of them)
+    open:      calls fail fast for open_duration seconds
+    half_open: up to `probes` trial calls; a success closes the circuit, a failure
+               re-opens it with a doubled open_duration (capped at max_open_duration)
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_ratio: float = 0.5,
+        min_calls: int = 10,
+        window: float = 30,
+        open_duration: float = 15,
+        max_open_duration: float = 120,
+        probes: int = 1
+    ):
+        self.failure_ratio = failure_ratio
+        self.min_calls = min_calls
+        self.window = window
+        self.base_open_duration = open_duration
+        self.open_duration = open_duration
+        self.max_open_duration = max_open_duration
+        self.probes = probes
+        self.state = self.CLOSED
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._calls: Deque[Tuple[float, bool]] = deque()
+        self.opened = 0
+        self.short_circuited = 0
+
+    def retry_after(self) -> float:
+        return max(1.0, self._opened_at + self.open_duration - time.monotonic())
+
+    def before_call(self) -> None:
+        """Raise UpstreamUnavailable unless a call may go through now"""
+        if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.open_duration:
+            self.state = self.HALF_OPEN
+            self._probes_in_flight = 0
+        if self.state == self.CLOSED:
+            return
+        if self.state == self.HALF_OPEN and self._probes_in_flight < self.probes:
+            self._probes_in_flight += 1
+            return
+        self.short_circuited += 1
+        raise UpstreamUnavailable("Portal is unavailable, try again shortly", retry_after=self.retry_after())
+
+    def cancel_probe(self) -> None:
+        """A let-through call never reached the portal"""
+        if self.state == self.HALF_OPEN:
+            self._probes_in_flight = max(0, self._probes_in_flight - 1)
+
+    def record(self, ok: bool) -> None:
+        now = time.monotonic()
+        if self.state == self.HALF_OPEN:
+            self._probes_in_flight = max(0, self._probes_in_flight - 1)
+            if ok:
+                self.state = self.CLOSED
+                self.open_duration = self.base_open_duration
+                self._calls.clear()
+            else:
+                self._open(now, min(self.max_open_duration, self.open_duration * 2))
+            return
+        if self.state == self.OPEN:
+            return  # a straggler from before the circuit opened
+
+        self._calls.append((now, ok))
+        while self._calls and now - self._calls[0][0] > self.window:
+            self._calls.popleft()
+        failures = sum(1 for _, call_ok in self._calls if not call_ok)
+        if len(self._calls) >= self.min_calls and failures >= self.failure_ratio * len(self._calls):
+            self._open(now, self.base_open_duration)
+
+    def _open(self, now: float, duration: float) -> None:
+        self.state = self.OPEN
+        self._opened_at = now
+        self.open_duration = duration
+        self._calls.clear()
+        self.opened += 1
+        print(f"⚠️ Portal circuit opened for {duration:.0f}s")
+
+    def stats(self) -> Dict[str, Any]:
+        failures = sum(1 for _, ok in self._calls if not ok)
+        return {
+            "state": self.state,
+            "recent_calls": len(self._calls),
+            "recent_failures": failures,
+            "opened": self.opened,
+            "short_circuited": self.short_circuited,
+        }
+
+
+class UpstreamGuard:
+    """
+    Circuit breaker check, then a concurrency slot, around every portal call.
+    Exceptions in `neutral_errors` (e.g. the caller's own deadline running out)
+    free the slot without counting against the portal.
+    """
+
+    def __init__(self, limiter: AIMDLimiter, breaker: CircuitBreaker, neutral_errors: Tuple[type, ...] = ()):
+        self.limiter = limiter
+        self.breaker = breaker
+        self.neutral_errors = neutral_errors
+
+    async def call(self, send: Callable[[], Awaitable[Any]], is_failure: Callable[[Any], bool]) -> Any:
+        self.breaker.before_call()
+        try:
+            await self.limiter.acquire()
+        except BaseException:
+            self.breaker.cancel_probe()
+            raise
+        started = time.monotonic()
+        try:
+            result = await send()
+        except asyncio.CancelledError:
+            # The caller went away; says nothing about the portal's health
+            self.breaker.cancel_probe()
+            self.limiter.release()
+            raise
+        except Exception as e:
+            if isinstance(e, self.neutral_errors):
+                self.breaker.cancel_probe()
+                self.limiter.release()
+                raise
+            self.breaker.record(False)
+            self.limiter.release(time.monotonic() - started, ok=False)
+            raise
+        ok = not is_failure(result)
+        self.breaker.record(ok)
+        self.limiter.release(time.monotonic() - started, ok=ok)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {"limiter": self.limiter.stats(), "breaker": self.breaker.stats()}